@@ -0,0 +1,132 @@
+# Copyright (c) 2021-2023 Johnathan P. Irvin
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+Measures the size of the primary key index and the latency of point
+lookups of the default and compact column types on SQLite, both through
+the store and as bare SQL, which leaves out the cost of the ORM.
+
+    python -m benchmarks.compact --rows 100000 --lookups 10000 --rounds 9
+"""
+import argparse
+import enum
+import random
+import statistics
+import tempfile
+import time
+from dataclasses import dataclass, field
+from types import ModuleType
+from uuid import UUID
+
+from effortless.sqlalchemy import EffortlessSQLAlchemy
+
+
+class Status(enum.Enum):
+    TODO = "todo"
+    IN_PROGRESS = "in_progress"
+    DONE = "done"
+
+
+def _models() -> ModuleType:
+    @dataclass
+    class Task:
+        name: str = field(metadata={"max_length": 64})
+        status: Status = field(metadata={"index": True})
+
+    models = ModuleType("models")
+    models.Task = Task
+
+    return models
+
+
+def _fill(directory: str, compact: bool, rows: int) -> tuple:
+    models = _models()
+    statuses = list(Status)
+    orm = EffortlessSQLAlchemy(f"sqlite:///{directory}/{'compact' if compact else 'default'}.db", compact=compact)
+    store = orm.create_stores(models=models)[models.Task]
+    uuids = []
+
+    for start in range(0, rows, 1000):
+        uuids += store.create_many([
+            models.Task(name=f"task {index}", status=statuses[index % len(statuses)])
+            for index in range(start, min(start + 1000, rows))
+        ])
+
+    with orm._engine.connect() as connection:
+        sizes = dict(connection.exec_driver_sql("SELECT name, sum(pgsize) FROM dbstat GROUP BY name").all())
+
+    return orm, store, uuids, sizes
+
+
+def _lookups(orm, store, uuids: list, compact: bool, lookups: int) -> tuple:
+    sample = random.choices(uuids, k=lookups)
+    started = time.perf_counter()
+
+    for uuid in sample:
+        store.get(uuid)
+
+    elapsed = time.perf_counter() - started
+    keys = [UUID(uuid).bytes if compact else uuid for uuid in sample]
+
+    with orm._engine.connect() as connection:
+        cursor = connection.connection.driver_connection.cursor()
+        sql_started = time.perf_counter()
+
+        for key in keys:
+            cursor.execute("SELECT id, name, status FROM task WHERE id = ?", (key,)).fetchone()
+
+        sql_elapsed = time.perf_counter() - sql_started
+
+    return elapsed / lookups * 1_000_000, sql_elapsed / lookups * 1_000_000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--lookups", type=int, default=10_000)
+    parser.add_argument("--rounds", type=int, default=9)
+    arguments = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        filled = {compact: _fill(directory, compact, arguments.rows) for compact in (False, True)}
+        timings = {compact: [] for compact in filled}
+
+        # Rounds alternate between the two, so drift of the machine weighs
+        # on both alike, and the median of each is reported.
+        for turn in range(arguments.rounds):
+            for compact in (False, True) if turn % 2 else (True, False):
+                orm, store, uuids, _ = filled[compact]
+                timings[compact].append(_lookups(orm, store, uuids, compact, arguments.lookups // arguments.rounds))
+
+        for compact, (orm, _, _, sizes) in filled.items():
+            gets, sqls = zip(*timings[compact])
+            index_bytes = sum(size for name, size in sizes.items() if name.startswith("sqlite_autoindex_task"))
+
+            print(
+                f"{'compact' if compact else 'default':<8} table {sizes['task'] / 1024:>8.0f} KiB"
+                f"  key index {index_bytes / 1024:>8.0f} KiB"
+                f"  get {statistics.median(gets):>6.1f} us"
+                f"  sql {statistics.median(sqls):>6.2f} us"
+            )
+            orm._engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+# Copyright (c) 2021-2023 Johnathan P. Irvin
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+Compares two benchmarks.crud reports and flags regressions: measurements
+whose throughput fell, or whose p99 latency rose, by more than the
+threshold. Exits with status 1 when any regression is found.
+
+Reports run with different configurations are refused, since their
+measurements are not comparable, unless --allow-mismatch is given.
+
+    python -m benchmarks.compare base.json head.json --threshold 0.10
+"""
+import argparse
+import json
+import math
+import sys
+from typing import Any, Dict, List, Tuple
+
+Key = Tuple[str, int, int]
+
+
+def _index(report: Dict[str, Any]) -> Dict[Key, Dict[str, Any]]:
+    return {
+        (result["operation"], result["rows"], result["concurrency"]): result
+        for result in report["results"]
+    }
+
+
+def _change(before: float, after: float) -> float:
+    """
+    _change is the relative change from before to after. Anything from
+    zero is an infinite change, and zero to zero none at all.
+    """
+    if before == 0:
+        return 0.0 if after == 0 else math.inf
+
+    return after / before - 1
+
+
+def mismatches(base: Dict[str, Any], head: Dict[str, Any]) -> Dict[str, Tuple[Any, Any]]:
+    """
+    mismatches lists the settings two reports were run with that differ.
+
+    Args:
+        base (Dict[str, Any]): Report to compare against.
+        head (Dict[str, Any]): Report being checked.
+
+    Returns:
+        Dict[str, Tuple[Any, Any]]: Base and head value of every setting
+            that differs.
+    """
+    before, after = base.get("config", {}), head.get("config", {})
+
+    return {
+        name: (before.get(name), after.get(name))
+        for name in sorted(before.keys() | after.keys())
+        if before.get(name) != after.get(name)
+    }
+
+
+def compare(
+    base: Dict[str, Any],
+    head: Dict[str, Any],
+    threshold: float,
+    allow_mismatch: bool = False,
+) -> List[Dict[str, Any]]:
+    """
+    compare pairs the measurements of two reports by operation, table size
+    and concurrency.
+
+    Args:
+        base (Dict[str, Any]): Report to compare against.
+        head (Dict[str, Any]): Report being checked.
+        threshold (float): Relative change tolerated, e.g. 0.1 for 10%.
+        allow_mismatch (bool): Compare reports run with different
+            configurations.
+
+    Raises:
+        ValueError: If the configurations differ and allow_mismatch is
+            not set.
+
+    Returns:
+        List[Dict[str, Any]]: One row per paired measurement, with the
+            relative changes and whether it regressed.
+    """
+    differences = mismatches(base, head)
+
+    if differences and not allow_mismatch:
+        raise ValueError("Reports were run with different configurations: " + ", ".join(
+            f"{name} {before!r} != {after!r}" for name, (before, after) in differences.items()
+        ))
+
+    rows = []
+    base_results = _index(base)
+
+    for key, result in sorted(_index(head).items()):
+        if key not in base_results:
+            continue
+
+        before = base_results[key]
+        throughput = _change(before["throughput"], result["throughput"])
+        p99 = _change(before["p99_ms"], result["p99_ms"])
+
+        rows.append({
+            "operation": key[0],
+            "rows": key[1],
+            "concurrency": key[2],
+            "throughput_change": throughput,
+            "p99_change": p99,
+            "regressed": throughput < -threshold or p99 > threshold,
+        })
+
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("base")
+    parser.add_argument("head")
+    parser.add_argument("--threshold", type=float, default=0.10)
+    parser.add_argument("--allow-mismatch", action="store_true", help="compare reports of different configurations")
+    arguments = parser.parse_args()
+
+    with open(arguments.base) as base, open(arguments.head) as head:
+        base, head = json.load(base), json.load(head)
+
+    try:
+        rows = compare(base, head, arguments.threshold, arguments.allow_mismatch)
+    except ValueError as error:
+        parser.error(str(error))
+
+    for name, (before, after) in mismatches(base, head).items():
+        print(f"warning: {name} differs, {before!r} in base and {after!r} in head", file=sys.stderr)
+
+    for row in rows:
+        print(
+            f"{'REGRESSION' if row['regressed'] else 'ok':<11}"
+            f"{row['operation']:<7} rows={row['rows']:<8} concurrency={row['concurrency']:<4}"
+            f" throughput {row['throughput_change']:+7.1%}  p99 {row['p99_change']:+7.1%}"
+        )
+
+    sys.exit(1 if any(row["regressed"] for row in rows) else 0)
+
+
+if __name__ == "__main__":
+    main()
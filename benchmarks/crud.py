@@ -0,0 +1,272 @@
+# Copyright (c) 2021-2023 Johnathan P. Irvin
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+Benchmarks the CRUD service generated for examples/tasks. The app is built
+through Effortless.build and driven in-process through an ASGI client, so
+no network is involved. Throughput and p50/p99 latency are measured for
+each operation at every table size and concurrency level, and written as
+JSON for benchmarks.compare.
+
+    python -m benchmarks.crud --rows 1000 10000 --concurrency 1 16 --output head.json
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import platform
+import random
+import sys
+import tempfile
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import httpx
+
+from effortless import (AdmissionPolicy, BatchPolicy, Effortless,
+                        EffortlessAsyncSQLAlchemy, EffortlessFastAPI,
+                        EffortlessSQLAlchemy)
+from examples.tasks import models
+
+OPERATIONS = ("get", "list", "create", "update", "delete")
+
+
+def _task(index: int) -> Dict[str, str]:
+    return {"name": f"task {index}", "description": "x" * 200, "status": "todo"}
+
+
+def _percentile(latencies: List[float], percentile: float) -> float:
+    if not latencies:
+        return 0.0
+
+    ordered = sorted(latencies)
+
+    return ordered[min(len(ordered) - 1, int(len(ordered) * percentile))]
+
+
+async def _measure(
+    requests: int,
+    concurrency: int,
+    send: Callable[[int], Awaitable[httpx.Response]],
+) -> Dict[str, float]:
+    """
+    _measure sends requests from concurrency workers and times each one.
+    Requests shed with 503 are counted rather than failing the run, and
+    left out of the throughput and latencies.
+
+    Args:
+        requests (int): Requests to send in total.
+        concurrency (int): Requests in flight at once.
+        send (Callable[[int], Awaitable[httpx.Response]]): Sends the
+            request with the given index.
+
+    Returns:
+        Dict[str, float]: Throughput, latency percentiles and the share of
+            requests shed.
+    """
+    counter = itertools.count()
+    latencies: List[float] = []
+    shed = 0
+
+    async def worker() -> None:
+        nonlocal shed
+
+        for index in iter(lambda: next(counter), None):
+            if index >= requests:
+                return
+
+            started = time.perf_counter()
+            response = await send(index)
+
+            if response.status_code == 503:
+                shed += 1
+
+                continue
+
+            latencies.append(time.perf_counter() - started)
+            response.raise_for_status()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    return {
+        "throughput": len(latencies) / elapsed,
+        "p50_ms": _percentile(latencies, 0.50) * 1000,
+        "p99_ms": _percentile(latencies, 0.99) * 1000,
+        "shed": shed / requests if requests else 0.0,
+    }
+
+
+async def _seed(client: httpx.AsyncClient, rows: int, batch: int = 5000) -> List[str]:
+    """
+    _seed tops the task table up to rows through the bulk route.
+
+    Returns:
+        List[str]: Uuid of every task in the table.
+    """
+    response = await client.get("/task", params={"fields": "id", "stream": True})
+    uuids = [json.loads(line)["id"] for line in response.text.splitlines()]
+
+    while len(uuids) < rows:
+        count = min(batch, rows - len(uuids))
+        response = await client.post("/task/_bulk", json=[_task(i) for i in range(count)])
+        uuids.extend(response.json()["uuids"])
+
+    return uuids
+
+
+async def _run_operation(
+    client: httpx.AsyncClient,
+    operation: str,
+    uuids: List[str],
+    requests: int,
+    concurrency: int,
+) -> Dict[str, float]:
+    if operation == "get":
+        picks = random.choices(uuids, k=requests)
+
+        return await _measure(requests, concurrency, lambda i: client.get(f"/task/{picks[i]}"))
+
+    if operation == "list":
+        return await _measure(requests, concurrency, lambda i: client.get("/task", params={"limit": 100}))
+
+    if operation == "update":
+        picks = random.choices(uuids, k=requests)
+
+        return await _measure(requests, concurrency, lambda i: client.put(f"/task/{picks[i]}", json=_task(i)))
+
+    if operation == "create":
+        created: List[str] = []
+
+        async def create(i: int) -> httpx.Response:
+            response = await client.post("/task", json=_task(i))
+
+            if response.status_code != 503:
+                created.append(response.json()["uuid"])
+
+            return response
+
+        result = await _measure(requests, concurrency, create)
+        uuids.extend(created)
+
+        return result
+
+    # Delete the newest rows, so the table returns to its size before create.
+    doomed = [uuids.pop() for _ in range(min(requests, len(uuids)))]
+
+    return await _measure(len(doomed), concurrency, lambda i: client.delete(f"/task/{doomed[i]}"))
+
+
+async def run(
+    rows: List[int],
+    concurrency: List[int],
+    requests: int,
+    orm: str,
+    profile: str,
+    batch: bool = False,
+    admission: Optional[int] = None,
+    queue: int = 128,
+) -> Dict[str, Any]:
+    """
+    run benchmarks every operation at every table size and concurrency.
+
+    Returns:
+        Dict[str, Any]: Configuration and one result per measurement.
+    """
+    results = []
+
+    with tempfile.TemporaryDirectory() as directory:
+        if orm == "async":
+            adapter = EffortlessAsyncSQLAlchemy(f"sqlite+aiosqlite:///{directory}/tasks.db", profile=profile)
+        else:
+            adapter = EffortlessSQLAlchemy(f"sqlite:///{directory}/tasks.db", profile=profile)
+
+        app = Effortless(orm=adapter, web=EffortlessFastAPI()).build(
+            models=models,
+            batch={models.Task: BatchPolicy()} if batch else None,
+            admission={models.Task: AdmissionPolicy(concurrency=admission, queue=queue)} if admission else None,
+        )
+
+        async with httpx.AsyncClient(app=app, base_url="http://benchmark") as client:
+            for size in sorted(rows):
+                uuids = await _seed(client, size)
+
+                for level in concurrency:
+                    for operation in OPERATIONS:
+                        result = await _run_operation(client, operation, uuids, requests, level)
+                        results.append({"operation": operation, "rows": size, "concurrency": level, **result})
+
+                        print(
+                            f"{operation:<7} rows={size:<8} concurrency={level:<4}"
+                            f"{result['throughput']:>9.0f} req/s"
+                            f"  p50 {result['p50_ms']:>7.2f} ms  p99 {result['p99_ms']:>7.2f} ms"
+                            f"  shed {result['shed']:>5.1%}",
+                            file=sys.stderr,
+                        )
+
+    return {
+        "config": {
+            "orm": orm,
+            "profile": profile,
+            "batch": batch,
+            "admission": admission,
+            "queue": queue,
+            "requests": requests,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "results": results,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 16, 64])
+    parser.add_argument("--requests", type=int, default=500, help="Requests per measurement.")
+    parser.add_argument("--orm", choices=["sync", "async"], default="sync")
+    parser.add_argument("--profile", default="default", help="Engine profile name.")
+    parser.add_argument("--batch", action="store_true", help="Coalesce creates and updates.")
+    parser.add_argument("--admission", type=int, help="Requests served at once, the rest queued or shed.")
+    parser.add_argument("--queue", type=int, default=128, help="Requests queued with --admission.")
+    parser.add_argument("--output", help="File to write the JSON results to, instead of stdout.")
+    arguments = parser.parse_args()
+
+    report = asyncio.run(run(
+        rows=arguments.rows,
+        concurrency=arguments.concurrency,
+        requests=arguments.requests,
+        orm=arguments.orm,
+        profile=arguments.profile,
+        batch=arguments.batch,
+        admission=arguments.admission,
+        queue=arguments.queue,
+    ))
+
+    if arguments.output is None:
+        json.dump(report, sys.stdout, indent=2)
+    else:
+        with open(arguments.output, "w") as output:
+            json.dump(report, output, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+# Copyright (c) 2021-2023 Johnathan P. Irvin
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+Measures store throughput under concurrent threads, the way Starlette's
+threadpool drives blocking stores, for each engine profile on SQLite.
+
+    python -m benchmarks.profiles --threads 32 --operations 200
+"""
+import argparse
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from types import ModuleType
+
+from sqlalchemy.exc import OperationalError
+
+from effortless.sqlalchemy import EffortlessSQLAlchemy
+
+
+def _models() -> ModuleType:
+    @dataclass
+    class Task:
+        name: str
+        description: str
+
+    models = ModuleType("models")
+    models.Task = Task
+
+    return models
+
+
+def _run(profile: str, threads: int, operations: int) -> dict:
+    models = _models()
+
+    with tempfile.TemporaryDirectory() as directory:
+        orm = EffortlessSQLAlchemy(f"sqlite:///{directory}/tasks.db", profile=profile)
+        store = orm.create_stores(models=models)[models.Task]
+
+        def work(_: int) -> int:
+            errors = 0
+
+            for _ in range(operations):
+                try:
+                    uuid = store.create(models.Task(name="task", description="x" * 100))
+                    store.get(uuid)
+                except OperationalError:
+                    errors += 1
+
+            return errors
+
+        started = time.perf_counter()
+
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            errors = sum(executor.map(work, range(threads)))
+
+        elapsed = time.perf_counter() - started
+        orm._engine.dispose()
+
+    return {
+        "profile": profile,
+        "requests_per_second": threads * operations * 2 / elapsed,
+        "errors": errors,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--operations", type=int, default=200)
+    parser.add_argument("--profiles", nargs="+", default=["default", "sqlite_high_concurrency"])
+    arguments = parser.parse_args()
+
+    for profile in arguments.profiles:
+        result = _run(profile, arguments.threads, arguments.operations)
+
+        print(f"{result['profile']:<26} {result['requests_per_second']:>10.0f} ops/s  {result['errors']:>5} errors")
+
+
+if __name__ == "__main__":
+    main()
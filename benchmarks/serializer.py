@@ -0,0 +1,69 @@
+# Copyright (c) 2021-2023 Johnathan P. Irvin
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+Compares the precompiled ModelEncoder with FastAPI's default response path
+(jsonable_encoder followed by JSONResponse) on a list endpoint payload.
+
+    python -m benchmarks.serializer
+"""
+import argparse
+import timeit
+from dataclasses import dataclass
+from enum import Enum
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from effortless.encoders import ModelEncoder
+
+
+class Status(Enum):
+    TODO = 'todo'
+    DONE = 'done'
+
+
+@dataclass
+class Task:
+    name: str
+    description: str
+    status: Status
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=20)
+    arguments = parser.parse_args()
+
+    tasks = [Task(name=f"task {i}", description="x" * 200, status=Status.TODO) for i in range(arguments.rows)]
+    encoder = ModelEncoder(Task)
+
+    default = min(timeit.repeat(lambda: JSONResponse(jsonable_encoder(tasks)).body, number=1, repeat=arguments.repeat))
+    compiled = min(timeit.repeat(lambda: encoder.encode_many(tasks), number=1, repeat=arguments.repeat))
+
+    print(f"rows:      {arguments.rows}")
+    print(f"default:   {default * 1000:.2f} ms")
+    print(f"compiled:  {compiled * 1000:.2f} ms")
+    print(f"speedup:   {default / compiled:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
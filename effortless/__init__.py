@@ -18,13 +18,39 @@
 # LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
 # OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
 # WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+from .admission import AdmissionPolicy
+from .batching import BatchedStore, BatchPolicy
+from .cache import AsyncCachedStore, CachedStore, CachePolicy
+from .changes import Change, ChangeFeed
 from .effortless import Effortless
 from .fastapi import EffortlessFastAPI
-from .sqlalchemy import EffortlessSQLAlchemy
+from .metrics import Metrics
+from .sharding import AsyncShardedStore, ShardedStore
+from .sqlalchemy import (EffortlessAsyncSQLAlchemy, EffortlessSQLAlchemy,
+                         EngineProfile)
+from .store import AsyncStore, Conflict, Filter, Store, VersionConflict
 
 __all__ = [
+    "AdmissionPolicy",
+    "AsyncCachedStore",
+    "AsyncShardedStore",
+    "AsyncStore",
+    "BatchedStore",
+    "BatchPolicy",
+    "CachedStore",
+    "CachePolicy",
+    "Change",
+    "ChangeFeed",
+    "Conflict",
     "Effortless",
+    "EffortlessAsyncSQLAlchemy",
     "EffortlessFastAPI",
     "EffortlessSQLAlchemy",
+    "EngineProfile",
+    "Filter",
+    "Metrics",
+    "ShardedStore",
+    "Store",
+    "VersionConflict",
 ]
 
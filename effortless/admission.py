@@ -0,0 +1,150 @@
+# Copyright (c) 2021-2023 Johnathan P. Irvin
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+import asyncio
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator, Deque
+
+OPERATIONS = (
+    "list",
+    "get",
+    "count",
+    "aggregate",
+    "export",
+    "create",
+    "create_many",
+    "update",
+    "update_many",
+    "patch",
+    "delete",
+    "delete_many",
+    "import",
+)
+
+
+@dataclass
+class AdmissionPolicy:
+    """
+    AdmissionPolicy bounds the requests a model, or one operation of it,
+    serves at once.
+
+    Args:
+        concurrency (int): Requests served at the same time.
+        queue (int): Requests waiting for one of them to finish. Any more
+            are turned away at once.
+        timeout (float): Seconds a request waits in the queue before it is
+            turned away.
+        retry_after (int): Seconds clients are told to wait before trying
+            again.
+    """
+    concurrency: int = 32
+    queue: int = 64
+    timeout: float = 1.0
+    retry_after: int = 1
+
+
+class Overloaded(Exception):
+    def __init__(self, retry_after: int) -> None:
+        """
+        Overloaded is raised when a gate turns a request away.
+
+        Args:
+            retry_after (int): Seconds the client should wait.
+        """
+        super().__init__(f"Overloaded, retry after {retry_after} seconds")
+        self.retry_after = retry_after
+
+
+class Gate:
+    def __init__(self, policy: AdmissionPolicy) -> None:
+        """
+        Gate admits requests up to the concurrency of its policy and queues
+        the next ones in arrival order. When the queue is full, or a request
+        has waited longer than the timeout, the request is rejected, so an
+        overloaded service answers quickly instead of piling up work behind
+        a slow database. Gates are used from the event loop only.
+
+        Args:
+            policy (AdmissionPolicy): Limits of the gate.
+        """
+        self._policy = policy
+        self._waiters: Deque[asyncio.Future] = deque()
+        self.active = 0
+        self.rejected = 0
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    def _reject(self) -> Overloaded:
+        self.rejected += 1
+
+        return Overloaded(self._policy.retry_after)
+
+    def _release(self) -> None:
+        # The slot passes straight to the next waiter, so a request arriving
+        # meanwhile cannot overtake the queue.
+        while self._waiters:
+            waiter = self._waiters.popleft()
+
+            if not waiter.done():
+                waiter.set_result(None)
+
+                return
+
+        self.active -= 1
+
+    @asynccontextmanager
+    async def admit(self) -> AsyncIterator[None]:
+        """
+        admit holds a slot of the gate for the duration of the block.
+
+        Raises:
+            Overloaded: If the request is turned away.
+        """
+        if self.active < self._policy.concurrency and not self._waiters:
+            self.active += 1
+        elif len(self._waiters) >= self._policy.queue:
+            raise self._reject()
+        else:
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+
+            try:
+                await asyncio.wait_for(waiter, self._policy.timeout)
+            except asyncio.TimeoutError:
+                raise self._reject() from None
+            except BaseException:
+                # A slot handed over just before the request was cancelled
+                # goes on to the next waiter.
+                if waiter.done() and not waiter.cancelled():
+                    self._release()
+
+                raise
+            finally:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+
+        try:
+            yield
+        finally:
+            self._release()
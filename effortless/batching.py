@@ -0,0 +1,182 @@
+# Copyright (c) 2021-2023 Johnathan P. Irvin
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+import asyncio
+import contextlib
+import contextvars
+import inspect
+from dataclasses import dataclass
+from typing import (Any, AsyncContextManager, Callable, Generic, List,
+                    Optional, Tuple, TypeVar, Union)
+from uuid import UUID
+
+from .store import AsyncStore, Store
+
+T = TypeVar("T")
+
+
+@dataclass
+class BatchPolicy:
+    """
+    BatchPolicy configures how the writes of a single model are coalesced.
+
+    Args:
+        max_items (int): Most writes flushed together.
+        max_delay (float): Seconds the first queued write waits for others
+            before the batch is flushed.
+    """
+    max_items: int = 100
+    max_delay: float = 0.005
+
+
+async def _call(method: Callable[..., Any], *args: Any) -> Any:
+    if inspect.iscoroutinefunction(method):
+        return await method(*args)
+
+    return await asyncio.to_thread(method, *args)
+
+
+class BatchedStore(Generic[T]):
+    def __init__(
+        self,
+        store: Union[Store[T], AsyncStore[T]],
+        policy: Optional[BatchPolicy] = None,
+        unit_of_work: Optional[Callable[[], AsyncContextManager[None]]] = None,
+    ) -> None:
+        """
+        BatchedStore coalesces concurrent creates and updates. Writes are
+        queued and flushed together through create_many and update_many,
+        once max_items are queued or max_delay has passed, and each caller
+        returns only after the flush has committed. If a flush fails, its
+        writes are retried one at a time, so every caller gets its own
+        result or error. Other methods are passed straight to the wrapped
+        store, so create and update are coroutines even for a sync store.
+
+        Args:
+            store (Union[Store[T], AsyncStore[T]]): Store to write through.
+            policy (Optional[BatchPolicy]): Size and delay of the batches.
+            unit_of_work (Optional[Callable[[], AsyncContextManager[None]]]):
+                Opens a unit of work, so the writes of a batch commit in a
+                single transaction.
+        """
+        self._store = store
+        self._policy = policy or BatchPolicy()
+        self._unit_of_work = unit_of_work
+        self._pending: List[Tuple[str, Any, asyncio.Future]] = []
+        self._flusher: Optional[asyncio.Task] = None
+        self._full: Optional[asyncio.Event] = None
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._store, name)
+
+    async def create(self, value: T) -> UUID:
+        return await self._enqueue("create", value)
+
+    async def update(self, uuid: UUID, value: T, expected_version: Optional[int] = None) -> "BatchedStore[T]":
+        if expected_version is not None:
+            # A conditional write needs an answer of its own.
+            await _call(self._store.update, uuid, value, expected_version)
+        else:
+            await self._enqueue("update", (uuid, value))
+
+        return self
+
+    def _enqueue(self, kind: str, item: Any) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((kind, item, future))
+
+        if self._flusher is None or self._flusher.done():
+            self._full = asyncio.Event()
+            # A fresh context keeps the flush out of the unit of work of the
+            # request that happened to start it.
+            self._flusher = asyncio.create_task(self._run(), context=contextvars.Context())
+
+        if len(self._pending) >= self._policy.max_items:
+            self._full.set()
+
+        return future
+
+    async def _run(self) -> None:
+        while self._pending:
+            if len(self._pending) < self._policy.max_items:
+                try:
+                    await asyncio.wait_for(self._full.wait(), self._policy.max_delay)
+                except asyncio.TimeoutError:
+                    pass
+
+            self._full.clear()
+            batch = self._pending[:self._policy.max_items]
+            del self._pending[:self._policy.max_items]
+
+            await self._flush(batch)
+
+    async def _flush(self, batch: List[Tuple[str, Any, asyncio.Future]]) -> None:
+        """
+        _flush writes a batch in one unit of work, then resolves the future
+        of every write in it. If the batch fails, each write is retried in
+        its own unit of work.
+
+        Args:
+            batch (List[Tuple[str, Any, asyncio.Future]]): Kind, argument
+                and future of each write.
+        """
+        creates = [item for kind, item, _ in batch if kind == "create"]
+        updates = dict(item for kind, item, _ in batch if kind == "update")
+
+        try:
+            async with self._transaction():
+                uuids = iter(await _call(self._store.create_many, creates) if creates else ())
+
+                if updates:
+                    await _call(self._store.update_many, updates)
+        except Exception:
+            for kind, item, future in batch:
+                try:
+                    async with self._transaction():
+                        if kind == "create":
+                            result = await _call(self._store.create, item)
+                        else:
+                            result = await _call(self._store.update, *item)
+                except Exception as error:
+                    _resolve(future, error=error)
+                else:
+                    _resolve(future, result)
+
+            return
+
+        for kind, _, future in batch:
+            _resolve(future, next(uuids) if kind == "create" else None)
+
+    def _transaction(self) -> AsyncContextManager[None]:
+        if self._unit_of_work is None:
+            return contextlib.nullcontext()
+
+        return self._unit_of_work()
+
+
+def _resolve(future: asyncio.Future, result: Any = None, error: Optional[BaseException] = None) -> None:
+    # The caller may have been cancelled while its write was in flight.
+    if future.done():
+        return
+
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
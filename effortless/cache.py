@@ -0,0 +1,451 @@
+# Copyright (c) 2021-2023 Johnathan P. Irvin
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+import functools
+import inspect
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import (Any, Callable, Dict, Generic, Hashable, Optional, Sequence,
+                    Tuple, TypeVar, Union)
+from uuid import UUID
+
+from .store import AsyncStore, Filter, Store
+
+T = TypeVar("T")
+
+_MISSING = object()
+
+
+@dataclass
+class CachePolicy:
+    """
+    CachePolicy configures the read-through cache of a single model.
+
+    Args:
+        maxsize (int): Most objects kept before the least recently used
+            one is evicted.
+        ttl (float): Seconds an object is served from the cache before it
+            is read from the store again.
+        aggregates (bool): Also cache counts and aggregates, which every
+            write through the cache discards.
+    """
+    maxsize: int = 1024
+    ttl: float = 60.0
+    aggregates: bool = False
+
+
+class _LRUCache:
+    def __init__(self, policy: CachePolicy) -> None:
+        """
+        _LRUCache is a thread-safe, bounded mapping whose entries expire.
+
+        Args:
+            policy (CachePolicy): Size and expiry of the cache.
+        """
+        self._policy = policy
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def generation(self) -> int:
+        """
+        generation changes whenever an entry is invalidated. A reader that
+        saw a different generation before going to the store may hold a
+        value that was overwritten meanwhile, so set ignores it.
+        """
+        return self._generation
+
+    def get(self, key: Hashable) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is None or entry[0] < time.monotonic():
+                self.misses += 1
+
+                return _MISSING
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+
+            return entry[1]
+
+    def set(self, key: Hashable, value: Any, generation: int) -> None:
+        with self._lock:
+            if generation != self._generation:
+                return
+
+            self._entries[key] = (time.monotonic() + self._policy.ttl, value)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self._policy.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, *keys: Hashable) -> None:
+        with self._lock:
+            self._generation += 1
+
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+
+def _aggregate_key(*parts: Any, filters: Sequence[Filter]) -> Hashable:
+    conditions = tuple(
+        (condition.field, condition.op, tuple(condition.value) if isinstance(condition.value, list) else condition.value)
+        for condition in filters
+    )
+
+    return (*parts, conditions)
+
+
+class CachedStore(Generic[T]):
+    def __init__(
+        self,
+        store: Store[T],
+        policy: Optional[CachePolicy] = None,
+        after_commit: Optional[Callable[[Callable[[], None]], None]] = None,
+        written: Optional[Callable[[], bool]] = None,
+    ) -> None:
+        """
+        CachedStore is a read-through cache in front of a store. Objects
+        read by get are kept in a bounded LRU until their TTL runs out or
+        they are written through this store. A read of some fields is
+        answered from a cached object, but is not cached itself. Counts and
+        aggregates are cached too if the policy asks for it, until the next
+        write through this store. Methods it does not cache are passed
+        straight to the wrapped store.
+
+        With a unit of work, written objects are discarded again once it
+        commits, since other readers see the old rows until then and may
+        cache them. Reads made after the unit of work has written bypass
+        the cache, as they may see writes that are not committed yet.
+
+        Args:
+            store (Store[T]): Store to cache.
+            policy (Optional[CachePolicy]): Size and expiry of the cache.
+            after_commit (Optional[Callable[[Callable[[], None]], None]]):
+                Runs a callback once the current unit of work commits.
+            written (Optional[Callable[[], bool]]): Whether the current unit
+                of work has uncommitted writes.
+        """
+        policy = policy or CachePolicy()
+
+        self._store = store
+        self._cache = _LRUCache(policy)
+        self._aggregates = _LRUCache(policy) if policy.aggregates else None
+        self._after_commit = after_commit
+        self._written = written
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._store, name)
+
+    @property
+    def hits(self) -> int:
+        return self._cache.hits
+
+    @property
+    def misses(self) -> int:
+        return self._cache.misses
+
+    def _discard(self, *uuids: str) -> None:
+        self._cache.invalidate(*uuids)
+
+        if self._aggregates is not None:
+            self._aggregates.clear()
+
+    def _invalidate(self, *uuids: str) -> None:
+        self._discard(*uuids)
+
+        if self._after_commit is not None:
+            self._after_commit(functools.partial(self._discard, *uuids))
+
+    def _bypass(self) -> bool:
+        return self._written is not None and self._written()
+
+    def get(self, uuid: UUID, fields: Optional[Sequence[str]] = None) -> Optional[T]:
+        if self._bypass():
+            return self._store.get(uuid, fields)
+
+        value = self._cache.get(str(uuid))
+
+        if value is not _MISSING:
+            return value
+
+        generation = self._cache.generation
+        value = self._store.get(uuid, fields)
+
+        if value is not None and fields is None:
+            self._cache.set(str(uuid), value, generation)
+
+        return value
+
+    def update(self, uuid: UUID, value: T, expected_version: Optional[int] = None) -> "CachedStore[T]":
+        if expected_version is None:
+            # Stores without versions take no expected_version.
+            self._store.update(uuid, value)
+        else:
+            self._store.update(uuid, value, expected_version)
+        self._invalidate(str(uuid))
+
+        return self
+
+    def patch(self, uuid: UUID, values: Dict[str, Any]) -> "CachedStore[T]":
+        self._store.patch(uuid, values)
+        self._invalidate(str(uuid))
+
+        return self
+
+    def delete(self, uuid: UUID) -> "CachedStore[T]":
+        self._store.delete(uuid)
+        self._invalidate(str(uuid))
+
+        return self
+
+    def create(self, value: T) -> UUID:
+        uuid = self._store.create(value)
+        self._invalidate(str(uuid))
+
+        return uuid
+
+    def create_many(self, values: list[T]) -> list[UUID]:
+        uuids = self._store.create_many(values)
+        self._invalidate(*map(str, uuids))
+
+        return uuids
+
+    def update_many(self, values: Dict[UUID, T]) -> "CachedStore[T]":
+        self._store.update_many(values)
+        self._invalidate(*map(str, values))
+
+        return self
+
+    def delete_many(self, uuids: list[UUID]) -> "CachedStore[T]":
+        self._store.delete_many(uuids)
+        self._invalidate(*map(str, uuids))
+
+        return self
+
+    def count(self, filters: Sequence[Filter] = ()) -> int:
+        if self._aggregates is None:
+            return self._store.count(filters)
+
+        return self.aggregate("count", filters=filters)[None]
+
+    def aggregate(
+        self,
+        op: str,
+        field: Optional[str] = None,
+        group_by: Optional[str] = None,
+        filters: Sequence[Filter] = (),
+    ) -> Dict[Any, Any]:
+        if self._aggregates is None or self._bypass():
+            return self._store.aggregate(op, field, group_by, filters)
+
+        key = _aggregate_key(op, field, group_by, filters=filters)
+        results = self._aggregates.get(key)
+
+        if results is not _MISSING:
+            return results
+
+        generation = self._aggregates.generation
+        results = self._store.aggregate(op, field, group_by, filters)
+        self._aggregates.set(key, results, generation)
+
+        return results
+
+
+class AsyncCachedStore(Generic[T]):
+    def __init__(
+        self,
+        store: AsyncStore[T],
+        policy: Optional[CachePolicy] = None,
+        after_commit: Optional[Callable[[Callable[[], None]], None]] = None,
+        written: Optional[Callable[[], bool]] = None,
+    ) -> None:
+        """
+        AsyncCachedStore is the CachedStore counterpart for async stores.
+
+        Args:
+            store (AsyncStore[T]): Store to cache.
+            policy (Optional[CachePolicy]): Size and expiry of the cache.
+            after_commit (Optional[Callable[[Callable[[], None]], None]]):
+                Runs a callback once the current unit of work commits.
+            written (Optional[Callable[[], bool]]): Whether the current unit
+                of work has uncommitted writes.
+        """
+        policy = policy or CachePolicy()
+
+        self._store = store
+        self._cache = _LRUCache(policy)
+        self._aggregates = _LRUCache(policy) if policy.aggregates else None
+        self._after_commit = after_commit
+        self._written = written
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._store, name)
+
+    @property
+    def hits(self) -> int:
+        return self._cache.hits
+
+    @property
+    def misses(self) -> int:
+        return self._cache.misses
+
+    def _discard(self, *uuids: str) -> None:
+        self._cache.invalidate(*uuids)
+
+        if self._aggregates is not None:
+            self._aggregates.clear()
+
+    def _invalidate(self, *uuids: str) -> None:
+        self._discard(*uuids)
+
+        if self._after_commit is not None:
+            self._after_commit(functools.partial(self._discard, *uuids))
+
+    def _bypass(self) -> bool:
+        return self._written is not None and self._written()
+
+    async def get(self, uuid: UUID, fields: Optional[Sequence[str]] = None) -> Optional[T]:
+        if self._bypass():
+            return await self._store.get(uuid, fields)
+
+        value = self._cache.get(str(uuid))
+
+        if value is not _MISSING:
+            return value
+
+        generation = self._cache.generation
+        value = await self._store.get(uuid, fields)
+
+        if value is not None and fields is None:
+            self._cache.set(str(uuid), value, generation)
+
+        return value
+
+    async def update(self, uuid: UUID, value: T, expected_version: Optional[int] = None) -> "AsyncCachedStore[T]":
+        if expected_version is None:
+            # Stores without versions take no expected_version.
+            await self._store.update(uuid, value)
+        else:
+            await self._store.update(uuid, value, expected_version)
+        self._invalidate(str(uuid))
+
+        return self
+
+    async def patch(self, uuid: UUID, values: Dict[str, Any]) -> "AsyncCachedStore[T]":
+        await self._store.patch(uuid, values)
+        self._invalidate(str(uuid))
+
+        return self
+
+    async def delete(self, uuid: UUID) -> "AsyncCachedStore[T]":
+        await self._store.delete(uuid)
+        self._invalidate(str(uuid))
+
+        return self
+
+    async def create(self, value: T) -> UUID:
+        uuid = await self._store.create(value)
+        self._invalidate(str(uuid))
+
+        return uuid
+
+    async def create_many(self, values: list[T]) -> list[UUID]:
+        uuids = await self._store.create_many(values)
+        self._invalidate(*map(str, uuids))
+
+        return uuids
+
+    async def update_many(self, values: Dict[UUID, T]) -> "AsyncCachedStore[T]":
+        await self._store.update_many(values)
+        self._invalidate(*map(str, values))
+
+        return self
+
+    async def delete_many(self, uuids: list[UUID]) -> "AsyncCachedStore[T]":
+        await self._store.delete_many(uuids)
+        self._invalidate(*map(str, uuids))
+
+        return self
+
+    async def count(self, filters: Sequence[Filter] = ()) -> int:
+        if self._aggregates is None:
+            return await self._store.count(filters)
+
+        return (await self.aggregate("count", filters=filters))[None]
+
+    async def aggregate(
+        self,
+        op: str,
+        field: Optional[str] = None,
+        group_by: Optional[str] = None,
+        filters: Sequence[Filter] = (),
+    ) -> Dict[Any, Any]:
+        if self._aggregates is None or self._bypass():
+            return await self._store.aggregate(op, field, group_by, filters)
+
+        key = _aggregate_key(op, field, group_by, filters=filters)
+        results = self._aggregates.get(key)
+
+        if results is not _MISSING:
+            return results
+
+        generation = self._aggregates.generation
+        results = await self._store.aggregate(op, field, group_by, filters)
+        self._aggregates.set(key, results, generation)
+
+        return results
+
+
+def cache_store(
+    store: Union[Store[T], AsyncStore[T]],
+    policy: Optional[CachePolicy] = None,
+    after_commit: Optional[Callable[[Callable[[], None]], None]] = None,
+    written: Optional[Callable[[], bool]] = None,
+) -> Union[CachedStore[T], AsyncCachedStore[T]]:
+    """
+    cache_store wraps a store in the cache matching its flavour.
+
+    Args:
+        store (Union[Store[T], AsyncStore[T]]): Store to cache.
+        policy (Optional[CachePolicy]): Size and expiry of the cache.
+        after_commit (Optional[Callable[[Callable[[], None]], None]]): Runs
+            a callback once the current unit of work commits.
+        written (Optional[Callable[[], bool]]): Whether the current unit of
+            work has uncommitted writes.
+
+    Returns:
+        Union[CachedStore[T], AsyncCachedStore[T]]: Cached store.
+    """
+    if inspect.iscoroutinefunction(store.get):
+        return AsyncCachedStore(store, policy, after_commit, written)
+
+    return CachedStore(store, policy, after_commit, written)
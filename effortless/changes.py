@@ -0,0 +1,255 @@
+# Copyright (c) 2021-2023 Johnathan P. Irvin
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+import asyncio
+import functools
+import inspect
+import threading
+from collections import deque
+from dataclasses import dataclass
+from typing import (Any, AsyncIterator, Callable, Deque, Dict, Iterable, List,
+                    Optional, Set)
+
+_OVERFLOW = object()
+
+_WRITES: Dict[str, Any] = {
+    "create": ("created", lambda args, result: [result]),
+    "create_many": ("created", lambda args, result: result),
+    "update": ("updated", lambda args, result: [args[0]]),
+    "patch": ("updated", lambda args, result: [args[0]]),
+    "update_many": ("updated", lambda args, result: list(args[0])),
+    "delete": ("deleted", lambda args, result: [args[0]]),
+    "delete_many": ("deleted", lambda args, result: list(dict.fromkeys(args[0]))),
+}
+
+
+@dataclass(frozen=True)
+class Change:
+    """
+    Change is a single create, update or delete published to a ChangeFeed.
+    A change with the reset action tells a subscriber that the changes it
+    asked to resume from are gone, so it has to reload the collection.
+
+    Args:
+        sequence (int): Position of the change in the feed.
+        model (str): Model name.
+        action (str): created, updated, deleted or reset.
+        uuid (Optional[str]): Object that changed.
+    """
+    sequence: int
+    model: str
+    action: str
+    uuid: Optional[str] = None
+
+
+class _Subscriber:
+    def __init__(self, model: str, backlog: int) -> None:
+        self.model = model
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self._loop = asyncio.get_running_loop()
+        self._backlog = backlog
+
+    def deliver(self, changes: List[Change]) -> None:
+        changes = [change for change in changes if change.model == self.model]
+
+        if changes:
+            self._loop.call_soon_threadsafe(self._put, changes)
+
+    def _put(self, changes: List[Change]) -> None:
+        # A subscriber too slow to keep up is cut off. It resumes from the
+        # history when it reconnects.
+        if self.queue.qsize() + len(changes) > self._backlog:
+            self.queue.put_nowait(_OVERFLOW)
+
+            return
+
+        for change in changes:
+            self.queue.put_nowait(change)
+
+
+class ChangeFeed:
+    def __init__(self, history: int = 1024, backlog: int = 1024, heartbeat: float = 15.0) -> None:
+        """
+        ChangeFeed broadcasts the changes of every store to subscribers in
+        the same process. Changes are numbered in the order they are
+        published, and the latest ones are kept, so a subscriber which
+        reconnects resumes from the last change it saw.
+
+        Args:
+            history (int): Changes kept for subscribers to resume from.
+            backlog (int): Changes queued for a subscriber before it is
+                cut off.
+            heartbeat (float): Seconds of silence after which subscribers
+                are woken up, so they can keep their connection alive.
+        """
+        self._history: Deque[Change] = deque(maxlen=history)
+        self._backlog = backlog
+        self._heartbeat = heartbeat
+        self._sequence = 0
+        self._subscribers: Set[_Subscriber] = set()
+        self._lock = threading.Lock()
+
+    @property
+    def sequence(self) -> int:
+        return self._sequence
+
+    def publish(self, model: str, action: str, uuids: Iterable[Any]) -> None:
+        """
+        publish numbers a change for each object and hands them to the
+        subscribers of the model. It is safe to call from any thread.
+
+        Args:
+            model (str): Model name.
+            action (str): created, updated or deleted.
+            uuids (Iterable[Any]): Objects that changed.
+        """
+        with self._lock:
+            changes = []
+
+            for uuid in uuids:
+                self._sequence += 1
+                changes.append(Change(self._sequence, model, action, str(uuid)))
+
+            self._history.extend(changes)
+
+            # Delivering under the lock keeps every queue in sequence order.
+            for subscriber in list(self._subscribers):
+                try:
+                    subscriber.deliver(changes)
+                except RuntimeError:
+                    # The event loop of the subscriber has closed.
+                    self._subscribers.discard(subscriber)
+
+    async def subscribe(self, model: str, after: Optional[int] = None) -> AsyncIterator[Optional[Change]]:
+        """
+        subscribe yields the changes of a model as they are published.
+        None is yielded whenever heartbeat seconds pass without a change.
+
+        Args:
+            model (str): Model name.
+            after (Optional[int]): Sequence of the last change seen. The
+                changes after it are replayed first, or a reset change is
+                yielded if they are no longer kept.
+
+        Returns:
+            AsyncIterator[Optional[Change]]: Changes of the model.
+        """
+        subscriber = _Subscriber(model, self._backlog)
+
+        with self._lock:
+            self._subscribers.add(subscriber)
+            last = self._sequence if after is None else after
+            oldest = self._history[0].sequence if self._history else self._sequence + 1
+            resumable = after is None or oldest - 1 <= after <= self._sequence
+            missed = [change for change in self._history if change.model == model and change.sequence > last]
+
+        try:
+            if not resumable:
+                last = self._sequence
+                missed = []
+
+                yield Change(last, model, "reset")
+
+            for change in missed:
+                last = change.sequence
+
+                yield change
+
+            while True:
+                try:
+                    change = await asyncio.wait_for(subscriber.queue.get(), self._heartbeat)
+                except asyncio.TimeoutError:
+                    yield None
+
+                    continue
+
+                if change is _OVERFLOW:
+                    return
+
+                # Changes replayed from the history may also have been queued.
+                if change.sequence > last:
+                    last = change.sequence
+
+                    yield change
+        finally:
+            with self._lock:
+                self._subscribers.discard(subscriber)
+
+
+class PublishingStore:
+    def __init__(
+        self,
+        store: Any,
+        feed: ChangeFeed,
+        model: str,
+        after_commit: Optional[Callable[[Callable[[], None]], None]] = None,
+    ) -> None:
+        """
+        PublishingStore publishes every write made through a store to a
+        ChangeFeed. Other methods are passed straight to the wrapped store.
+
+        Args:
+            store (Any): Store to publish the writes of, sync or async.
+            feed (ChangeFeed): Feed to publish to.
+            model (str): Model name the changes are published under.
+            after_commit (Optional[Callable[[Callable[[], None]], None]]):
+                Defers a callback until the unit of work commits, so
+                subscribers never hear of writes that were rolled back.
+        """
+        self._store = store
+        self._feed = feed
+        self._model = model
+        self._after_commit = after_commit
+
+    def __getattr__(self, name: str) -> Any:
+        method = getattr(self._store, name)
+
+        if name not in _WRITES:
+            return method
+
+        action, changed = _WRITES[name]
+
+        def publish(args: tuple, result: Any) -> None:
+            callback = functools.partial(self._feed.publish, self._model, action, changed(args, result))
+
+            if self._after_commit is None:
+                callback()
+            else:
+                self._after_commit(callback)
+
+        if inspect.iscoroutinefunction(method):
+            @functools.wraps(method)
+            async def published(*args: Any) -> Any:
+                result = await method(*args)
+                publish(args, result)
+
+                return result
+        else:
+            @functools.wraps(method)
+            def published(*args: Any) -> Any:
+                result = method(*args)
+                publish(args, result)
+
+                return result
+
+        # Cache the wrapper so later calls skip __getattr__.
+        setattr(self, name, published)
+
+        return published
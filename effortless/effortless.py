@@ -18,8 +18,18 @@
 # LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
 # OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
 # WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+import logging
+import time
 from types import ModuleType
-from typing import Any
+from typing import Any, Dict, Optional
+
+from .admission import AdmissionPolicy
+from .batching import BatchedStore, BatchPolicy
+from .cache import CachePolicy, cache_store
+from .changes import ChangeFeed, PublishingStore
+from .metrics import InstrumentedStore, Metrics
+
+logger = logging.getLogger(__name__)
 
 
 class Effortless:
@@ -33,17 +43,149 @@ class Effortless:
         """
         self._orm = orm
         self._web = web
-    
-    def build(self, models: ModuleType) -> "Effortless":
+        self._timings: Dict[str, float] = {}
+
+    @property
+    def timings(self) -> Dict[str, float]:
+        """
+        timings is the time each startup phase took, with the phases of the
+        ORM under an orm. prefix. The ORM phases are read on every access,
+        so a phase the ORM runs later, such as the schema creation of the
+        async adapter before its first query, shows up once it is done.
+        """
+        return {
+            **{f"orm.{phase}": seconds for phase, seconds in getattr(self._orm, "timings", {}).items()},
+            **self._timings,
+        }
+
+    def build(
+        self,
+        models: ModuleType,
+        cache: Optional[Dict[type, CachePolicy]] = None,
+        batch: Optional[Dict[type, BatchPolicy]] = None,
+        changes: Optional[ChangeFeed] = None,
+        metrics: Optional[Metrics] = None,
+        admission: Optional[Dict[Any, AdmissionPolicy]] = None,
+    ) -> "Effortless":
         """
         Serve is a method that starts the server.
 
         Args:
             models (ModuleType): Module containing dataclasses.
+            cache (Optional[Dict[type, CachePolicy]]): Models whose stores
+                are wrapped in a read-through cache, with the policy of
+                each cache.
+            batch (Optional[Dict[type, BatchPolicy]]): Models whose creates
+                and updates are coalesced into batches, with the policy of
+                each.
+            changes (Optional[ChangeFeed]): Feed every write is published
+                to once it commits, served as server-sent events at
+                /{name}/_changes.
+            metrics (Optional[Metrics]): Registry to record route, store,
+                pool and cache metrics into, served at /metrics. Nothing is
+                instrumented without it.
+            admission (Optional[Dict[Any, AdmissionPolicy]]): Limits on the
+                requests served at once, by model or by a tuple of a model
+                and an operation. Requests beyond them are answered 503.
         """
+        started = time.perf_counter()
         stores = self._orm.create_stores(models=models)
 
-        self._web.create_routes(models=models, stores=stores)
+        for model, policy in (cache or {}).items():
+            stores[model] = cache_store(
+                stores[model],
+                policy,
+                getattr(self._orm, "after_commit", None),
+                getattr(self._orm, "written", None),
+            )
+
+        cached = {model: stores[model] for model in cache or {}}
+
+        for model, policy in (batch or {}).items():
+            stores[model] = BatchedStore(stores[model], policy, getattr(self._orm, "unit_of_work", None))
+
+        if changes is not None:
+            stores = {
+                model: PublishingStore(store, changes, model.__name__.lower(), getattr(self._orm, "after_commit", None))
+                for model, store in stores.items()
+            }
+            self._web.stream_changes(changes)
+
+        if metrics is not None:
+            stores = self._instrument(stores, cached, metrics)
+
+        # Frameworks are only asked for what the ORM and the caller use, so
+        # ones without units of work or admission control still fit.
+        unit_of_work = getattr(self._orm, "unit_of_work", None)
+        options = {
+            **({} if unit_of_work is None else {"unit_of_work": unit_of_work}),
+            **({} if admission is None else {"admission": admission}),
+        }
+        routing = time.perf_counter()
+        self._web.create_routes(models=models, stores=stores, **options)
+
+        self._report(stores=routing - started, routes=time.perf_counter() - routing)
 
         return self._web._app
+
+    def _instrument(self, stores: Dict[type, Any], cached: Dict[type, Any], metrics: Metrics) -> Dict[type, Any]:
+        """
+        _instrument times every store, reports the hit and miss counts of
+        cached stores, and lets the ORM and web framework record their own
+        metrics.
+
+        Args:
+            stores (Dict[type, Any]): Stores by model.
+            cached (Dict[type, Any]): Cached stores by model, before any
+                other wrapping.
+            metrics (Metrics): Registry to record into.
+
+        Returns:
+            Dict[type, Any]: Instrumented stores by model.
+        """
+        cached = {model.__name__.lower(): store for model, store in cached.items()}
+
+        def hit_ratios() -> Dict[Any, float]:
+            return {
+                (("model", name),): store.hits / (store.hits + store.misses)
+                for name, store in cached.items()
+                if store.hits + store.misses
+            }
+
+        metrics.collect(
+            "effortless_cache_hits_total", "Reads served from a cache.", "counter",
+            lambda: {(("model", name),): store.hits for name, store in cached.items()},
+        )
+        metrics.collect(
+            "effortless_cache_misses_total", "Reads a cache passed to its store.", "counter",
+            lambda: {(("model", name),): store.misses for name, store in cached.items()},
+        )
+        metrics.collect("effortless_cache_hit_ratio", "Share of reads served from a cache.", "gauge", hit_ratios)
+
+        if hasattr(self._orm, "instrument"):
+            self._orm.instrument(metrics)
+
+        self._web.instrument(metrics)
+
+        return {
+            model: InstrumentedStore(store, metrics, model.__name__.lower())
+            for model, store in stores.items()
+        }
+
+    def _report(self, stores: float, routes: float) -> None:
+        """
+        _report keeps the time each startup phase took in timings, and logs
+        a summary.
+
+        Args:
+            stores (float): Seconds spent creating the stores.
+            routes (float): Seconds spent creating the routes.
+        """
+        self._timings = {"stores": stores, "routes": routes}
+
+        logger.info(
+            "Built in %.1f ms (%s)",
+            (stores + routes) * 1000,
+            ", ".join(f"{phase} {seconds * 1000:.1f} ms" for phase, seconds in self.timings.items()),
+        )
  
\ No newline at end of file
@@ -0,0 +1,182 @@
+# Copyright (c) 2021-2023 Johnathan P. Irvin
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+import enum
+import json
+from collections import OrderedDict
+from dataclasses import fields
+from typing import Any, Callable, Dict, Iterable, Optional, Sequence, Tuple
+
+from .store import relation
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+
+def _dumps(value: Any) -> bytes:
+    """
+    _dumps writes plain JSON data as compact UTF-8 bytes, with the same
+    output as FastAPI's JSONResponse.
+
+    Args:
+        value (Any): Dictionaries, lists and scalars.
+
+    Returns:
+        bytes: Encoded JSON.
+    """
+    if orjson is not None:
+        return orjson.dumps(value)
+
+    return json.dumps(
+        value,
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=None,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+class ModelEncoder:
+    def __init__(self, model: type, maxsize: int = 128) -> None:
+        """
+        ModelEncoder serializes instances of one dataclass straight to JSON
+        bytes. The conversion of every field is decided once from the field
+        types, instead of jsonable_encoder inspecting each value on every
+        response.
+
+        Args:
+            model (type): Dataclass to encode.
+            maxsize (int): Most compiled fieldsets kept before the least
+                recently used one is dropped.
+        """
+        self._model = model
+        self._maxsize = maxsize
+        self._types = {field.name: field.type for field in fields(model)}
+        self._types["id"] = str
+        self._compiled: "OrderedDict[Tuple[str, ...], Callable[[Any], dict]]" = OrderedDict()
+        self._default = tuple(field.name for field in fields(model))
+
+    def _compile(self, names: Tuple[str, ...]) -> Callable[[Any], dict]:
+        """
+        _compile generates a function building the JSON object of a model
+        instance, with one dictionary entry per field.
+
+        Args:
+            names (Tuple[str, ...]): Fields to encode.
+
+        Returns:
+            Callable[[Any], dict]: Function from an instance to a dictionary.
+        """
+        entries = []
+        namespace: Dict[str, Any] = {}
+
+        for name in names:
+            value = f"value.{name}"
+            related, many = relation(self._types[name])
+
+            if related is not None:
+                # Related objects are encoded with their own compiled function.
+                namespace[f"encode_{name}"] = ModelEncoder(related).encoder()
+
+                if many:
+                    entries.append(f"    {name!r}: [encode_{name}(item) for item in {value}],")
+                else:
+                    entries.append(f"    {name!r}: None if {value} is None else encode_{name}({value}),")
+            elif issubclass(self._types[name], enum.Enum):
+                entries.append(f"    {name!r}: None if {value} is None else {value}.value,")
+            else:
+                entries.append(f"    {name!r}: {value},")
+
+        source = "def encode(value):\n  return {\n" + "\n".join(entries) + "\n  }\n"
+
+        exec(compile(source, f"<encoder {self._model.__name__}>", "exec"), namespace)
+
+        return namespace["encode"]
+
+    def encoder(self, fields: Optional[Sequence[str]] = None) -> Callable[[Any], dict]:
+        """
+        encoder returns the compiled function for a set of fields, compiling
+        it on first use.
+
+        Args:
+            fields (Optional[Sequence[str]]): Fields to encode, or None for
+                every field of the dataclass.
+
+        Returns:
+            Callable[[Any], dict]: Function from an instance to a dictionary.
+        """
+        names = self._default if fields is None else tuple(fields)
+        encode = self._compiled.get(names)
+
+        if encode is None:
+            encode = self._compiled[names] = self._compile(names)
+
+            if len(self._compiled) > self._maxsize:
+                self._compiled.popitem(last=False)
+        else:
+            self._compiled.move_to_end(names)
+
+        return encode
+
+    def encode(self, value: Any, fields: Optional[Sequence[str]] = None) -> bytes:
+        """
+        encode serializes one instance, or null for None.
+
+        Args:
+            value (Any): Instance of the model, or None.
+            fields (Optional[Sequence[str]]): Fields to encode.
+
+        Returns:
+            bytes: Encoded JSON.
+        """
+        if value is None:
+            return b"null"
+
+        return _dumps(self.encoder(fields)(value))
+
+    def encode_many(self, values: Iterable[Any], fields: Optional[Sequence[str]] = None) -> bytes:
+        """
+        encode_many serializes instances as a JSON array.
+
+        Args:
+            values (Iterable[Any]): Instances of the model.
+            fields (Optional[Sequence[str]]): Fields to encode.
+
+        Returns:
+            bytes: Encoded JSON.
+        """
+        encode = self.encoder(fields)
+
+        return _dumps([encode(value) for value in values])
+
+    def encode_line(self, value: Any, fields: Optional[Sequence[str]] = None) -> bytes:
+        """
+        encode_line serializes one instance as a line of NDJSON.
+
+        Args:
+            value (Any): Instance of the model.
+            fields (Optional[Sequence[str]]): Fields to encode.
+
+        Returns:
+            bytes: Encoded JSON followed by a newline.
+        """
+        return _dumps(self.encoder(fields)(value)) + b"\n"
@@ -18,46 +18,933 @@
 # LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
 # OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
 # WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+import contextlib
+import functools
+import inspect
+import json
+import logging
+import time
+import zlib
+from email.utils import formatdate
+from dataclasses import MISSING
+from dataclasses import fields as dataclass_fields
 from types import ModuleType
-from typing import Dict, TypeVar
+from typing import (Any, AsyncContextManager, AsyncIterator, Callable, Dict,
+                    Iterator, List, Optional, Sequence, Tuple, TypeVar,
+                    Union, get_args)
 
-from fastapi import FastAPI
+from fastapi import (Depends, FastAPI, Header, HTTPException, Query, Request,
+                     Response)
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from fastapi.routing import APIRoute
+from pydantic import (Field, ValidationError, create_model, parse_obj_as,
+                      root_validator)
+from starlette.datastructures import QueryParams
 
-from .store import Store
+from .admission import OPERATIONS, AdmissionPolicy, Gate, Overloaded
+from .changes import Change, ChangeFeed
+from .encoders import ModelEncoder
+from .metrics import COUNT_BUCKETS, Metrics
+from .store import (AGGREGATES, NUMERIC_AGGREGATES, AsyncStore, Conflict,
+                    Filter, Store, VersionConflict, numeric, relation)
+from .transfer import csv_lines, csv_records, ndjson_lines, ndjson_records
 
 T = TypeVar("T")
 
+logger = logging.getLogger(__name__)
+
+_RESERVED_PARAMETERS = {"limit", "after", "stream", "fields", "op", "field", "group_by", "format", "batch_size"}
+_FORMATS = {"ndjson", "csv"}
+_FILTER_OPERATORS = {"eq", "lt", "lte", "gt", "gte", "in"}
+
+
+async def _call(method: Callable[..., Any], *args: Any) -> Any:
+    """
+    _call awaits a store method. Async store methods run on the event loop,
+    while blocking store methods are handed off to the threadpool, the same
+    as FastAPI does for plain def handlers.
+
+    Args:
+        method (Callable[..., Any]): Bound store method.
+
+    Returns:
+        Any: Result of the store method.
+    """
+    if inspect.iscoroutinefunction(method):
+        return await method(*args)
+
+    return await run_in_threadpool(method, *args)
+
+
+class _EncodedResponse(Response):
+    """
+    _EncodedResponse sends a body that a ModelEncoder already serialized,
+    so FastAPI neither validates nor re-encodes it.
+    """
+    media_type = "application/json"
+
+
+def _ndjson(
+    values: Union[Iterator[Any], AsyncIterator[Any]],
+    encoder: ModelEncoder,
+    fields: Optional[List[str]] = None,
+) -> Union[Iterator[bytes], AsyncIterator[bytes]]:
+    """
+    _ndjson encodes each value as one line of newline-delimited JSON, so a
+    collection can be streamed without holding all of it in memory.
+
+    Args:
+        values (Union[Iterator[Any], AsyncIterator[Any]]): Values to encode.
+        encoder (ModelEncoder): Encoder of the model.
+        fields (Optional[List[str]]): Fields to encode, or None for all.
+
+    Returns:
+        Union[Iterator[bytes], AsyncIterator[bytes]]: Encoded lines.
+    """
+    if not inspect.isasyncgen(values):
+        return (encoder.encode_line(value, fields) for value in values)
+
+    async def lines() -> AsyncIterator[bytes]:
+        async for value in values:
+            yield encoder.encode_line(value, fields)
+
+    return lines()
+
+
+async def _events(changes: AsyncIterator[Optional[Change]]) -> AsyncIterator[bytes]:
+    """
+    _events writes changes as server-sent events. The sequence of a change
+    is its event id, so a reconnecting client resumes after it through the
+    Last-Event-ID header. Quiet periods are filled with comments, which
+    keep proxies from closing the connection.
+
+    Args:
+        changes (AsyncIterator[Optional[Change]]): Changes, with None for
+            a quiet period.
+
+    Returns:
+        AsyncIterator[bytes]: Encoded events.
+    """
+    async for change in changes:
+        if change is None:
+            yield b": keepalive\n\n"
+
+            continue
+
+        data = json.dumps({"uuid": change.uuid} if change.uuid is not None else {})
+
+        yield f"id: {change.sequence}\nevent: {change.action}\ndata: {data}\n\n".encode()
+
+
+def _fields(model: type, fields: Optional[str]) -> Optional[List[str]]:
+    """
+    _fields reads a sparse fieldset such as fields=id,status. Names are
+    deduplicated and put in the order of the model, so every spelling of
+    a fieldset shares one compiled encoder and one ETag.
+
+    Args:
+        model (type): Dataclass being read.
+        fields (Optional[str]): Comma separated field names.
+
+    Raises:
+        HTTPException: 400 if a name is not a field of the model.
+
+    Returns:
+        Optional[List[str]]: Field names, or None to read every field.
+    """
+    if fields is None:
+        return None
+
+    names = {name for name in fields.split(",") if name}
+    known = ["id", *(field.name for field in dataclass_fields(model))]
+    unknown = names - set(known)
+
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields {sorted(unknown)}")
+
+    return [name for name in known if name in names]
+
+
+def _aggregate(model: type, op: str, field: Optional[str], group_by: Optional[str]) -> None:
+    """
+    _aggregate checks the parameters of an aggregate, such as
+    op=sum&field=estimate&group_by=status.
+
+    Args:
+        model (type): Dataclass being aggregated.
+        op (str): Aggregate to compute.
+        field (Optional[str]): Field to compute it over.
+        group_by (Optional[str]): Field to group by.
+
+    Raises:
+        HTTPException: 400 if op is unknown, a field is not a column of
+            the model, op needs a field and none is given, or op needs a
+            number and the field does not hold one.
+    """
+    columns = {field.name for field in dataclass_fields(model) if relation(field.type)[0] is None} | {"id"}
+
+    if op not in AGGREGATES:
+        raise HTTPException(status_code=400, detail=f"Unknown aggregate {op}, expected one of {list(AGGREGATES)}")
+
+    if field is None and op != "count":
+        raise HTTPException(status_code=400, detail=f"Aggregate {op} needs a field")
+
+    for name in (field, group_by):
+        if name is not None and name not in columns:
+            raise HTTPException(status_code=400, detail=f"Unknown field {name}")
+
+    types = {field.name: field.type for field in dataclass_fields(model)}
+
+    if op in NUMERIC_AGGREGATES and not numeric(types.get(field)):
+        raise HTTPException(status_code=400, detail=f"Aggregate {op} needs a numeric field, not {field}")
+
+
+def _filters(model: type, parameters: QueryParams) -> List[Filter]:
+    """
+    _filters reads field filters from the query string. A parameter is a
+    field name with an optional operator suffix, such as status=done,
+    name__in=a,b or priority__gte=3. Relationships cannot be filtered on.
+
+    Args:
+        model (type): Dataclass being filtered.
+        parameters (QueryParams): Query string of the request.
+
+    Raises:
+        HTTPException: 400 if a parameter names an unknown field or
+            operator, or its value does not convert to the field type.
+
+    Returns:
+        List[Filter]: Filters for the store.
+    """
+    types = {field.name: field.type for field in dataclass_fields(model) if relation(field.type)[0] is None}
+    types["id"] = str
+    filters = []
+
+    for key, raw in parameters.multi_items():
+        if key in _RESERVED_PARAMETERS:
+            continue
+
+        name, _, op = key.partition("__")
+        op = op or "eq"
+
+        if name not in types or op not in _FILTER_OPERATORS:
+            raise HTTPException(status_code=400, detail=f"Unknown filter {key}")
+
+        try:
+            if op == "in":
+                value = [types[name](item) for item in raw.split(",")]
+            else:
+                value = types[name](raw)
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Invalid value for filter {key}")
+
+        filters.append(Filter(field=name, op=op, value=value))
+
+    return filters
+
+
+def _field_type(annotation: Any) -> Any:
+    related, many = relation(annotation)
+
+    if related is None:
+        return annotation
+
+    return List[_body(related)] if many else Optional[_body(related)]
+
+
+@functools.lru_cache(maxsize=None)
+def _body(model: type) -> type:
+    """
+    _body builds the request body of a model. Pydantic validates a dataclass
+    by calling its __init__ with the raw JSON before converting the fields,
+    which the relationships of a mapped dataclass reject. Models with
+    related fields are therefore validated as a pydantic model of their
+    own, and turned into the dataclass by _instance.
+
+    Args:
+        model (type): Dataclass to build the body for.
+
+    Returns:
+        type: The dataclass itself, or a pydantic model with its fields.
+    """
+    if not any(relation(field.type)[0] is not None for field in dataclass_fields(model)):
+        return model
+
+    definitions = {}
+
+    for field in dataclass_fields(model):
+        if field.default_factory is not MISSING:
+            default = Field(default_factory=field.default_factory)
+        else:
+            default = ... if field.default is MISSING else field.default
+
+        definitions[field.name] = (_field_type(field.type), default)
+
+    return create_model(f"{model.__name__}Body", **definitions)
+
+
+def _value(annotation: Any, value: Any) -> Any:
+    related, many = relation(annotation)
+
+    if related is None or value is None:
+        return value
+
+    if many:
+        return [_instance(related, item) for item in value]
+
+    return _instance(related, value)
+
+
+def _instance(model: type, body: Any) -> Any:
+    """
+    _instance turns a request body built by _body into the dataclass.
+
+    Args:
+        model (type): Dataclass to build.
+        body (Any): Validated body, or already an instance of model.
+
+    Returns:
+        Any: Instance of model.
+    """
+    if isinstance(body, model):
+        return body
+
+    return model(**{field.name: _value(field.type, getattr(body, field.name)) for field in dataclass_fields(model)})
+
+
+def _format(format: str) -> str:
+    if format not in _FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unknown format {format}, expected one of {sorted(_FORMATS)}")
+
+    return format
+
+
+async def _imported(model: type, records: AsyncIterator[Dict[str, Any]]) -> AsyncIterator[Any]:
+    """
+    _imported validates the records of an import into instances of the
+    model, keeping the uuid of each record that has one.
+
+    Args:
+        model (type): Dataclass being imported.
+        records (AsyncIterator[Dict[str, Any]]): Parsed records.
+
+    Raises:
+        HTTPException: 400 naming the first record that does not parse or
+            validate.
+
+    Returns:
+        AsyncIterator[Any]: Instances of the model.
+    """
+    body = _body(model)
+    number = 0
+
+    try:
+        async for record in records:
+            number += 1
+            uuid = record.pop("id", None)
+            value = _instance(model, parse_obj_as(body, record))
+
+            if uuid:
+                value.id = str(uuid)
+
+            yield value
+    except (ValueError, ValidationError) as error:
+        # A record which fails to parse has not been counted yet.
+        raise HTTPException(status_code=400, detail=f"Invalid record {max(number, 1)}: {error}")
+
+
+def _etag(version: int, fields: Optional[Sequence[str]] = None) -> str:
+    """
+    _etag tags the representation of an object at a version. Sparse
+    fieldsets are other representations, so they get tags of their own.
+
+    Args:
+        version (int): Version of the object.
+        fields (Optional[Sequence[str]]): Fields sent, or None for all.
+
+    Returns:
+        str: Strong entity tag.
+    """
+    if fields is None:
+        return f'"{version}"'
+
+    return f'"{version};{",".join(fields)}"'
+
+
+def _collection_etag(version: Tuple[int, Optional[float]], query: str) -> str:
+    """
+    _collection_etag tags a collection by the number of its objects and
+    their latest update, and by the query string, which decides the
+    filters, fields and page sent.
+
+    Args:
+        version (Tuple[int, Optional[float]]): Count and latest update.
+        query (str): Query string of the request.
+
+    Returns:
+        str: Weak entity tag.
+    """
+    count, updated = version
+
+    return f'W/"{count}-{updated or 0}-{zlib.crc32(query.encode()):x}"'
+
+
+def _validators(etag: str, updated: Optional[float]) -> Dict[str, str]:
+    headers = {"ETag": etag}
+
+    if updated is not None:
+        headers["Last-Modified"] = formatdate(updated, usegmt=True)
+
+    return headers
+
+
+def _none_match(header: Optional[str], etag: str) -> bool:
+    """
+    _none_match tells whether If-None-Match names the current tag, using
+    the weak comparison the header calls for.
+
+    Args:
+        header (Optional[str]): Value of If-None-Match.
+        etag (str): Current entity tag.
+
+    Returns:
+        bool: True if the client's copy is current.
+    """
+    if header is None:
+        return False
+
+    tags = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+
+    return "*" in tags or etag.removeprefix("W/") in tags
+
+
+def _expected_version(header: Optional[str]) -> Optional[int]:
+    """
+    _expected_version reads the version If-Match requires. Only the strong
+    tag of a whole object names a version, so anything else fails the
+    precondition.
+
+    Args:
+        header (Optional[str]): Value of If-Match.
+
+    Raises:
+        HTTPException: 412 if the header names no version.
+
+    Returns:
+        Optional[int]: Version required, or None without a condition.
+    """
+    if header is None or header.strip() == "*":
+        return None
+
+    tag = header.strip()
+
+    if len(tag) < 3 or tag[0] != '"' or tag[-1] != '"' or not tag[1:-1].isdigit():
+        raise HTTPException(status_code=412, detail=f"If-Match {header} names no version")
+
+    return int(tag[1:-1])
+
+
+def _nullable(annotation: Any) -> bool:
+    related, many = relation(annotation)
+
+    if related is not None:
+        return not many
+
+    return type(None) in get_args(annotation)
+
+
+def _partial(model: type) -> type:
+    """
+    _partial builds a request body for model where every field is optional,
+    so a PATCH only carries the fields the client wants to change. A field
+    sent as null is still rejected unless the model allows None for it.
+
+    Args:
+        model (type): Dataclass to build the body for.
+
+    Returns:
+        type: Pydantic model with the same fields, all defaulting to None.
+    """
+    required = {field.name for field in dataclass_fields(model) if not _nullable(field.type)}
+
+    def reject_nulls(cls: type, values: Dict[str, Any]) -> Dict[str, Any]:
+        nulls = sorted(name for name in required if name in values and values[name] is None)
+
+        if nulls:
+            raise ValueError(f"Fields {nulls} cannot be null")
+
+        return values
+
+    return create_model(
+        f"{model.__name__}Patch",
+        __validators__={"reject_nulls": root_validator(pre=True, allow_reuse=True)(reject_nulls)},
+        **{field.name: (Optional[_field_type(field.type)], None) for field in dataclass_fields(model)},
+    )
+
+
+class _MetricsMiddleware:
+    def __init__(self, app: Any, metrics: Metrics, routes: Callable[[Any], str]) -> None:
+        """
+        _MetricsMiddleware records the latency and query count of every HTTP
+        request, labelled by method and route template.
+
+        Args:
+            app (Any): ASGI app to wrap.
+            metrics (Metrics): Registry to record into.
+            routes (Callable[[Any], str]): Maps a matched endpoint to its
+                route template.
+        """
+        self._app = app
+        self._metrics = metrics
+        self._routes = routes
+
+    async def __call__(self, scope: dict, receive: Any, send: Any) -> None:
+        if scope["type"] != "http":
+            await self._app(scope, receive, send)
+
+            return
+
+        started = time.perf_counter()
+
+        with self._metrics.request() as request:
+            try:
+                await self._app(scope, receive, send)
+            finally:
+                labels = (("method", scope["method"]), ("route", self._routes(scope.get("endpoint"))))
+
+                self._metrics.observe("effortless_request_seconds", time.perf_counter() - started, labels)
+                self._metrics.observe("effortless_request_queries", request.queries, labels)
+
+
+class _UnitOfWorkRoute(APIRoute):
+    """
+    _UnitOfWorkRoute runs each request in the unit of work of its
+    EffortlessFastAPI, and finishes it before the response is returned
+    for sending. A failed commit then fails the request, instead of
+    surfacing after the client was told it succeeded. Bodies streamed by
+    a response are read after the commit, outside the unit of work.
+    """
+    web: "EffortlessFastAPI"
+
+    def get_route_handler(self) -> Callable[[Request], Any]:
+        handler = super().get_route_handler()
+        web = self.web
+
+        async def handle(request: Request) -> Response:
+            async with web.unit_of_work(request):
+                return await handler(request)
+
+        return handle
+
 
 class EffortlessFastAPI:
     def __init__(self) -> None:
-        self._app = FastAPI()        
+        # The unit of work wraps the whole route, dependencies included, so
+        # the admission slot is only given up after the commit.
+        self._app = FastAPI(dependencies=[Depends(self.admission)])
+        self._app.router.route_class = type("UnitOfWorkRoute", (_UnitOfWorkRoute,), {"web": self})
+        self._unit_of_work: Optional[Callable[..., AsyncContextManager[None]]] = None
+        self._changes: Optional[ChangeFeed] = None
+        self._policies: Dict[Any, AdmissionPolicy] = {}
+        self._gates: Dict[Tuple[str, str], Gate] = {}
+        self._admitted: Dict[Any, List[Gate]] = {}
+
+    async def admission(self, request: Request) -> AsyncIterator[None]:
+        """
+        admission is a FastAPI dependency which holds a slot of the gates
+        of the route for the whole request, the gate of the operation
+        first and then the gate of the model, and answers 503 with
+        Retry-After when either turns the request away.
+        """
+        gates = self._admitted.get(request.scope.get("endpoint"), ())
+
+        async with contextlib.AsyncExitStack() as stack:
+            for gate in gates:
+                try:
+                    await stack.enter_async_context(gate.admit())
+                except Overloaded as error:
+                    raise HTTPException(
+                        status_code=503,
+                        detail=str(error),
+                        headers={"Retry-After": str(error.retry_after)},
+                    )
+
+            yield
+
+    def _admit(self, model: type, operation: str) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+        """
+        _admit registers an endpoint of an operation of a model with the
+        gates configured for them.
+
+        Args:
+            model (type): Model served by the endpoint.
+            operation (str): Operation, one of OPERATIONS.
+
+        Returns:
+            Callable[[Callable[..., Any]], Callable[..., Any]]: Decorator
+                returning the endpoint unchanged.
+        """
+        name = model.__name__.lower()
+        gates = []
+
+        for key, label in (((model, operation), operation), (model, "*")):
+            if key in self._policies:
+                if (name, label) not in self._gates:
+                    self._gates[(name, label)] = Gate(self._policies[key])
+
+                gates.append(self._gates[(name, label)])
+
+        def register(endpoint: Callable[..., Any]) -> Callable[..., Any]:
+            if gates:
+                self._admitted[endpoint] = gates
+
+            return endpoint
+
+        return register
+
+    @contextlib.asynccontextmanager
+    async def unit_of_work(self, request: Request) -> AsyncIterator[None]:
+        """
+        unit_of_work runs a request in a unit of work of the ORM, so every
+        store call of the request shares one session and commits once.
+        Every route of the app runs in it, including routes added by hand.
+        The client host is passed along, so an ORM with read replicas can
+        route a client's reads after its writes to the writer.
+        """
+        if self._unit_of_work is None:
+            yield
+
+            return
+
+        async with self._unit_of_work(client=request.client.host if request.client else None):
+            yield
+
+    def _route(self, endpoint: Any) -> str:
+        """
+        _route finds the template of the route serving an endpoint, so
+        metrics are grouped by route instead of by concrete path.
+
+        Args:
+            endpoint (Any): Endpoint matched by the router, or None.
+
+        Returns:
+            str: Route template, or unmatched.
+        """
+        if endpoint is not None:
+            for route in self._app.routes:
+                if getattr(route, "endpoint", None) is endpoint:
+                    return route.path
+
+        return "unmatched"
+
+    def instrument(self, metrics: Metrics) -> None:
+        """
+        instrument records request latency and queries per request, and
+        serves every metric at /metrics in the Prometheus text format.
+
+        Args:
+            metrics (Metrics): Registry to record into and serve.
+        """
+        metrics.histogram("effortless_request_seconds", "Latency of HTTP requests.")
+        metrics.histogram("effortless_request_queries", "SQL statements per HTTP request.", COUNT_BUCKETS)
+
+        def samples(read: Callable[[Gate], float]) -> Callable[[], Dict[Any, float]]:
+            return lambda: {
+                (("model", name), ("operation", operation)): read(gate)
+                for (name, operation), gate in self._gates.items()
+            }
+
+        metrics.collect("effortless_admission_active", "Requests holding a slot of a gate.", "gauge", samples(lambda gate: gate.active))
+        metrics.collect("effortless_admission_waiting", "Requests queued at a gate.", "gauge", samples(lambda gate: gate.waiting))
+        metrics.collect(
+            "effortless_admission_rejected_total", "Requests a gate turned away.", "counter",
+            samples(lambda gate: gate.rejected),
+        )
+
+        routes = functools.lru_cache(maxsize=None)(self._route)
+
+        self._app.add_middleware(_MetricsMiddleware, metrics=metrics, routes=routes)
+
+        @self._app.get("/metrics", include_in_schema=False)
+        async def serve_metrics():
+            return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+    def stream_changes(self, feed: ChangeFeed) -> None:
+        """
+        stream_changes serves the changes of each model published to feed
+        as server-sent events at /{name}/_changes. It must be called before
+        create_routes.
+
+        Args:
+            feed (ChangeFeed): Feed the stores publish to.
+        """
+        self._changes = feed
+
+    def _create_routes(self, model: T, store: Union[Store[T], AsyncStore[T]]) -> None:
+        """
+        _create_routes is a method that creates the routes for a single
+        model. This method is called by create_routes. This method is not
+        meant to be called directly.
+
+        Args:
+            model (T): Generic Dataclass, represented by [T]
+            store (Union[Store[T], AsyncStore[T]]): Store which contains [T]
+        """
+        name = model.__name__.lower()
+        encoder = ModelEncoder(model)
+        body = _body(model)
+        field_types = {field.name: field.type for field in dataclass_fields(model)}
+        columns = ["id", *(field for field, annotation in field_types.items() if relation(annotation)[0] is None)]
+        versioned = hasattr(store, "version")
+
+        @self._app.get(f"/{name}", response_class=_EncodedResponse)
+        @self._admit(model, "list")
+        async def get_all(
+            request: Request,
+            limit: Optional[int] = Query(None, gt=0),
+            after: Optional[str] = None,
+            stream: bool = False,
+            fields: Optional[str] = None,
+        ):
+            filters = _filters(model, request.query_params)
+            fields = _fields(model, fields)
+
+            if stream:
+                return StreamingResponse(
+                    _ndjson(store.stream(filters=filters, fields=fields), encoder, fields),
+                    media_type="application/x-ndjson",
+                )
+
+            headers = {}
+
+            if versioned:
+                # Read before the collection, so a write in between leaves
+                # the tag behind rather than ahead of what was sent.
+                version = await _call(store.collection_version, filters)
+                headers = _validators(_collection_etag(version, request.url.query), version[1])
+
+                if _none_match(request.headers.get("if-none-match"), headers["ETag"]):
+                    return Response(status_code=304, headers=headers)
+
+            if limit is None:
+                values = await _call(store.all, filters, fields)
+            else:
+                values = await _call(store.page, limit, after, filters, fields)
+
+            response = _EncodedResponse(encoder.encode_many(values, fields), headers=headers)
+
+            if limit is not None and len(values) == limit:
+                next_page = request.url.include_query_params(after=values[-1].id)
+                response.headers["Link"] = f'<{next_page}>; rel="next"'
+
+            return response
+
+        if self._changes is not None:
+            feed = self._changes
+
+            @self._app.get(f"/{name}/_changes")
+            async def changes(
+                after: Optional[int] = Query(None, ge=0),
+                last_event_id: Optional[int] = Header(None, ge=0),
+            ):
+                return StreamingResponse(
+                    _events(feed.subscribe(name, after if after is not None else last_event_id)),
+                    media_type="text/event-stream",
+                    headers={"Cache-Control": "no-cache"},
+                )
+
+        @self._app.get(f"/{name}/_count")
+        @self._admit(model, "count")
+        async def count(request: Request):
+            return {"count": await _call(store.count, _filters(model, request.query_params))}
+
+        @self._app.get(f"/{name}/_aggregate")
+        @self._admit(model, "aggregate")
+        async def aggregate(
+            request: Request,
+            op: str = "count",
+            field: Optional[str] = None,
+            group_by: Optional[str] = None,
+        ):
+            _aggregate(model, op, field, group_by)
+            results = await _call(store.aggregate, op, field, group_by, _filters(model, request.query_params))
+
+            if group_by is None:
+                return {op: results[None]}
+
+            return [{group_by: key, op: value} for key, value in results.items()]
+
+        @self._app.get(f"/{name}/_export")
+        @self._admit(model, "export")
+        async def export(request: Request, format: str = "ndjson"):
+            values = store.stream(filters=_filters(model, request.query_params))
+
+            if _format(format) == "csv":
+                return StreamingResponse(csv_lines(values, columns, encoder.encoder(columns)), media_type="text/csv")
+
+            encode = functools.partial(encoder.encode_line, fields=["id", *field_types])
+
+            return StreamingResponse(ndjson_lines(values, encode), media_type="application/x-ndjson")
+
+        @self._app.post(f"/{name}/_import")
+        @self._admit(model, "import")
+        async def import_(request: Request, format: Optional[str] = None, batch_size: int = Query(1000, gt=0)):
+            if format is None:
+                format = "csv" if request.headers.get("content-type", "").startswith("text/csv") else "ndjson"
+
+            records = csv_records(request.stream()) if _format(format) == "csv" else ndjson_records(request.stream())
+            imported, batch = 0, []
+
+            async def create(batch: List[Any]) -> None:
+                try:
+                    await _call(store.create_many, batch)
+                except Conflict as error:
+                    first, last = imported + 1, imported + len(batch)
+                    span = f"record {first}" if first == last else f"records {first}-{last}"
+
+                    raise HTTPException(status_code=409, detail=f"Conflicting {span}: {error}")
+
+            async for value in _imported(model, records):
+                batch.append(value)
+
+                if len(batch) == batch_size:
+                    await create(batch)
+                    imported, batch = imported + len(batch), []
+
+            if batch:
+                await create(batch)
+                imported += len(batch)
+
+            return {"imported": imported}
+
+        @self._app.get(f"/{name}/{{uuid}}", response_class=_EncodedResponse)
+        @self._admit(model, "get")
+        async def get(request: Request, uuid: str, fields: Optional[str] = None):
+            fields = _fields(model, fields)
+            none_match = request.headers.get("if-none-match")
+
+            if versioned and none_match is not None:
+                version = await _call(store.version, uuid)
+
+                if version is not None and _none_match(none_match, _etag(version[0], fields)):
+                    return Response(status_code=304, headers=_validators(_etag(version[0], fields), version[1]))
+
+            value = await _call(store.get, uuid, fields)
+            response = _EncodedResponse(encoder.encode(value, fields))
+
+            if versioned and value is not None:
+                response.headers.update(_validators(_etag(value._version, fields), value._updated_at))
+
+            return response
+
+        @self._app.post(f"/{name}")
+        @self._admit(model, "create")
+        async def create(m: body):
+            created_uuid = await _call(store.create, _instance(model, m))
+
+            logger.debug("Created %s %s", name, created_uuid)
+
+            return {
+                "uuid": created_uuid
+            }
+
+        @self._app.post(f"/{name}/_bulk")
+        @self._admit(model, "create_many")
+        async def create_many(ms: List[body]):
+            return {
+                "uuids": await _call(store.create_many, [_instance(model, m) for m in ms])
+            }
+
+        @self._app.put(f"/{name}/_bulk")
+        @self._admit(model, "update_many")
+        async def update_many(ms: Dict[str, body]):
+            try:
+                await _call(store.update_many, {uuid: _instance(model, m) for uuid, m in ms.items()})
+            except ValueError as error:
+                raise HTTPException(status_code=404, detail=str(error))
+
+        @self._app.delete(f"/{name}/_bulk")
+        @self._admit(model, "delete_many")
+        async def delete_many(uuids: List[str]):
+            try:
+                await _call(store.delete_many, uuids)
+            except ValueError as error:
+                raise HTTPException(status_code=404, detail=str(error))
+
+        @self._app.delete(f"/{name}/{{uuid}}")
+        @self._admit(model, "delete")
+        async def delete(uuid: str):
+            try:
+                await _call(store.delete, uuid)
+            except ValueError as error:
+                raise HTTPException(status_code=404, detail=str(error))
+
+        @self._app.put(f"/{name}/{{uuid}}")
+        @self._admit(model, "update")
+        async def update(request: Request, uuid: str, m: body):
+            expected_version = _expected_version(request.headers.get("if-match"))
+
+            if expected_version is None:
+                try:
+                    await _call(store.update, uuid, _instance(model, m))
+                except ValueError as error:
+                    raise HTTPException(status_code=404, detail=str(error))
+
+                return None
+
+            try:
+                await _call(store.update, uuid, _instance(model, m), expected_version)
+            except VersionConflict as error:
+                raise HTTPException(status_code=412, detail=str(error))
+            except ValueError as error:
+                raise HTTPException(status_code=404, detail=str(error))
+
+            # The write matched the expected version and moved it on by one.
+            return Response("null", media_type="application/json", headers={"ETag": _etag(expected_version + 1)})
+
+        @self._app.patch(f"/{name}/{{uuid}}")
+        @self._admit(model, "patch")
+        async def patch(uuid: str, m: _partial(model)):
+            # Read the fields instead of m.dict(), which would turn related
+            # objects into dictionaries.
+            values = {field: _value(field_types[field], getattr(m, field)) for field in m.__fields_set__}
+
+            try:
+                await _call(store.patch, uuid, values)
+            except ValueError as error:
+                raise HTTPException(status_code=404, detail=str(error))
+
+    def create_routes(
+        self,
+        models: ModuleType,
+        stores: Dict[T, Union[Store[T], AsyncStore[T]]],
+        unit_of_work: Optional[Callable[[], AsyncContextManager[None]]] = None,
+        admission: Optional[Dict[Any, AdmissionPolicy]] = None,
+    ):
+        """
+        create_routes serves every model of stores.
+
+        Args:
+            models (ModuleType): Module containing dataclasses.
+            stores (Dict[T, Union[Store[T], AsyncStore[T]]]): Store of each
+                model.
+            unit_of_work (Optional[Callable[[], AsyncContextManager[None]]]):
+                Opens the unit of work each request runs in.
+            admission (Optional[Dict[Any, AdmissionPolicy]]): Limits keyed
+                by model, shared by all of its routes, or by a tuple of a
+                model and one of OPERATIONS. A request must pass both. The
+                change feed, being a long-lived stream, is not limited.
+
+        Raises:
+            ValueError: If a limit names an unknown operation.
+        """
+        for key in admission or {}:
+            if isinstance(key, tuple) and key[1] not in OPERATIONS:
+                raise ValueError(f"Unknown operation {key[1]}, expected one of {', '.join(OPERATIONS)}")
+
+        self._unit_of_work = unit_of_work
+        self._policies = dict(admission or {})
 
-    def create_routes(self, models: ModuleType, stores: Dict[T, Store[T]]):
         for model, store in stores.items():
-            name = model.__name__.lower()
-            
-            @self._app.get(f"/{name}")
-            def get_all():
-                return store.all()
-            
-            @self._app.get(f"/{name}/{{uuid}}")
-            def get(uuid: str):
-                return store.get(uuid)
-            
-            @self._app.post(f"/{name}")
-            def create(m: model):
-                created_uuid = store.create(m)
-
-                print(created_uuid)
-
-                return {
-                    "uuid": created_uuid
-                }
-            
-            @self._app.delete(f"/{name}/{{uuid}}")
-            def delete(uuid: str):
-                store.delete(uuid)
-            
-            @self._app.put(f"/{name}/{{uuid}}")
-            def update(uuid: str, m: model):
-                store.update(uuid, m)
+            self._create_routes(model=model, store=store)
@@ -0,0 +1,255 @@
+# Copyright (c) 2021-2023 Johnathan P. Irvin
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+import functools
+import inspect
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, Optional, Sequence, Tuple
+
+Labels = Tuple[Tuple[str, str], ...]
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+class _Histogram:
+    def __init__(self, buckets: Sequence[float]) -> None:
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class RequestMetrics:
+    def __init__(self) -> None:
+        """
+        RequestMetrics collects what the ORM reports while a request runs.
+        """
+        self.queries = 0
+
+
+_request: ContextVar[Optional[RequestMetrics]] = ContextVar("effortless_request_metrics", default=None)
+
+
+def _format_labels(labels: Labels, extra: Labels = ()) -> str:
+    pairs = labels + extra
+
+    if not pairs:
+        return ""
+
+    escaped = (
+        (name, value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n"))
+        for name, value in pairs
+    )
+
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+
+    if float(value).is_integer():
+        return str(int(value))
+
+    return repr(float(value))
+
+
+class Metrics:
+    def __init__(self) -> None:
+        """
+        Metrics is a small registry of counters, histograms and gauges which
+        renders in the Prometheus text exposition format.
+        """
+        self._lock = threading.Lock()
+        self._help: Dict[str, Tuple[str, str]] = {}
+        self._counters: Dict[str, Dict[Labels, float]] = {}
+        self._histograms: Dict[str, Dict[Labels, _Histogram]] = {}
+        self._buckets: Dict[str, Sequence[float]] = {}
+        self._collectors: Dict[str, Callable[[], Dict[Labels, float]]] = {}
+
+        self.counter("effortless_queries_total", "SQL statements executed.")
+
+    def counter(self, name: str, help: str) -> None:
+        self._help[name] = ("counter", help)
+        self._counters.setdefault(name, {})
+
+    def histogram(self, name: str, help: str, buckets: Sequence[float] = LATENCY_BUCKETS) -> None:
+        self._help[name] = ("histogram", help)
+        self._histograms.setdefault(name, {})
+        self._buckets[name] = buckets
+
+    def collect(self, name: str, help: str, kind: str, collector: Callable[[], Dict[Labels, float]]) -> None:
+        """
+        collect registers a metric whose samples are read from collector
+        when the metrics are rendered, such as counters kept by a cache.
+
+        Args:
+            name (str): Metric name.
+            help (str): Description of the metric.
+            kind (str): counter or gauge.
+            collector (Callable[[], Dict[Labels, float]]): Returns the
+                current value for each set of labels.
+        """
+        self._help[name] = (kind, help)
+        self._collectors[name] = collector
+
+    def increment(self, name: str, labels: Labels = (), amount: float = 1) -> None:
+        with self._lock:
+            samples = self._counters[name]
+            samples[labels] = samples.get(labels, 0) + amount
+
+    def observe(self, name: str, value: float, labels: Labels = ()) -> None:
+        with self._lock:
+            samples = self._histograms[name]
+            histogram = samples.get(labels)
+
+            if histogram is None:
+                histogram = samples[labels] = _Histogram(self._buckets[name])
+
+            histogram.observe(value)
+
+    def render(self) -> str:
+        """
+        render writes every metric in the Prometheus text format.
+
+        Returns:
+            str: Exposition text.
+        """
+        lines = []
+
+        with self._lock:
+            for name, (kind, help) in sorted(self._help.items()):
+                lines.append(f"# HELP {name} {help}")
+                lines.append(f"# TYPE {name} {kind}")
+
+                if name in self._histograms:
+                    for labels, histogram in self._histograms[name].items():
+                        cumulative = 0
+
+                        for bound, count in zip((*histogram.buckets, float("inf")), histogram.counts):
+                            cumulative += count
+                            le = (("le", _format_value(bound)),)
+                            lines.append(f"{name}_bucket{_format_labels(labels, le)} {cumulative}")
+
+                        lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(histogram.sum)}")
+                        lines.append(f"{name}_count{_format_labels(labels)} {histogram.count}")
+
+                    continue
+
+                if name in self._collectors:
+                    samples = self._collectors[name]()
+                else:
+                    samples = self._counters[name]
+
+                for labels, value in samples.items():
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+
+        return "\n".join(lines) + "\n"
+
+    @contextmanager
+    def request(self) -> Iterator[RequestMetrics]:
+        """
+        request collects the metrics of the request served inside the
+        block, including work handed to the threadpool.
+
+        Returns:
+            Iterator[RequestMetrics]: Metrics of the request.
+        """
+        request = RequestMetrics()
+        token = _request.set(request)
+
+        try:
+            yield request
+        finally:
+            _request.reset(token)
+
+    def count_query(self) -> None:
+        """
+        count_query adds a query to the total, and to the request being
+        served if there is one.
+        """
+        self.increment("effortless_queries_total")
+
+        request = _request.get()
+
+        if request is not None:
+            request.queries += 1
+
+
+class InstrumentedStore:
+    def __init__(self, store: Any, metrics: Metrics, model: str) -> None:
+        """
+        InstrumentedStore times every method of a store into the
+        effortless_store_seconds histogram. Generators are passed through
+        untimed, since they are consumed after the call returns.
+
+        Args:
+            store (Any): Store to time, sync or async.
+            metrics (Metrics): Registry to record into.
+            model (str): Model name used as a label.
+        """
+        self._store = store
+        self._metrics = metrics
+        self._model = model
+
+        metrics.histogram("effortless_store_seconds", "Latency of store methods.")
+
+    def __getattr__(self, name: str) -> Any:
+        method = getattr(self._store, name)
+
+        if not callable(method) or inspect.isgeneratorfunction(method) or inspect.isasyncgenfunction(method):
+            return method
+
+        labels = (("model", self._model), ("method", name))
+        observe = functools.partial(self._metrics.observe, "effortless_store_seconds", labels=labels)
+
+        if inspect.iscoroutinefunction(method):
+            @functools.wraps(method)
+            async def timed(*args: Any, **kwargs: Any) -> Any:
+                started = time.perf_counter()
+
+                try:
+                    return await method(*args, **kwargs)
+                finally:
+                    observe(time.perf_counter() - started)
+        else:
+            @functools.wraps(method)
+            def timed(*args: Any, **kwargs: Any) -> Any:
+                started = time.perf_counter()
+
+                try:
+                    return method(*args, **kwargs)
+                finally:
+                    observe(time.perf_counter() - started)
+
+        # Cache the wrapper so later calls skip __getattr__.
+        setattr(self, name, timed)
+
+        return timed
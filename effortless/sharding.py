@@ -0,0 +1,368 @@
+# Copyright (c) 2021-2023 Johnathan P. Irvin
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+import asyncio
+import heapq
+import itertools
+import operator
+import zlib
+from collections import defaultdict
+from typing import (Any, AsyncIterator, Callable, Dict, Generic, Iterator,
+                    List, Optional, Sequence, Tuple, TypeVar)
+from uuid import UUID, uuid4
+
+from .store import AsyncStore, Filter, Store
+
+T = TypeVar("T")
+
+_REDUCERS: Dict[str, Callable[[Any, Any], Any]] = {
+    "count": operator.add,
+    "sum": operator.add,
+    "min": min,
+    "max": max,
+}
+
+
+def shard_of(uuid: UUID, shards: int) -> int:
+    """
+    shard_of picks the shard an object lives on from its uuid. The hash is
+    stable across processes, unlike hash(), so every worker agrees.
+
+    Args:
+        uuid (UUID): Primary key of the object.
+        shards (int): Number of shards.
+
+    Returns:
+        int: Index of the shard.
+    """
+    return zlib.crc32(str(uuid).encode()) % shards
+
+
+def _combine(op: str, results: Sequence[Dict[Any, Any]]) -> Dict[Any, Any]:
+    """
+    _combine merges the results of an aggregate computed on every shard,
+    group by group. Counts and sums add up, and minimums and maximums are
+    taken over the shards with rows in the group.
+
+    Args:
+        op (str): One of count, sum, min or max.
+        results (Sequence[Dict[Any, Any]]): Result of each shard by group.
+
+    Returns:
+        Dict[Any, Any]: Result by group.
+    """
+    reduce = _REDUCERS[op]
+    combined: Dict[Any, Any] = {}
+
+    for result in results:
+        for group, value in result.items():
+            if combined.get(group) is None:
+                combined[group] = value
+            elif value is not None:
+                combined[group] = reduce(combined[group], value)
+
+    return combined
+
+
+def _average(sums: Dict[Any, Any], counts: Dict[Any, Any]) -> Dict[Any, Any]:
+    """
+    _average divides the combined sums by the combined counts, since the
+    average of the averages of the shards is not the average of the rows.
+
+    Args:
+        sums (Dict[Any, Any]): Sum of the field by group.
+        counts (Dict[Any, Any]): Rows with the field set by group.
+
+    Returns:
+        Dict[Any, Any]: Average by group.
+    """
+    return {
+        group: total / counts[group] if total is not None and counts.get(group) else None
+        for group, total in sums.items()
+    }
+
+
+def _combine_versions(versions: Sequence[Tuple[int, Optional[float]]]) -> Tuple[int, Optional[float]]:
+    updated = [latest for _, latest in versions if latest is not None]
+
+    return sum(count for count, _ in versions), max(updated, default=None)
+
+
+def _by_shard(uuids: Sequence[Any], shards: int) -> Dict[int, List[int]]:
+    positions = defaultdict(list)
+
+    for position, uuid in enumerate(uuids):
+        positions[shard_of(uuid, shards)].append(position)
+
+    return positions
+
+
+def _merge_pages(pages: Sequence[List[T]], limit: int) -> List[T]:
+    """
+    _merge_pages merges the pages read from each shard, each ordered by id,
+    into the first limit objects across every shard.
+
+    Args:
+        pages (Sequence[List[T]]): Page of each shard.
+        limit (int): Maximum number of objects.
+
+    Returns:
+        List[T]: Page across the shards.
+    """
+    return list(itertools.islice(heapq.merge(*pages, key=lambda value: value.id), limit))
+
+
+class ShardedStore(Generic[T]):
+    def __init__(self, shards: Sequence[Store[T]]) -> None:
+        """
+        ShardedStore spreads the objects of a model over several stores,
+        each on its own database, by the hash of their uuid. Reads and
+        writes of a single object go to its shard only, while collections,
+        counts and aggregates are read from every shard and merged. Writes
+        to several shards in one unit of work commit shard by shard, so
+        they are not atomic across shards.
+
+        Args:
+            shards (Sequence[Store[T]]): Store of each shard. Their order
+                decides where objects live, so it must not change.
+        """
+        self._shards = list(shards)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._shards[0], name)
+
+    def _shard(self, uuid: UUID) -> Store[T]:
+        return self._shards[shard_of(uuid, len(self._shards))]
+
+    def get(self, uuid: UUID, fields: Optional[Sequence[str]] = None) -> Optional[T]:
+        return self._shard(uuid).get(uuid, fields)
+
+    def update(self, uuid: UUID, value: T, expected_version: Optional[int] = None) -> "ShardedStore[T]":
+        self._shard(uuid).update(uuid, value, expected_version)
+
+        return self
+
+    def patch(self, uuid: UUID, values: Dict[str, Any]) -> "ShardedStore[T]":
+        self._shard(uuid).patch(uuid, values)
+
+        return self
+
+    def delete(self, uuid: UUID) -> "ShardedStore[T]":
+        self._shard(uuid).delete(uuid)
+
+        return self
+
+    def create(self, value: T) -> UUID:
+        # The id decides the shard, so it is assigned before the insert.
+        value.id = getattr(value, "id", None) or str(uuid4())
+
+        return self._shard(value.id).create(value)
+
+    def all(self, filters: Sequence[Filter] = (), fields: Optional[Sequence[str]] = None) -> list[T]:
+        return [value for shard in self._shards for value in shard.all(filters, fields)]
+
+    def create_many(self, values: list[T]) -> list[UUID]:
+        for value in values:
+            value.id = getattr(value, "id", None) or str(uuid4())
+
+        for index, positions in _by_shard([value.id for value in values], len(self._shards)).items():
+            self._shards[index].create_many([values[position] for position in positions])
+
+        return [value.id for value in values]
+
+    def update_many(self, values: Dict[UUID, T]) -> "ShardedStore[T]":
+        uuids = list(values)
+
+        for index, positions in _by_shard(uuids, len(self._shards)).items():
+            self._shards[index].update_many({uuids[position]: values[uuids[position]] for position in positions})
+
+        return self
+
+    def delete_many(self, uuids: list[UUID]) -> "ShardedStore[T]":
+        for index, positions in _by_shard(uuids, len(self._shards)).items():
+            self._shards[index].delete_many([uuids[position] for position in positions])
+
+        return self
+
+    def page(
+        self,
+        limit: int,
+        after: Optional[UUID] = None,
+        filters: Sequence[Filter] = (),
+        fields: Optional[Sequence[str]] = None,
+    ) -> list[T]:
+        return _merge_pages([shard.page(limit, after, filters, fields) for shard in self._shards], limit)
+
+    def stream(
+        self,
+        chunk_size: int = 1000,
+        filters: Sequence[Filter] = (),
+        fields: Optional[Sequence[str]] = None,
+    ) -> Iterator[T]:
+        for shard in self._shards:
+            yield from shard.stream(chunk_size, filters, fields)
+
+    def count(self, filters: Sequence[Filter] = ()) -> int:
+        return sum(shard.count(filters) for shard in self._shards)
+
+    def version(self, uuid: UUID) -> Optional[Tuple[int, float]]:
+        return self._shard(uuid).version(uuid)
+
+    def collection_version(self, filters: Sequence[Filter] = ()) -> Tuple[int, Optional[float]]:
+        return _combine_versions([shard.collection_version(filters) for shard in self._shards])
+
+    def aggregate(
+        self,
+        op: str,
+        field: Optional[str] = None,
+        group_by: Optional[str] = None,
+        filters: Sequence[Filter] = (),
+    ) -> Dict[Any, Any]:
+        if op != "avg":
+            return _combine(op, [shard.aggregate(op, field, group_by, filters) for shard in self._shards])
+
+        sums = _combine("sum", [shard.aggregate("sum", field, group_by, filters) for shard in self._shards])
+        counts = _combine("count", [shard.aggregate("count", field, group_by, filters) for shard in self._shards])
+
+        return _average(sums, counts)
+
+
+class AsyncShardedStore(Generic[T]):
+    def __init__(self, shards: Sequence[AsyncStore[T]]) -> None:
+        """
+        AsyncShardedStore is the ShardedStore of async stores. Reads which
+        span every shard query them concurrently.
+
+        Args:
+            shards (Sequence[AsyncStore[T]]): Store of each shard. Their
+                order decides where objects live, so it must not change.
+        """
+        self._shards = list(shards)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._shards[0], name)
+
+    def _shard(self, uuid: UUID) -> AsyncStore[T]:
+        return self._shards[shard_of(uuid, len(self._shards))]
+
+    async def _each(self, method: str, *args: Any) -> list:
+        return await asyncio.gather(*(getattr(shard, method)(*args) for shard in self._shards))
+
+    async def get(self, uuid: UUID, fields: Optional[Sequence[str]] = None) -> Optional[T]:
+        return await self._shard(uuid).get(uuid, fields)
+
+    async def update(self, uuid: UUID, value: T, expected_version: Optional[int] = None) -> "AsyncShardedStore[T]":
+        await self._shard(uuid).update(uuid, value, expected_version)
+
+        return self
+
+    async def patch(self, uuid: UUID, values: Dict[str, Any]) -> "AsyncShardedStore[T]":
+        await self._shard(uuid).patch(uuid, values)
+
+        return self
+
+    async def delete(self, uuid: UUID) -> "AsyncShardedStore[T]":
+        await self._shard(uuid).delete(uuid)
+
+        return self
+
+    async def create(self, value: T) -> UUID:
+        # The id decides the shard, so it is assigned before the insert.
+        value.id = getattr(value, "id", None) or str(uuid4())
+
+        return await self._shard(value.id).create(value)
+
+    async def all(self, filters: Sequence[Filter] = (), fields: Optional[Sequence[str]] = None) -> list[T]:
+        return [value for values in await self._each("all", filters, fields) for value in values]
+
+    async def create_many(self, values: list[T]) -> list[UUID]:
+        for value in values:
+            value.id = getattr(value, "id", None) or str(uuid4())
+
+        await asyncio.gather(*(
+            self._shards[index].create_many([values[position] for position in positions])
+            for index, positions in _by_shard([value.id for value in values], len(self._shards)).items()
+        ))
+
+        return [value.id for value in values]
+
+    async def update_many(self, values: Dict[UUID, T]) -> "AsyncShardedStore[T]":
+        uuids = list(values)
+
+        await asyncio.gather(*(
+            self._shards[index].update_many({uuids[position]: values[uuids[position]] for position in positions})
+            for index, positions in _by_shard(uuids, len(self._shards)).items()
+        ))
+
+        return self
+
+    async def delete_many(self, uuids: list[UUID]) -> "AsyncShardedStore[T]":
+        await asyncio.gather(*(
+            self._shards[index].delete_many([uuids[position] for position in positions])
+            for index, positions in _by_shard(uuids, len(self._shards)).items()
+        ))
+
+        return self
+
+    async def page(
+        self,
+        limit: int,
+        after: Optional[UUID] = None,
+        filters: Sequence[Filter] = (),
+        fields: Optional[Sequence[str]] = None,
+    ) -> list[T]:
+        return _merge_pages(await self._each("page", limit, after, filters, fields), limit)
+
+    async def stream(
+        self,
+        chunk_size: int = 1000,
+        filters: Sequence[Filter] = (),
+        fields: Optional[Sequence[str]] = None,
+    ) -> AsyncIterator[T]:
+        for shard in self._shards:
+            async for value in shard.stream(chunk_size, filters, fields):
+                yield value
+
+    async def count(self, filters: Sequence[Filter] = ()) -> int:
+        return sum(await self._each("count", filters))
+
+    async def version(self, uuid: UUID) -> Optional[Tuple[int, float]]:
+        return await self._shard(uuid).version(uuid)
+
+    async def collection_version(self, filters: Sequence[Filter] = ()) -> Tuple[int, Optional[float]]:
+        return _combine_versions(await self._each("collection_version", filters))
+
+    async def aggregate(
+        self,
+        op: str,
+        field: Optional[str] = None,
+        group_by: Optional[str] = None,
+        filters: Sequence[Filter] = (),
+    ) -> Dict[Any, Any]:
+        if op != "avg":
+            return _combine(op, await self._each("aggregate", op, field, group_by, filters))
+
+        # Inside a unit of work each shard has one session, which runs one
+        # query at a time, so the shards are only queried concurrently for
+        # the sums and then for the counts.
+        sums = await self._each("aggregate", "sum", field, group_by, filters)
+        counts = await self._each("aggregate", "count", field, group_by, filters)
+
+        return _average(_combine("sum", sums), _combine("count", counts))
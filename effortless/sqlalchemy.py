@@ -18,24 +18,598 @@
 # LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
 # OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
 # WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+import asyncio
+import copy
+import dataclasses
 import enum
-from dataclasses import asdict, dataclass, fields, is_dataclass
+import functools
+import hashlib
+import itertools
+import logging
+import operator
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, fields, is_dataclass
 from types import ModuleType
-from typing import Dict, Optional, TypeVar
+from typing import (Any, AsyncIterator, Awaitable, Callable, Dict, Hashable,
+                    Iterator, Mapping, Optional, Sequence, Tuple, TypeVar,
+                    Union)
 from uuid import UUID, uuid4
 
-from sqlalchemy import (Column, Engine, Enum, Float, Integer, String,
-                        create_engine)
-from sqlalchemy.orm import Session, mapped_column
+from sqlalchemy import (Column, Connection, Delete, Dialect, Engine, Enum,
+                        Float, ForeignKey, Integer, LargeBinary, MetaData,
+                        Result, Select, SmallInteger, String, Table,
+                        TypeDecorator, Update, Uuid, bindparam, create_engine,
+                        delete, event, func, insert, inspect, literal_column,
+                        select, update)
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
+from sqlalchemy.orm import (Session, joinedload, load_only, mapped_column,
+                            relationship, selectinload)
 from sqlalchemy.orm import registry as SQLAlchemyRegistry
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm.exc import StaleDataError
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
-from .store import Store
+from .metrics import Metrics
+from .sharding import AsyncShardedStore, ShardedStore
+from .store import (AGGREGATES, NUMERIC_AGGREGATES, AsyncStore, Conflict,
+                    Filter, Store, VersionConflict, numeric, relation)
 
 T = TypeVar("T", bound=dataclass)
 
-class _AlchemyStore:
+logger = logging.getLogger(__name__)
 
-    def _get_compatible_column(self, value: type) -> Column:
+_OPERATORS = {
+    "eq": operator.eq,
+    "lt": operator.lt,
+    "lte": operator.le,
+    "gt": operator.gt,
+    "gte": operator.ge,
+}
+
+@dataclass(frozen=True)
+class EngineProfile:
+    """
+    EngineProfile tunes the connection pool and statement cache of an
+    engine, and the pragmas of every new SQLite connection. Unset options
+    keep the SQLAlchemy defaults.
+
+    Args:
+        pool_size (Optional[int]): Connections kept open in the pool.
+        max_overflow (Optional[int]): Connections opened past pool_size
+            under load.
+        pool_timeout (Optional[float]): Seconds to wait for a connection
+            before failing.
+        pool_pre_ping (bool): Test connections on checkout, so ones the
+            server dropped are replaced instead of failing a request.
+        pool_recycle (Optional[int]): Seconds before a connection is
+            replaced.
+        query_cache_size (Optional[int]): Compiled statements cached.
+        pragmas (Mapping[str, Any]): PRAGMA statements run on each new
+            SQLite connection, ignored by other databases.
+    """
+    pool_size: Optional[int] = None
+    max_overflow: Optional[int] = None
+    pool_timeout: Optional[float] = None
+    pool_pre_ping: bool = False
+    pool_recycle: Optional[int] = None
+    query_cache_size: Optional[int] = None
+    pragmas: Mapping[str, Any] = dataclasses.field(default_factory=dict)
+
+    def options(self) -> Dict[str, Any]:
+        """
+        options returns the keyword arguments for create_engine.
+
+        Returns:
+            Dict[str, Any]: Engine options that are set.
+        """
+        options = {
+            "pool_size": self.pool_size,
+            "max_overflow": self.max_overflow,
+            "pool_timeout": self.pool_timeout,
+            "pool_recycle": self.pool_recycle,
+            "query_cache_size": self.query_cache_size,
+        }
+        options = {key: value for key, value in options.items() if value is not None}
+
+        if self.pool_pre_ping:
+            options["pool_pre_ping"] = True
+
+        return options
+
+
+ENGINE_PROFILES: Dict[str, EngineProfile] = {
+    "default": EngineProfile(),
+    "sqlite_high_concurrency": EngineProfile(
+        pool_size=16,
+        max_overflow=16,
+        pool_timeout=30,
+        query_cache_size=1200,
+        pragmas={
+            "journal_mode": "WAL",
+            "synchronous": "NORMAL",
+            "mmap_size": 268435456,
+            "busy_timeout": 5000,
+            "temp_store": "MEMORY",
+        },
+    ),
+    "postgres_oltp": EngineProfile(
+        pool_size=20,
+        max_overflow=10,
+        pool_timeout=10,
+        pool_pre_ping=True,
+        pool_recycle=1800,
+        query_cache_size=1200,
+    ),
+}
+
+
+def _profile(profile: Union[str, EngineProfile, None]) -> EngineProfile:
+    """
+    _profile resolves a profile given by name.
+
+    Args:
+        profile (Union[str, EngineProfile, None]): Name in ENGINE_PROFILES,
+            a profile, or None for the default profile.
+
+    Returns:
+        EngineProfile: Resolved profile.
+    """
+    if profile is None:
+        return ENGINE_PROFILES["default"]
+
+    if isinstance(profile, EngineProfile):
+        return profile
+
+    if profile not in ENGINE_PROFILES:
+        raise ValueError(f"Unknown engine profile {profile}, expected one of {sorted(ENGINE_PROFILES)}")
+
+    return ENGINE_PROFILES[profile]
+
+
+def _apply_pragmas(engine: Engine, pragmas: Mapping[str, Any]) -> None:
+    """
+    _apply_pragmas runs the pragmas on every connection the engine opens.
+    Only SQLite understands them, so other engines are left alone.
+
+    Args:
+        engine (Engine): Engine, or the sync_engine of an AsyncEngine.
+        pragmas (Mapping[str, Any]): Pragma values keyed by name.
+    """
+    if not pragmas or engine.dialect.name != "sqlite":
+        return
+
+    @event.listens_for(engine, "connect")
+    def connect(connection: Any, _: Any) -> None:
+        cursor = connection.cursor()
+
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+
+        cursor.close()
+
+
+def _instrument_engine(engine: Engine, metrics: Metrics) -> None:
+    """
+    _instrument_engine counts the statements an engine executes and times
+    how long each pool checkout waits. The pool has no event for the start
+    of a checkout, so its connect method is wrapped instead.
+
+    Args:
+        engine (Engine): Engine, or the sync_engine of an AsyncEngine.
+        metrics (Metrics): Registry to record into.
+    """
+    metrics.histogram("effortless_pool_checkout_seconds", "Time spent checking out a pooled connection.")
+
+    event.listen(engine, "before_cursor_execute", lambda *_: metrics.count_query())
+
+    pool = engine.pool
+    connect = pool.connect
+
+    @functools.wraps(connect)
+    def timed_connect() -> Any:
+        started = time.perf_counter()
+
+        try:
+            return connect()
+        finally:
+            metrics.observe("effortless_pool_checkout_seconds", time.perf_counter() - started)
+
+    pool.connect = timed_connect
+
+
+_fingerprints = Table(
+    "effortless_schema",
+    MetaData(),
+    Column("fingerprint", String(64), primary_key=True),
+)
+
+
+def _fingerprint(metadata: MetaData) -> str:
+    """
+    _fingerprint hashes the tables, columns and indexes of the mapped
+    models, so a restart can tell whether the schema changed.
+
+    Args:
+        metadata (MetaData): Mapped tables.
+
+    Returns:
+        str: Hex digest of the schema.
+    """
+    digest = hashlib.sha256()
+
+    for table in metadata.sorted_tables:
+        columns = [(c.name, repr(c.type), c.nullable, c.primary_key) for c in table.columns]
+        indexes = sorted((i.name, tuple(c.name for c in i.columns), i.unique) for i in table.indexes)
+
+        digest.update(repr((table.name, columns, indexes)).encode())
+
+    return digest.hexdigest()
+
+
+def _add_version_columns(connection: Connection, table: Table) -> None:
+    """
+    _add_version_columns adds the version columns to a table created
+    before rows were versioned. Existing rows start at version 1, updated
+    now.
+
+    Args:
+        connection (Connection): Connection to alter the table on.
+        table (Table): Mapped table, which may miss the columns.
+    """
+    existing = {column["name"] for column in inspect(connection).get_columns(table.name)}
+    defaults = {"_version": 1, "_updated_at": time.time()}
+    preparer = connection.dialect.identifier_preparer
+
+    for name, default in defaults.items():
+        if name not in table.c or name in existing:
+            continue
+
+        column = table.c[name]
+        logger.info("Adding column %s to table %s", name, table.name)
+        connection.exec_driver_sql(
+            f"ALTER TABLE {preparer.format_table(table)} ADD COLUMN {preparer.format_column(column)} "
+            f"{column.type.compile(connection.dialect)} DEFAULT {default!r} NOT NULL"
+        )
+
+
+def _create_schema(connection: Connection, metadata: MetaData, fingerprint: bool = False) -> None:
+    """
+    _create_schema creates the mapped tables and their indexes. create_all
+    only creates indexes together with a new table, so indexes hinted on a
+    table that already exists are created one by one, and the version
+    columns are added to a table created before rows were versioned.
+
+    These steps reflect every table and index. With fingerprint, a hash of
+    the schema is kept in the database and the steps are skipped when it
+    has not changed since the last start.
+
+    Args:
+        connection (Connection): Connection to create the schema on.
+        metadata (MetaData): Tables to create.
+        fingerprint (bool): Skip creation when the stored fingerprint
+            matches.
+    """
+    if fingerprint:
+        digest = _fingerprint(metadata)
+
+        _fingerprints.create(connection, checkfirst=True)
+
+        if connection.scalar(select(_fingerprints.c.fingerprint)) == digest:
+            logger.debug("Schema fingerprint %s unchanged, skipping creation", digest)
+
+            return
+
+    metadata.create_all(connection)
+
+    for table in metadata.sorted_tables:
+        _add_version_columns(connection, table)
+
+        for index in table.indexes:
+            index.create(connection, checkfirst=True)
+
+    if fingerprint:
+        connection.execute(delete(_fingerprints))
+        connection.execute(insert(_fingerprints).values(fingerprint=digest))
+
+
+class _UnitOfWork:
+    def __init__(self) -> None:
+        """
+        _UnitOfWork holds the sessions shared by every store call inside a
+        unit of work, one per engine, each opened on first use, and the
+        callbacks to run once they have committed. written tells whether
+        any of them has written yet.
+        """
+        self._sessions: Dict[Any, Any] = {}
+        self._committed: list[Callable[[], None]] = []
+        self.written = False
+
+    def after_commit(self, callback: Callable[[], None]) -> None:
+        self._committed.append(callback)
+
+    def opened(self, engine: Union[Engine, AsyncEngine]) -> bool:
+        return engine in self._sessions
+
+    def session(self, engine: Union[Engine, AsyncEngine], factory: type) -> Any:
+        session = self._sessions.get(engine)
+
+        if session is None:
+            session = self._sessions[engine] = factory(engine, expire_on_commit=False)
+
+        return session
+
+    def finish(self, commit: bool) -> None:
+        for session in self._sessions.values():
+            try:
+                if commit:
+                    session.commit()
+                else:
+                    session.rollback()
+            finally:
+                session.close()
+
+        if commit:
+            for callback in self._committed:
+                callback()
+
+    async def finish_async(self, commit: bool) -> None:
+        for session in self._sessions.values():
+            try:
+                if commit:
+                    await session.commit()
+                else:
+                    await session.rollback()
+            finally:
+                await session.close()
+
+        if commit:
+            for callback in self._committed:
+                callback()
+
+
+_unit_of_work: ContextVar[Optional[_UnitOfWork]] = ContextVar("effortless_unit_of_work", default=None)
+_client: ContextVar[Optional[Hashable]] = ContextVar("effortless_client", default=None)
+
+
+def _after_commit(callback: Callable[[], None]) -> None:
+    work = _unit_of_work.get()
+
+    if work is None:
+        callback()
+    else:
+        work.after_commit(callback)
+
+
+def _written() -> bool:
+    work = _unit_of_work.get()
+
+    return work is not None and work.written
+
+
+def _checked_out(engine: Union[Engine, AsyncEngine]) -> int:
+    pool = getattr(engine, "sync_engine", engine).pool
+
+    return pool.checkedout() if hasattr(pool, "checkedout") else 0
+
+
+class _Replicas:
+    _BALANCING = ("round_robin", "least_connections")
+
+    def __init__(
+        self,
+        writer: Union[Engine, AsyncEngine],
+        readers: Sequence[Union[Engine, AsyncEngine]] = (),
+        balancing: str = "round_robin",
+        sticky: float = 0.0,
+    ) -> None:
+        """
+        _Replicas picks the engine each query runs on. Writes go to the
+        writer and reads are spread over the readers. A read goes to the
+        writer instead when the unit of work it runs in has already used
+        the writer, or when its client wrote less than sticky seconds ago,
+        so clients read their own writes despite replication lag.
+
+        Args:
+            writer (Union[Engine, AsyncEngine]): Engine of the primary.
+            readers (Sequence[Union[Engine, AsyncEngine]]): Engines of the
+                replicas. Without any, reads go to the writer.
+            balancing (str): round_robin, or least_connections to pick the
+                reader with the fewest connections checked out.
+            sticky (float): Seconds a client reads from the writer after
+                it writes.
+        """
+        if balancing not in self._BALANCING:
+            raise ValueError(f"Unsupported balancing {balancing}, expected one of {', '.join(self._BALANCING)}")
+
+        self.writer = writer
+        self.readers = list(readers)
+        self._balancing = balancing
+        self._sticky = sticky
+        self._turns = itertools.count()
+        self._writes: Dict[Hashable, float] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def engines(self) -> list[Union[Engine, AsyncEngine]]:
+        return [self.writer, *self.readers]
+
+    def reader(self) -> Union[Engine, AsyncEngine]:
+        if not self.readers:
+            return self.writer
+
+        work = _unit_of_work.get()
+
+        if work is not None and work.opened(self.writer):
+            return self.writer
+
+        client = _client.get()
+
+        if client is not None and self._writes.get(client, 0.0) > time.monotonic():
+            return self.writer
+
+        if self._balancing == "least_connections":
+            return min(self.readers, key=_checked_out)
+
+        return self.readers[next(self._turns) % len(self.readers)]
+
+    def wrote(self) -> None:
+        client = _client.get()
+
+        if client is None or not self._sticky or not self.readers:
+            return
+
+        now = time.monotonic()
+
+        with self._lock:
+            if len(self._writes) >= 1024:
+                self._writes = {key: until for key, until in self._writes.items() if until > now}
+
+            self._writes[client] = now + self._sticky
+
+
+def _shard_stores(stores: Dict[type, Any], engines: Sequence[Any], sharded: type) -> Dict[type, Any]:
+    """
+    _shard_stores spreads the stores of every model over the engines of
+    the shards, the first being the store's own engine. Models with
+    relationships, and the models they refer to, stay on the first shard,
+    since their objects are written and loaded together.
+
+    Args:
+        stores (Dict[type, Any]): Stores by model, already related.
+        engines (Sequence[Any]): Engines of the other shards.
+        sharded (type): ShardedStore or AsyncShardedStore.
+
+    Returns:
+        Dict[type, Any]: Stores by model.
+    """
+    if not engines:
+        return stores
+
+    related = {model for model, store in stores.items() if store._relations}
+    related |= {target for store in stores.values() for target, _ in store._relations.values()}
+
+    return {
+        model: store if model in related else sharded([store, *(store._on(engine) for engine in engines)])
+        for model, store in stores.items()
+    }
+
+
+def _loaders(model: type, names: Optional[Sequence[str]] = None, seen: frozenset = frozenset()) -> list:
+    """
+    _loaders builds the options which load the relationships of a model,
+    and theirs in turn, along with the rows. Lists are loaded with one
+    extra query per relationship through selectinload, and single objects
+    in the same query through joinedload, so reading N rows never costs N
+    extra queries.
+
+    Args:
+        model (type): Mapped dataclass.
+        names (Optional[Sequence[str]]): Relationships to load, or None
+            for every relationship.
+        seen (frozenset): Models already loaded on the way here, which are
+            not loaded again.
+
+    Returns:
+        list: Loader options for the query.
+    """
+    options = []
+
+    for key, prop in model.__mapper__.relationships.items():
+        target = prop.mapper.class_
+
+        if (names is not None and key not in names) or target in seen:
+            continue
+
+        loader = selectinload if prop.uselist else joinedload
+        options.append(loader(prop.class_attribute).options(*_loaders(target, seen=seen | {model})))
+
+    return options
+
+
+class _CompactUUID(TypeDecorator):
+    """
+    _CompactUUID stores uuids in 16 bytes, or in the native uuid type
+    where the database has one, instead of 36 characters of text. Values
+    are still uuid strings in Python.
+    """
+    impl = LargeBinary(16)
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect: Dialect) -> Any:
+        if dialect.name == "postgresql":
+            return dialect.type_descriptor(Uuid(as_uuid=False))
+
+        return dialect.type_descriptor(LargeBinary(16))
+
+    def process_bind_param(self, value: Any, dialect: Dialect) -> Any:
+        if value is None:
+            return None
+
+        if isinstance(value, UUID):
+            return str(value) if dialect.name == "postgresql" else value.bytes
+
+        if dialect.name == "postgresql":
+            try:
+                return str(UUID(str(value)))
+            except ValueError:
+                return None
+
+        # Every key of every query passes through here, so the hex digits
+        # are read directly instead of building a UUID for each.
+        try:
+            key = bytes.fromhex(str(value).replace("-", ""))
+        except ValueError:
+            key = b""
+
+        # Text which is not a uuid matches no row.
+        return key if len(key) == 16 else None
+
+    def process_result_value(self, value: Any, dialect: Dialect) -> Optional[str]:
+        if value is None or isinstance(value, str):
+            return value
+
+        digits = value.hex()
+
+        return f"{digits[:8]}-{digits[8:12]}-{digits[12:16]}-{digits[16:20]}-{digits[20:]}"
+
+
+class _IntegerEnum(TypeDecorator):
+    """
+    _IntegerEnum stores enum members as the small integer of their
+    position in the enum, instead of their name. Members can be added at
+    the end of the enum, but not inserted or reordered once rows exist.
+    """
+    impl = SmallInteger
+    cache_ok = True
+
+    def __init__(self, enum_class: type) -> None:
+        super().__init__()
+        # Named after the argument, so it is part of the cache key.
+        self.enum_class = enum_class
+        self._members = list(enum_class)
+        self._codes = {member: code for code, member in enumerate(self._members)}
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.enum_class.__name__})"
+
+    def process_bind_param(self, value: Any, dialect: Dialect) -> Optional[int]:
+        return None if value is None else self._codes[value]
+
+    def process_result_value(self, value: Optional[int], dialect: Dialect) -> Any:
+        return None if value is None else self._members[value]
+
+
+class _AlchemyMapping:
+
+    def _get_compatible_column(self, value: type, metadata: Optional[Mapping[str, Any]] = None) -> Column:
+        metadata = metadata or {}
+        options = {
+            "index": metadata.get("index", False),
+            "unique": metadata.get("unique", False),
+        }
         supported = {
             str: String,
             int: Integer,
@@ -43,97 +617,936 @@ class _AlchemyStore:
             enum.Enum: Enum
         }
 
-        for key, val in supported.items():
-            if not issubclass(value, key):
-                continue
+        for key, val in supported.items():
+            if not issubclass(value, key):
+                continue
+
+            if issubclass(value, enum.Enum):
+                column_type = _IntegerEnum(value) if self._compact else Enum(value)
+
+                return Column(column_type, nullable=False, **options)
+
+            if key is str:
+                return Column(String(metadata.get("max_length")), **options)
+            
+            return Column(val(), **options)
+        
+        raise ValueError(f"Unsupported type {value}")
+    
+    def __init__(self, dataclass: T, registry: SQLAlchemyRegistry, compact: bool = False) -> None:
+        self._compact = compact
+        dataclass.__tablename__ = dataclass.__name__.lower()
+
+        dataclass.id = Column(
+            self._key_type(),
+            primary_key=True,
+            default=lambda: str(uuid4()),
+            unique=True,
+            nullable=False
+        )
+        # Every UPDATE bumps the version and the time of the row, whichever
+        # way it is issued, so conditional requests can be answered from
+        # these two columns alone.
+        dataclass._version = Column(
+            "_version",
+            Integer(),
+            nullable=False,
+            default=1,
+            onupdate=literal_column("_version") + 1,
+        )
+        dataclass._updated_at = Column("_updated_at", Float(), nullable=False, default=time.time, onupdate=time.time)
+
+        self._relations: Dict[str, Any] = {}
+
+        for field in fields(dataclass):
+            if field.name == "id":
+                continue
+
+            related, many = relation(field.type)
+
+            if related is not None:
+                self._relations[field.name] = (related, many)
+
+                if not many:
+                    setattr(dataclass, f"{field.name}_id", Column(self._key_type(), ForeignKey(f"{related.__name__.lower()}.id")))
+
+                continue
+            
+            setattr(dataclass, field.name, self._get_compatible_column(field.type, field.metadata))
+
+        self._dataclass = dataclass
+        self._table = registry.mapped(dataclass)
+        self._field_names = tuple(field.name for field in fields(dataclass))
+        self._field_types = {field.name: field.type for field in fields(dataclass)}
+        self._column_names = tuple(name for name in self._field_names if name not in self._relations)
+
+    def _relate(self) -> None:
+        """
+        _relate maps the fields referring to other models as relationships.
+        It runs once every model is mapped, since a list of objects keeps
+        the key of its owner in the table of the objects. Objects in a list
+        belong to their owner, and are deleted with it or when removed from
+        the list.
+
+        Raises:
+            ValueError: If a field refers to a dataclass that is not mapped.
+        """
+        for name, (related, many) in self._relations.items():
+            if not hasattr(related, "__mapper__"):
+                raise ValueError(f"{self._dataclass.__name__}.{name} refers to {related.__name__}, which is not a model")
+
+            if many:
+                key = Column(
+                    f"{self._dataclass.__tablename__}_{name}_id",
+                    self._key_type(),
+                    ForeignKey(f"{self._dataclass.__tablename__}.id"),
+                    index=True,
+                )
+                related.__table__.append_column(key)
+                related.__mapper__.add_property(key.name, key)
+                prop = relationship(related, foreign_keys=[key], cascade="all, delete-orphan", lazy="raise")
+            else:
+                prop = relationship(related, foreign_keys=[self._dataclass.__table__.c[f"{name}_id"]], lazy="raise")
+
+            self._dataclass.__mapper__.add_property(name, prop)
+
+    def _key_type(self) -> Any:
+        return _CompactUUID() if self._compact else String()
+
+    def _on(self, engine: Union[Engine, AsyncEngine]) -> "_AlchemyMapping":
+        """
+        _on copies the store onto another engine holding the same tables,
+        reusing the mapping, which a dataclass can only have once.
+
+        Args:
+            engine (Union[Engine, AsyncEngine]): Engine of the copy.
+
+        Returns:
+            _AlchemyMapping: Store querying engine.
+        """
+        store = copy.copy(self)
+        store._engine = engine
+        store._replicas = _Replicas(engine)
+
+        return store
+
+    def _row(self, uuid: UUID, value: T) -> dict:
+        """
+        _row flattens a dataclass into the parameters of a bulk statement.
+
+        Args:
+            uuid (UUID): Primary key of the row.
+            value (T): Dataclass holding the column values.
+
+        Returns:
+            dict: Column values keyed by column name.
+        """
+        row = {name: getattr(value, name) for name in self._column_names}
+        row["id"] = str(uuid)
+
+        return row
+
+    def _where(self, statement: Select, filters: Sequence[Filter]) -> Select:
+        """
+        _where narrows a query to the rows matching every filter, so the
+        database can answer it from an index instead of the client
+        filtering the whole collection.
+
+        Args:
+            statement (Select): Query to narrow.
+            filters (Sequence[Filter]): Conditions on the fields.
+
+        Returns:
+            Select: Narrowed query.
+        """
+        columns = self._dataclass.__table__.c
+
+        for condition in filters:
+            if condition.field not in columns:
+                raise ValueError(f"{self._dataclass.__name__} has no field {condition.field}")
+
+            column = columns[condition.field]
+
+            if condition.op == "in":
+                statement = statement.where(column.in_(condition.value))
+            else:
+                statement = statement.where(_OPERATORS[condition.op](column, condition.value))
+
+        return statement
+
+    def _by_uuid(self, statement: Union[Update, Delete], uuid: UUID, dialect: Dialect) -> Union[Update, Delete]:
+        """
+        _by_uuid targets a write at a single row, so it can be sent without
+        loading the row first. Where the driver cannot report how many rows
+        matched, the primary key is returned instead so _matched can tell a
+        missing row apart.
+
+        Args:
+            statement (Union[Update, Delete]): Write against the table.
+            uuid (UUID): Primary key of the row.
+            dialect (Dialect): Dialect the statement is sent to.
+
+        Returns:
+            Union[Update, Delete]: Write against the row.
+        """
+        statement = statement.where(self._dataclass.id == str(uuid))
+
+        if dialect.supports_sane_rowcount:
+            return statement
+
+        return statement.returning(self._dataclass.id)
+
+    def _patch_statement(self, uuid: UUID, values: Dict[str, Any], expected_version: Optional[int] = None) -> Update:
+        """
+        _patch_statement builds a single UPDATE of the given columns.
+
+        Args:
+            uuid (UUID): Primary key of the row.
+            values (Dict[str, Any]): Column values keyed by field name.
+            expected_version (Optional[int]): Version the row must still
+                have, or None to update it whatever its version.
+
+        Returns:
+            Update: Statement updating the row.
+        """
+        unknown = set(values) - set(self._field_names)
+
+        if unknown:
+            raise ValueError(f"{self._dataclass.__name__} has no fields {sorted(unknown)}")
+
+        statement = update(self._dataclass).values(**values)
+
+        if expected_version is not None:
+            statement = statement.where(self._dataclass._version == expected_version)
+
+        return self._by_uuid(statement, uuid, self._engine.dialect)
+
+    def _version_statement(self, uuid: UUID) -> Select:
+        """
+        _version_statement builds a query for the version and update time
+        of a row, which reads neither its fields nor its relationships.
+
+        Args:
+            uuid (UUID): Primary key of the row.
+
+        Returns:
+            Select: Query for the version and update time.
+        """
+        return select(self._dataclass._version, self._dataclass._updated_at).where(self._dataclass.id == str(uuid))
+
+    def _collection_version_statement(self, filters: Sequence[Filter]) -> Select:
+        """
+        _collection_version_statement builds a query for the number of
+        matching rows and their latest update time. Any write to them
+        changes one or the other, so together they version the collection.
+
+        Args:
+            filters (Sequence[Filter]): Conditions on the fields.
+
+        Returns:
+            Select: Query for the count and latest update time.
+        """
+        statement = select(func.count(), func.max(self._dataclass._updated_at)).select_from(self._dataclass.__table__)
+
+        return self._where(statement, filters)
+
+    def _check_version(self, value: T, uuid: UUID, expected_version: Optional[int]) -> None:
+        if expected_version is not None and value._version != expected_version:
+            raise VersionConflict(f"{self._dataclass.__name__} {uuid} is at version {value._version}, not {expected_version}")
+
+    def _missing(self, uuid: UUID, version: Optional[Any], expected_version: Optional[int]) -> ValueError:
+        """
+        _missing explains why a write built by _patch_statement matched no
+        row, given the version the row was then read at.
+
+        Args:
+            uuid (UUID): Primary key of the row.
+            version (Optional[Any]): Version and update time of the row, or
+                None if it does not exist.
+            expected_version (Optional[int]): Version the write expected.
+
+        Returns:
+            ValueError: VersionConflict if the row exists at another
+                version, else ValueError.
+        """
+        if version is not None:
+            return VersionConflict(f"{self._dataclass.__name__} {uuid} is at version {version[0]}, not {expected_version}")
+
+        return ValueError(f"Could not find {self._dataclass.__name__} with uuid {uuid}")
+
+    def _delete_statement(self, uuid: UUID) -> Delete:
+        """
+        _delete_statement builds a single DELETE of a row.
+
+        Args:
+            uuid (UUID): Primary key of the row.
+
+        Returns:
+            Delete: Statement deleting the row.
+        """
+        return self._by_uuid(delete(self._dataclass), uuid, self._engine.dialect)
+
+    @staticmethod
+    def _matched(result: Result) -> bool:
+        """
+        _matched reports whether a write built by _by_uuid found its row.
+
+        Args:
+            result (Result): Result of the write.
+
+        Returns:
+            bool: True if the row existed.
+        """
+        if result.returns_rows:
+            return result.first() is not None
+
+        return result.rowcount > 0
+
+    def _delete_many_statement(self) -> Delete:
+        """
+        _delete_many_statement builds a delete by primary key, executed once
+        per uuid in a single executemany call.
+
+        Returns:
+            Delete: Statement with a uuid bind parameter.
+        """
+        table = self._dataclass.__table__
+
+        return delete(table).where(table.c.id == bindparam("uuid"))
+
+    def _select(self, filters: Sequence[Filter], fields: Optional[Sequence[str]]) -> Select:
+        """
+        _select builds a query for the rows matching filters. When fields
+        are given, only those columns (and the primary key) are loaded.
+
+        Args:
+            filters (Sequence[Filter]): Conditions on the fields.
+            fields (Optional[Sequence[str]]): Fields to load, or None for
+                every field.
+
+        Returns:
+            Select: Query for the matching rows.
+        """
+        statement = self._where(select(self._dataclass), filters)
+
+        return statement.options(*self._options(fields))
+
+    def _options(self, fields: Optional[Sequence[str]]) -> list:
+        """
+        _options builds the loader options of a read. Relationships are
+        loaded eagerly, and when fields are given, only those columns and
+        relationships are loaded, leaving large ones unread.
+
+        Args:
+            fields (Optional[Sequence[str]]): Fields to load, or None for
+                every field.
+
+        Returns:
+            list: Loader options for the query.
+        """
+        if fields is None:
+            return _loaders(self._dataclass)
+
+        unknown = set(fields) - set(self._field_names) - {"id"}
+
+        if unknown:
+            raise ValueError(f"{self._dataclass.__name__} has no fields {sorted(unknown)}")
+
+        columns = [getattr(self._dataclass, name) for name in fields if name not in self._relations]
+        versions = (self._dataclass._version, self._dataclass._updated_at)
+
+        return [load_only(self._dataclass.id, *versions, *columns), *_loaders(self._dataclass, fields)]
+
+    def _assign(self, value: T, values: Dict[str, Any]) -> None:
+        """
+        _assign sets fields of a loaded object, relationships included, for
+        the session to write when it flushes.
+
+        Args:
+            value (T): Object loaded with every relationship.
+            values (Dict[str, Any]): Field values keyed by field name.
+        """
+        unknown = set(values) - set(self._field_names)
+
+        if unknown:
+            raise ValueError(f"{self._dataclass.__name__} has no fields {sorted(unknown)}")
+
+        for name, field_value in values.items():
+            setattr(value, name, field_value)
+
+        # Changing only a relationship writes the rows of the other model,
+        # so the object is touched for its own version to move as well.
+        value._updated_at = time.time()
+
+    def _page_statement(
+        self,
+        limit: int,
+        after: Optional[UUID],
+        filters: Sequence[Filter],
+        fields: Optional[Sequence[str]],
+    ) -> Select:
+        """
+        _page_statement builds a keyset query for the page after the given
+        uuid. Seeking on the primary key index keeps every page as cheap as
+        the first, unlike an OFFSET which scans the skipped rows.
+
+        Args:
+            limit (int): Maximum number of rows in the page.
+            after (Optional[UUID]): Last uuid of the previous page.
+            filters (Sequence[Filter]): Conditions on the fields.
+            fields (Optional[Sequence[str]]): Fields to load.
+
+        Returns:
+            Select: Query for the page.
+        """
+        statement = self._select(filters, fields).order_by(self._dataclass.id).limit(limit)
+
+        if after is not None:
+            statement = statement.where(self._dataclass.id > str(after))
 
-            if issubclass(value, enum.Enum):
-                return Column(Enum(value), nullable=False)
-            
-            return Column(val())
-        
-        raise ValueError(f"Unsupported type {value}")
-    
-    def __init__(self, dataclass: T, registry: SQLAlchemyRegistry, engine: Engine) -> None:
-        dataclass.__tablename__ = dataclass.__name__.lower()
+        return statement
 
-        dataclass.id = Column(
-            String(),
-            primary_key=True,
-            default=uuid4,
-            unique=True,
-            nullable=False
-        )
+    def _aggregate_statement(
+        self,
+        op: str,
+        field: Optional[str],
+        group_by: Optional[str],
+        filters: Sequence[Filter],
+    ) -> Select:
+        """
+        _aggregate_statement builds a query computing op over the matching
+        rows in the database, once per value of group_by if given, so only
+        the results leave it.
 
-        for field in fields(dataclass):
-            if field.name == "id":
-                continue
-            
-            setattr(dataclass, field.name, self._get_compatible_column(field.type))
+        Args:
+            op (str): One of count, sum, min, max or avg.
+            field (Optional[str]): Field op is computed over. Only count
+                can go without one, counting rows.
+            group_by (Optional[str]): Field to group the rows by.
+            filters (Sequence[Filter]): Conditions on the fields.
+
+        Raises:
+            ValueError: If op is unknown, a field is missing or is not a
+                column, or op needs a number and the field does not hold
+                one.
+
+        Returns:
+            Select: Query returning the group and result of each group.
+        """
+        table = self._dataclass.__table__
+
+        if op not in AGGREGATES:
+            raise ValueError(f"Unsupported aggregate {op}, expected one of {', '.join(AGGREGATES)}")
+
+        if field is None and op != "count":
+            raise ValueError(f"Aggregate {op} needs a field")
+
+        for name in (field, group_by):
+            if name is not None and name not in table.c:
+                raise ValueError(f"{self._dataclass.__name__} has no column {name}")
+
+        if op in NUMERIC_AGGREGATES and not numeric(self._field_types.get(field)):
+            raise ValueError(f"Aggregate {op} needs a numeric field, not {field}")
+
+        result = func.count() if field is None else getattr(func, op)(table.c[field])
+
+        if group_by is None:
+            return self._where(select(result).select_from(table), filters)
+
+        statement = select(table.c[group_by], result).group_by(table.c[group_by])
+
+        return self._where(statement, filters)
+
+    def _stream_statement(
+        self,
+        chunk_size: int,
+        filters: Sequence[Filter],
+        fields: Optional[Sequence[str]],
+    ) -> Select:
+        """
+        _stream_statement builds a query which is fetched from a server-side
+        cursor, chunk_size rows at a time.
+
+        Args:
+            chunk_size (int): Number of rows buffered per fetch.
+            filters (Sequence[Filter]): Conditions on the fields.
+            fields (Optional[Sequence[str]]): Fields to load.
+
+        Returns:
+            Select: Query for every matching row.
+        """
+        return self._select(filters, fields).execution_options(yield_per=chunk_size)
+
+
+class _AlchemyStore(_AlchemyMapping):
+    def __init__(
+        self,
+        dataclass: T,
+        registry: SQLAlchemyRegistry,
+        engine: Engine,
+        replicas: Optional[_Replicas] = None,
+        compact: bool = False,
+    ) -> None:
+        super().__init__(dataclass=dataclass, registry=registry, compact=compact)
 
-        self._dataclass = dataclass
-        self._table = registry.mapped(dataclass)
         self._engine = engine
+        self._replicas = replicas or _Replicas(engine)
 
-    def get(self, uuid: UUID) -> Optional[T]:
-        with Session(self._engine) as session:
-            return session.get(self._dataclass, uuid)
+    @contextmanager
+    def _session(self, write: bool = True) -> Iterator[Session]:
+        """
+        _session provides the session of the current unit of work, or else
+        a session of its own which commits when the block ends.
 
-    def update(self, uuid: UUID, value: T) -> "Store[T]":
-        with Session(self._engine) as session:
-            existing = session.get(self._dataclass, uuid)
+        Args:
+            write (bool): Whether the block writes. Reads may run on a
+                reader instead of the writer.
 
-            if existing is None:
-                raise ValueError(f"Could not find {self._dataclass.__name__} with uuid {uuid}")
+        Returns:
+            Iterator[Session]: Session in a transaction.
+        """
+        engine = self._engine if write else self._replicas.reader()
+        work = _unit_of_work.get()
+
+        if write:
+            self._replicas.wrote()
+
+        if work is not None:
+            work.written = work.written or write
+
+            yield work.session(engine, Session)
+
+            return
+
+        with Session(engine, expire_on_commit=False) as session, session.begin():
+            yield session
+
+    def _load(self, session: Session, uuid: UUID) -> T:
+        value = session.get(self._dataclass, str(uuid), options=self._options(None))
 
-            for key, val in asdict(value).items():
-                if key == "uuid":
-                    continue
+        if value is None:
+            raise ValueError(f"Could not find {self._dataclass.__name__} with uuid {uuid}")
 
-                setattr(existing, key, val)
+        return value
 
-            session.commit()
+    def get(self, uuid: UUID, fields: Optional[Sequence[str]] = None) -> Optional[T]:
+        with self._session(write=False) as session:
+            return session.get(self._dataclass, uuid, options=self._options(fields))
+
+    def update(self, uuid: UUID, value: T, expected_version: Optional[int] = None) -> "Store[T]":
+        return self._write(uuid, {name: getattr(value, name) for name in self._field_names}, expected_version)
+
+    def patch(self, uuid: UUID, values: Dict[str, Any]) -> "Store[T]":
+        return self._write(uuid, values)
+
+    def _write(self, uuid: UUID, values: Dict[str, Any], expected_version: Optional[int] = None) -> "Store[T]":
+        with self._session() as session:
+            if self._relations.keys() & values.keys():
+                value = self._load(session, uuid)
+                self._check_version(value, uuid, expected_version)
+                self._assign(value, values)
+                session.flush()
+            elif not self._matched(session.execute(self._patch_statement(uuid, values, expected_version))):
+                # Only a failed write pays for the read telling why.
+                version = session.execute(self._version_statement(uuid)).first() if expected_version is not None else None
+
+                raise self._missing(uuid, version, expected_version)
 
         return self
 
-    def delete(self, uuid: UUID) -> "Store[T]":
-        with Session(self._engine) as session:
-            existing = session.get(self._dataclass, uuid)
+    def version(self, uuid: UUID) -> Optional[Tuple[int, float]]:
+        with self._session(write=False) as session:
+            row = session.execute(self._version_statement(uuid)).first()
 
-            if existing is None:
-                raise ValueError(f"Could not find {self._dataclass.__name__} with uuid {uuid}")
+        return None if row is None else tuple(row)
 
-            session.delete(existing)
-            session.commit()
+    def collection_version(self, filters: Sequence[Filter] = ()) -> Tuple[int, Optional[float]]:
+        with self._session(write=False) as session:
+            return tuple(session.execute(self._collection_version_statement(filters)).one())
+
+    def delete(self, uuid: UUID) -> "Store[T]":
+        with self._session() as session:
+            if self._relations:
+                session.delete(self._load(session, uuid))
+                session.flush()
+            elif not self._matched(session.execute(self._delete_statement(uuid))):
+                raise ValueError(f"Could not find {self._dataclass.__name__} with uuid {uuid}")
 
         return self
 
     def create(self, value: T) -> UUID:
-        if hasattr(value, "id"):
-            value.id = str(uuid4())
+        # An id assigned beforehand, as by a ShardedStore, is kept.
+        value.id = getattr(value, "id", None) or str(uuid4())
 
-        with Session(self._engine) as session:
+        with self._session() as session:
             session.add(value)
-            session.commit()
-            session.refresh(value)
+            session.flush()
 
         return value.id
     
-    def all(self) -> list[T]:
-        with Session(self._engine) as session:
-            return session.query(self._dataclass).all()
+    def all(self, filters: Sequence[Filter] = (), fields: Optional[Sequence[str]] = None) -> list[T]:
+        with self._session(write=False) as session:
+            return list(session.scalars(self._select(filters, fields)))
+
+    def create_many(self, values: list[T]) -> list[UUID]:
+        # Objects restored from an export keep the uuid they had.
+        rows = [self._row(getattr(value, "id", None) or uuid4(), value) for value in values]
+
+        for value, row in zip(values, rows):
+            value.id = row["id"]
+
+        with self._session() as session:
+            try:
+                if self._relations:
+                    # Related objects are inserted by the unit of work instead.
+                    session.add_all(values)
+                    session.flush()
+                elif rows:
+                    session.execute(insert(self._dataclass), rows)
+            except IntegrityError as error:
+                raise Conflict(f"Could not create every {self._dataclass.__name__}: {error.orig}") from error
+
+        return [row["id"] for row in rows]
+
+    def update_many(self, values: Dict[UUID, T]) -> "Store[T]":
+        rows = [self._row(uuid, value) for uuid, value in values.items()]
+
+        with self._session() as session:
+            if self._relations:
+                for uuid, value in values.items():
+                    self._assign(self._load(session, uuid), {name: getattr(value, name) for name in self._field_names})
+
+                session.flush()
+
+                return self
+
+            try:
+                if rows:
+                    session.execute(update(self._dataclass), rows)
+            except StaleDataError as error:
+                raise ValueError(f"Could not find every {self._dataclass.__name__} to update") from error
+
+        return self
+
+    def delete_many(self, uuids: list[UUID]) -> "Store[T]":
+        rows = [{"uuid": str(uuid)} for uuid in set(uuids)]
+
+        with self._session() as session:
+            if self._relations:
+                for uuid in set(uuids):
+                    session.delete(self._load(session, uuid))
+
+                session.flush()
+            elif rows and session.execute(self._delete_many_statement(), rows).rowcount != len(rows):
+                raise ValueError(f"Could not find every {self._dataclass.__name__} to delete")
+
+        return self
+
+    def page(
+        self,
+        limit: int,
+        after: Optional[UUID] = None,
+        filters: Sequence[Filter] = (),
+        fields: Optional[Sequence[str]] = None,
+    ) -> list[T]:
+        with self._session(write=False) as session:
+            return list(session.scalars(self._page_statement(limit, after, filters, fields)))
+
+    def stream(
+        self,
+        chunk_size: int = 1000,
+        filters: Sequence[Filter] = (),
+        fields: Optional[Sequence[str]] = None,
+    ) -> Iterator[T]:
+        with self._session(write=False) as session:
+            yield from session.scalars(self._stream_statement(chunk_size, filters, fields))
+
+    def count(self, filters: Sequence[Filter] = ()) -> int:
+        with self._session(write=False) as session:
+            return session.scalar(self._aggregate_statement("count", None, None, filters))
+
+    def aggregate(
+        self,
+        op: str,
+        field: Optional[str] = None,
+        group_by: Optional[str] = None,
+        filters: Sequence[Filter] = (),
+    ) -> Dict[Any, Any]:
+        with self._session(write=False) as session:
+            rows = session.execute(self._aggregate_statement(op, field, group_by, filters))
+
+            if group_by is None:
+                return {None: rows.scalar()}
+
+            return dict(rows.tuples().all())
+
+
+class _AsyncAlchemyStore(_AlchemyMapping):
+    def __init__(
+        self,
+        dataclass: T,
+        registry: SQLAlchemyRegistry,
+        engine: AsyncEngine,
+        ready: Callable[[], Awaitable[None]],
+        replicas: Optional[_Replicas] = None,
+        compact: bool = False,
+    ) -> None:
+        super().__init__(dataclass=dataclass, registry=registry, compact=compact)
+
+        self._engine = engine
+        self._ready = ready
+        self._replicas = replicas or _Replicas(engine)
+
+    @asynccontextmanager
+    async def _session(self, write: bool = True) -> AsyncIterator[AsyncSession]:
+        """
+        _session provides the session of the current unit of work, or else
+        a session of its own which commits when the block ends.
+
+        Args:
+            write (bool): Whether the block writes. Reads may run on a
+                reader instead of the writer.
+
+        Returns:
+            AsyncIterator[AsyncSession]: Session in a transaction.
+        """
+        await self._ready()
+
+        engine = self._engine if write else self._replicas.reader()
+        work = _unit_of_work.get()
+
+        if write:
+            self._replicas.wrote()
+
+        if work is not None:
+            work.written = work.written or write
+
+            yield work.session(engine, AsyncSession)
+
+            return
+
+        async with AsyncSession(engine, expire_on_commit=False) as session, session.begin():
+            yield session
+
+    async def _load(self, session: AsyncSession, uuid: UUID) -> T:
+        value = await session.get(self._dataclass, str(uuid), options=self._options(None))
+
+        if value is None:
+            raise ValueError(f"Could not find {self._dataclass.__name__} with uuid {uuid}")
+
+        return value
+
+    async def get(self, uuid: UUID, fields: Optional[Sequence[str]] = None) -> Optional[T]:
+        async with self._session(write=False) as session:
+            return await session.get(self._dataclass, uuid, options=self._options(fields))
+
+    async def update(self, uuid: UUID, value: T, expected_version: Optional[int] = None) -> "AsyncStore[T]":
+        return await self._write(uuid, {name: getattr(value, name) for name in self._field_names}, expected_version)
+
+    async def patch(self, uuid: UUID, values: Dict[str, Any]) -> "AsyncStore[T]":
+        return await self._write(uuid, values)
+
+    async def _write(self, uuid: UUID, values: Dict[str, Any], expected_version: Optional[int] = None) -> "AsyncStore[T]":
+        async with self._session() as session:
+            if self._relations.keys() & values.keys():
+                value = await self._load(session, uuid)
+                self._check_version(value, uuid, expected_version)
+                self._assign(value, values)
+                await session.flush()
+            elif not self._matched(await session.execute(self._patch_statement(uuid, values, expected_version))):
+                # Only a failed write pays for the read telling why.
+                version = None
+
+                if expected_version is not None:
+                    version = (await session.execute(self._version_statement(uuid))).first()
+
+                raise self._missing(uuid, version, expected_version)
+
+        return self
+
+    async def version(self, uuid: UUID) -> Optional[Tuple[int, float]]:
+        async with self._session(write=False) as session:
+            row = (await session.execute(self._version_statement(uuid))).first()
+
+        return None if row is None else tuple(row)
+
+    async def collection_version(self, filters: Sequence[Filter] = ()) -> Tuple[int, Optional[float]]:
+        async with self._session(write=False) as session:
+            return tuple((await session.execute(self._collection_version_statement(filters))).one())
+
+    async def delete(self, uuid: UUID) -> "AsyncStore[T]":
+        async with self._session() as session:
+            if self._relations:
+                await session.delete(await self._load(session, uuid))
+                await session.flush()
+            elif not self._matched(await session.execute(self._delete_statement(uuid))):
+                raise ValueError(f"Could not find {self._dataclass.__name__} with uuid {uuid}")
+
+        return self
+
+    async def create(self, value: T) -> UUID:
+        # An id assigned beforehand, as by a ShardedStore, is kept.
+        value.id = getattr(value, "id", None) or str(uuid4())
+
+        async with self._session() as session:
+            session.add(value)
+            await session.flush()
+
+        return value.id
+
+    async def all(self, filters: Sequence[Filter] = (), fields: Optional[Sequence[str]] = None) -> list[T]:
+        async with self._session(write=False) as session:
+            return list(await session.scalars(self._select(filters, fields)))
+
+    async def create_many(self, values: list[T]) -> list[UUID]:
+        # Objects restored from an export keep the uuid they had.
+        rows = [self._row(getattr(value, "id", None) or uuid4(), value) for value in values]
+
+        for value, row in zip(values, rows):
+            value.id = row["id"]
+
+        async with self._session() as session:
+            try:
+                if self._relations:
+                    # Related objects are inserted by the unit of work instead.
+                    session.add_all(values)
+                    await session.flush()
+                elif rows:
+                    await session.execute(insert(self._dataclass), rows)
+            except IntegrityError as error:
+                raise Conflict(f"Could not create every {self._dataclass.__name__}: {error.orig}") from error
+
+        return [row["id"] for row in rows]
+
+    async def update_many(self, values: Dict[UUID, T]) -> "AsyncStore[T]":
+        rows = [self._row(uuid, value) for uuid, value in values.items()]
+
+        async with self._session() as session:
+            if self._relations:
+                for uuid, value in values.items():
+                    self._assign(await self._load(session, uuid), {name: getattr(value, name) for name in self._field_names})
+
+                await session.flush()
+
+                return self
+
+            try:
+                if rows:
+                    await session.execute(update(self._dataclass), rows)
+            except StaleDataError as error:
+                raise ValueError(f"Could not find every {self._dataclass.__name__} to update") from error
+
+        return self
+
+    async def delete_many(self, uuids: list[UUID]) -> "AsyncStore[T]":
+        rows = [{"uuid": str(uuid)} for uuid in set(uuids)]
+
+        async with self._session() as session:
+            if self._relations:
+                for uuid in set(uuids):
+                    await session.delete(await self._load(session, uuid))
+
+                await session.flush()
+            elif rows and (await session.execute(self._delete_many_statement(), rows)).rowcount != len(rows):
+                raise ValueError(f"Could not find every {self._dataclass.__name__} to delete")
+
+        return self
+
+    async def page(
+        self,
+        limit: int,
+        after: Optional[UUID] = None,
+        filters: Sequence[Filter] = (),
+        fields: Optional[Sequence[str]] = None,
+    ) -> list[T]:
+        async with self._session(write=False) as session:
+            return list(await session.scalars(self._page_statement(limit, after, filters, fields)))
+
+    async def stream(
+        self,
+        chunk_size: int = 1000,
+        filters: Sequence[Filter] = (),
+        fields: Optional[Sequence[str]] = None,
+    ) -> AsyncIterator[T]:
+        await self._ready()
+
+        async with AsyncSession(self._replicas.reader()) as session:
+            async for value in await session.stream_scalars(self._stream_statement(chunk_size, filters, fields)):
+                yield value
+
+    async def count(self, filters: Sequence[Filter] = ()) -> int:
+        async with self._session(write=False) as session:
+            return await session.scalar(self._aggregate_statement("count", None, None, filters))
+
+    async def aggregate(
+        self,
+        op: str,
+        field: Optional[str] = None,
+        group_by: Optional[str] = None,
+        filters: Sequence[Filter] = (),
+    ) -> Dict[Any, Any]:
+        async with self._session(write=False) as session:
+            rows = await session.execute(self._aggregate_statement(op, field, group_by, filters))
+
+            if group_by is None:
+                return {None: rows.scalar()}
+
+            return dict(rows.tuples().all())
 
 
 class EffortlessSQLAlchemy:
-    def __init__(self, connection: str) -> None:
+    def __init__(
+        self,
+        connection: str,
+        echo: bool = False,
+        fingerprint: bool = False,
+        profile: Union[str, EngineProfile, None] = None,
+        readers: Sequence[str] = (),
+        balancing: str = "round_robin",
+        sticky: float = 0.0,
+        shards: Sequence[str] = (),
+        compact: bool = False,
+    ) -> None:
         """
         __init__ is the constructor for EffortlessSQLAlchemy.
 
         Args:
             connection (str): SQLAlchemy connection string
+            echo (bool): Log every SQL statement.
+            fingerprint (bool): Remember a hash of the schema in the
+                database and skip creating tables when it is unchanged.
+            profile (Union[str, EngineProfile, None]): Pool and pragma
+                tuning, by name from ENGINE_PROFILES or as a profile.
+            readers (Sequence[str]): Connection strings of read replicas.
+                get, all, page and stream run on them, everything else on
+                connection. Their schema is left to replication.
+            balancing (str): How reads are spread over the readers, either
+                round_robin or least_connections.
+            sticky (float): Seconds a client keeps reading from the writer
+                after it writes, so it reads its own writes.
+            shards (Sequence[str]): Connection strings of further databases
+                the objects of each model are spread over by uuid, with
+                connection as the first shard. The readers replicate the
+                first shard only.
+            compact (bool): Store ids as 16-byte or native uuids and enums
+                as small integers, for smaller rows and indexes. The schema
+                differs, so existing tables need migrating.
         """        
+        profile = _profile(profile)
+
+        def engine(url: str) -> Engine:
+            created = create_engine(url, echo=echo, **profile.options())
+            _apply_pragmas(created, profile.pragmas)
+
+            return created
+
         self._registry = SQLAlchemyRegistry()
-        self._engine = create_engine(connection, echo=True)
+        self._engine = engine(connection)
+        self._replicas = _Replicas(self._engine, [engine(url) for url in readers], balancing, sticky)
+        self._shards = [engine(url) for url in shards]
+        self._compact = compact
+        self._fingerprint = fingerprint
+        self.timings: Dict[str, float] = {}
         
     def _create_store(self, model: T) -> Store[T]:
         """
@@ -147,17 +1560,93 @@ class EffortlessSQLAlchemy:
         Returns:
             Store[T]: SQLAlchemy store which contains [T]
         """
-        return _AlchemyStore(dataclass=model, registry=self._registry, engine=self._engine)
+        return _AlchemyStore(
+            dataclass=model,
+            registry=self._registry,
+            engine=self._engine,
+            replicas=self._replicas,
+            compact=self._compact,
+        )
     
     def _save_tables(self) -> None:
         """
         _save_tables is a method that saves the SQLAlchemy tables.
         """
-        self._registry.metadata.create_all(self._engine)
+        for engine in (self._engine, *self._shards):
+            with engine.begin() as connection:
+                _create_schema(connection, self._registry.metadata, self._fingerprint)
+
+    def instrument(self, metrics: Metrics) -> None:
+        """
+        instrument records the statements executed and the pool checkout
+        wait of the writer, every reader and every shard.
+
+        Args:
+            metrics (Metrics): Registry to record into.
+        """
+        for engine in (*self._replicas.engines, *self._shards):
+            _instrument_engine(engine, metrics)
+
+    def after_commit(self, callback: Callable[[], None]) -> None:
+        """
+        after_commit runs callback once the current unit of work commits,
+        and not at all if it rolls back. Outside a unit of work, store calls
+        have already committed when they return, so it runs right away.
+
+        Args:
+            callback (Callable[[], None]): Function to run.
+        """
+        _after_commit(callback)
+
+    def written(self) -> bool:
+        """
+        written tells whether the current unit of work has written anything
+        it has not committed yet. Reads made in it may see those writes,
+        which nobody else can until the commit.
+
+        Returns:
+            bool: Whether there are uncommitted writes.
+        """
+        return _written()
+
+    @asynccontextmanager
+    async def unit_of_work(self, client: Optional[Hashable] = None) -> AsyncIterator[None]:
+        """
+        unit_of_work makes every store call inside the block share one
+        session, which commits once when the block ends, or rolls back if
+        it raises. The commit blocks, so it runs in a worker thread. Blocks
+        nested in an open unit of work join it.
+
+        Args:
+            client (Optional[Hashable]): Client the work is done for, which
+                reads its own writes for sticky seconds after writing.
+        """
+        if _unit_of_work.get() is not None:
+            yield
+
+            return
+
+        work = _UnitOfWork()
+        token = _unit_of_work.set(work)
+        client_token = _client.set(client)
+
+        try:
+            yield
+        except BaseException:
+            await asyncio.to_thread(work.finish, False)
+
+            raise
+        else:
+            await asyncio.to_thread(work.finish, True)
+        finally:
+            _client.reset(client_token)
+            _unit_of_work.reset(token)
 
     def create_stores(self, models: ModuleType) -> Dict[T, Store[T]]:
         """
-        create_stores is a method that creates SQLAlchemy stores.
+        create_stores is a method that creates SQLAlchemy stores. Every
+        model is mapped first and the tables are then saved in one batch.
+        The time spent on each phase is kept in timings.
 
         Args:
             models (ModuleType): Module containing dataclasses
@@ -166,6 +1655,7 @@ class EffortlessSQLAlchemy:
             Dict[T, Store[T]]: Dictionary of SQLAlchemy stores
         """
         stores = {}
+        started = time.perf_counter()
 
         for _, model in models.__dict__.items():
             if not isinstance(model, type):
@@ -175,12 +1665,218 @@ class EffortlessSQLAlchemy:
                 continue
 
             stores[model] = self._create_store(model=model)
-            self._save_tables()
 
-        from sqlalchemy import inspect
-        inspector = inspect(self._engine)
-        for table_name in inspector.get_table_names():
-            for column_name in inspector.get_columns(table_name):
-                print(f'Table: {table_name} {"*" * 10} Column: {column_name}')
-    
+        for store in stores.values():
+            store._relate()
+
+        stores = _shard_stores(stores, self._shards, ShardedStore)
+        mapped = time.perf_counter()
+        self._save_tables()
+
+        self.timings["map"] = mapped - started
+        self.timings["schema"] = time.perf_counter() - mapped
+
+        return stores
+
+
+class EffortlessAsyncSQLAlchemy:
+    def __init__(
+        self,
+        connection: str,
+        echo: bool = False,
+        fingerprint: bool = False,
+        profile: Union[str, EngineProfile, None] = None,
+        readers: Sequence[str] = (),
+        balancing: str = "round_robin",
+        sticky: float = 0.0,
+        shards: Sequence[str] = (),
+        compact: bool = False,
+    ) -> None:
+        """
+        __init__ is the constructor for EffortlessAsyncSQLAlchemy.
+
+        Args:
+            connection (str): SQLAlchemy async connection string, such as
+                sqlite+aiosqlite:///tasks.db
+            echo (bool): Log every SQL statement.
+            fingerprint (bool): Remember a hash of the schema in the
+                database and skip creating tables when it is unchanged.
+            profile (Union[str, EngineProfile, None]): Pool and pragma
+                tuning, by name from ENGINE_PROFILES or as a profile.
+            readers (Sequence[str]): Async connection strings of read
+                replicas. get, all, page and stream run on them, everything
+                else on connection. Their schema is left to replication.
+            balancing (str): How reads are spread over the readers, either
+                round_robin or least_connections.
+            sticky (float): Seconds a client keeps reading from the writer
+                after it writes, so it reads its own writes.
+            shards (Sequence[str]): Async connection strings of further
+                databases the objects of each model are spread over by
+                uuid, with connection as the first shard. The readers
+                replicate the first shard only.
+            compact (bool): Store ids as 16-byte or native uuids and enums
+                as small integers, for smaller rows and indexes. The schema
+                differs, so existing tables need migrating.
+        """
+        profile = _profile(profile)
+        options = profile.options()
+
+        if "pool_size" in options:
+            # aiosqlite defaults to a NullPool, which cannot be sized.
+            options["poolclass"] = AsyncAdaptedQueuePool
+
+        def engine(url: str) -> AsyncEngine:
+            created = create_async_engine(url, echo=echo, **options)
+            _apply_pragmas(created.sync_engine, profile.pragmas)
+
+            return created
+
+        self._registry = SQLAlchemyRegistry()
+        self._engine = engine(connection)
+        self._replicas = _Replicas(self._engine, [engine(url) for url in readers], balancing, sticky)
+        self._shards = [engine(url) for url in shards]
+        self._compact = compact
+        self._fingerprint = fingerprint
+        self.timings: Dict[str, float] = {}
+        self._tables_saved = False
+        self._tables_lock = asyncio.Lock()
+
+    def _create_store(self, model: T) -> AsyncStore[T]:
+        """
+        _create_store is a method that creates an async SQLAlchemy store.
+        This method is called by create_stores. This method is not meant to
+        be called directly.
+
+        Args:
+            model (T): Generic Dataclass, represented by [T]
+
+        Returns:
+            AsyncStore[T]: Async SQLAlchemy store which contains [T]
+        """
+        return _AsyncAlchemyStore(
+            dataclass=model,
+            registry=self._registry,
+            engine=self._engine,
+            ready=self._save_tables,
+            replicas=self._replicas,
+            compact=self._compact,
+        )
+
+    async def _save_tables(self) -> None:
+        """
+        _save_tables is a method that saves the SQLAlchemy tables. Creating
+        tables needs a running event loop, so the stores call this before
+        their first query instead of create_stores calling it up front. The
+        schema phase is therefore only in timings after that first query.
+        """
+        if self._tables_saved:
+            return
+
+        async with self._tables_lock:
+            if self._tables_saved:
+                return
+
+            started = time.perf_counter()
+
+            for engine in (self._engine, *self._shards):
+                async with engine.begin() as connection:
+                    await connection.run_sync(_create_schema, self._registry.metadata, self._fingerprint)
+
+            self._tables_saved = True
+            self.timings["schema"] = time.perf_counter() - started
+            logger.info("Created schema in %.1f ms", self.timings["schema"] * 1000)
+
+    def instrument(self, metrics: Metrics) -> None:
+        """
+        instrument records the statements executed and the pool checkout
+        wait of the writer, every reader and every shard.
+
+        Args:
+            metrics (Metrics): Registry to record into.
+        """
+        for engine in (*self._replicas.engines, *self._shards):
+            _instrument_engine(engine.sync_engine, metrics)
+
+    def after_commit(self, callback: Callable[[], None]) -> None:
+        """
+        after_commit runs callback once the current unit of work commits,
+        and not at all if it rolls back. Outside a unit of work, store calls
+        have already committed when they return, so it runs right away.
+
+        Args:
+            callback (Callable[[], None]): Function to run.
+        """
+        _after_commit(callback)
+
+    def written(self) -> bool:
+        """
+        written tells whether the current unit of work has written anything
+        it has not committed yet. Reads made in it may see those writes,
+        which nobody else can until the commit.
+
+        Returns:
+            bool: Whether there are uncommitted writes.
+        """
+        return _written()
+
+    @asynccontextmanager
+    async def unit_of_work(self, client: Optional[Hashable] = None) -> AsyncIterator[None]:
+        """
+        unit_of_work makes every store call inside the block share one
+        session, which commits once when the block ends, or rolls back if
+        it raises. Blocks nested in an open unit of work join it.
+
+        Args:
+            client (Optional[Hashable]): Client the work is done for, which
+                reads its own writes for sticky seconds after writing.
+        """
+        if _unit_of_work.get() is not None:
+            yield
+
+            return
+
+        work = _UnitOfWork()
+        token = _unit_of_work.set(work)
+        client_token = _client.set(client)
+
+        try:
+            yield
+        except BaseException:
+            await work.finish_async(False)
+
+            raise
+        else:
+            await work.finish_async(True)
+        finally:
+            _client.reset(client_token)
+            _unit_of_work.reset(token)
+
+    def create_stores(self, models: ModuleType) -> Dict[T, AsyncStore[T]]:
+        """
+        create_stores is a method that creates async SQLAlchemy stores.
+
+        Args:
+            models (ModuleType): Module containing dataclasses
+
+        Returns:
+            Dict[T, AsyncStore[T]]: Dictionary of async SQLAlchemy stores
+        """
+        stores = {}
+        started = time.perf_counter()
+
+        for _, model in models.__dict__.items():
+            if not isinstance(model, type):
+                continue
+
+            if not is_dataclass(model):
+                continue
+
+            stores[model] = self._create_store(model=model)
+
+        for store in stores.values():
+            store._relate()
+
+        stores = _shard_stores(stores, self._shards, AsyncShardedStore)
+        self.timings["map"] = time.perf_counter() - started
+
         return stores
@@ -18,16 +18,98 @@
 # LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
 # OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
 # WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
-from typing import Optional, Protocol, TypeVar
+import enum
+from dataclasses import dataclass, is_dataclass
+from typing import (Any, AsyncIterator, Dict, Iterator, Optional, Protocol,
+                    Sequence, Tuple, TypeVar, get_args, get_origin)
 from uuid import UUID, uuid4
 
 T = TypeVar("T")
 
+AGGREGATES = ("count", "sum", "min", "max", "avg")
+NUMERIC_AGGREGATES = ("sum", "avg")
+
+
+def numeric(annotation: Any) -> bool:
+    """
+    numeric tells whether a field holds numbers, which sum and avg need.
+
+    Args:
+        annotation (Any): Type of the field.
+
+    Returns:
+        bool: Whether the field is an int or a float, but not an enum.
+    """
+    return (
+        isinstance(annotation, type)
+        and issubclass(annotation, (int, float))
+        and not issubclass(annotation, enum.Enum)
+    )
+
+
+def relation(annotation: Any) -> Tuple[Optional[type], bool]:
+    """
+    relation finds the model a field refers to, for fields typed as another
+    dataclass or a list of them.
+
+    Args:
+        annotation (Any): Type of the field.
+
+    Returns:
+        Tuple[Optional[type], bool]: Dataclass referred to, or None for a
+            plain field, and whether the field holds a list of them.
+    """
+    if get_origin(annotation) is list:
+        items = get_args(annotation)
+
+        if len(items) == 1 and isinstance(items[0], type) and is_dataclass(items[0]):
+            return items[0], True
+
+        return None, False
+
+    if isinstance(annotation, type) and is_dataclass(annotation):
+        return annotation, False
+
+    return None, False
+
+
+class Conflict(ValueError):
+    """
+    Conflict is raised by a write which the existing objects rule out,
+    such as a create reusing the uuid of an object that already exists.
+    """
+
+
+class VersionConflict(ValueError):
+    """
+    VersionConflict is raised by a conditional write when the object has
+    changed since the version the caller expected.
+    """
+
+
+@dataclass(frozen=True)
+class Filter:
+    """
+    Filter is a condition on a field which stores apply when reading.
+
+    Args:
+        field (str): Name of the field.
+        op (str): One of eq, lt, lte, gt, gte or in.
+        value (Any): Value to compare with, or a list of values for in.
+    """
+    field: str
+    op: str
+    value: Any
+
+
 class Store(Protocol[T]):
-    def get(self, uuid: UUID) -> Optional[T]:
+    def get(self, uuid: UUID, fields: Optional[Sequence[str]] = None) -> Optional[T]:
+        ...
+
+    def update(self, uuid: UUID, value: T, expected_version: Optional[int] = None) -> "Store[T]":
         ...
 
-    def update(self, uuid: UUID, value: T) -> "Store[T]":
+    def patch(self, uuid: UUID, values: Dict[str, Any]) -> "Store[T]":
         ...
 
     def delete(self, uuid: UUID) -> "Store[T]":
@@ -36,5 +118,113 @@ class Store(Protocol[T]):
     def create(self, value: T) -> UUID:
         ...
 
-    def all(self) -> list[T]:
+    def all(self, filters: Sequence[Filter] = (), fields: Optional[Sequence[str]] = None) -> list[T]:
+        ...
+
+    def create_many(self, values: list[T]) -> list[UUID]:
+        ...
+
+    def update_many(self, values: Dict[UUID, T]) -> "Store[T]":
+        ...
+
+    def delete_many(self, uuids: list[UUID]) -> "Store[T]":
+        ...
+
+    def page(
+        self,
+        limit: int,
+        after: Optional[UUID] = None,
+        filters: Sequence[Filter] = (),
+        fields: Optional[Sequence[str]] = None,
+    ) -> list[T]:
+        ...
+
+    def stream(
+        self,
+        chunk_size: int = 1000,
+        filters: Sequence[Filter] = (),
+        fields: Optional[Sequence[str]] = None,
+    ) -> Iterator[T]:
+        ...
+
+    def count(self, filters: Sequence[Filter] = ()) -> int:
+        ...
+
+    def version(self, uuid: UUID) -> Optional[Tuple[int, float]]:
+        ...
+
+    def collection_version(self, filters: Sequence[Filter] = ()) -> Tuple[int, Optional[float]]:
+        ...
+
+    def aggregate(
+        self,
+        op: str,
+        field: Optional[str] = None,
+        group_by: Optional[str] = None,
+        filters: Sequence[Filter] = (),
+    ) -> Dict[Any, Any]:
+        ...
+
+
+class AsyncStore(Protocol[T]):
+    async def get(self, uuid: UUID, fields: Optional[Sequence[str]] = None) -> Optional[T]:
+        ...
+
+    async def update(self, uuid: UUID, value: T, expected_version: Optional[int] = None) -> "AsyncStore[T]":
+        ...
+
+    async def patch(self, uuid: UUID, values: Dict[str, Any]) -> "AsyncStore[T]":
+        ...
+
+    async def delete(self, uuid: UUID) -> "AsyncStore[T]":
+        ...
+
+    async def create(self, value: T) -> UUID:
+        ...
+
+    async def all(self, filters: Sequence[Filter] = (), fields: Optional[Sequence[str]] = None) -> list[T]:
+        ...
+
+    async def create_many(self, values: list[T]) -> list[UUID]:
+        ...
+
+    async def update_many(self, values: Dict[UUID, T]) -> "AsyncStore[T]":
+        ...
+
+    async def delete_many(self, uuids: list[UUID]) -> "AsyncStore[T]":
+        ...
+
+    async def page(
+        self,
+        limit: int,
+        after: Optional[UUID] = None,
+        filters: Sequence[Filter] = (),
+        fields: Optional[Sequence[str]] = None,
+    ) -> list[T]:
+        ...
+
+    def stream(
+        self,
+        chunk_size: int = 1000,
+        filters: Sequence[Filter] = (),
+        fields: Optional[Sequence[str]] = None,
+    ) -> AsyncIterator[T]:
+        ...
+
+    async def count(self, filters: Sequence[Filter] = ()) -> int:
+        ...
+
+    async def version(self, uuid: UUID) -> Optional[Tuple[int, float]]:
+        ...
+
+    async def collection_version(self, filters: Sequence[Filter] = ()) -> Tuple[int, Optional[float]]:
+        ...
+
+    async def aggregate(
+        self,
+        op: str,
+        field: Optional[str] = None,
+        group_by: Optional[str] = None,
+        filters: Sequence[Filter] = (),
+    ) -> Dict[Any, Any]:
         ...
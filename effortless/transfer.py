@@ -0,0 +1,226 @@
+# Copyright (c) 2021-2023 Johnathan P. Irvin
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+import csv
+import inspect
+import io
+import json
+from typing import (Any, AsyncIterator, Callable, Dict, Iterable, Iterator,
+                    List, Sequence, Union)
+
+
+async def _lines(chunks: AsyncIterator[bytes], quoted: bool = False) -> AsyncIterator[bytes]:
+    """
+    _lines splits a byte stream into records as the chunks arrive, so only
+    one record is held at a time. With quoted, a newline between an odd
+    number of double quotes belongs to a quoted CSV field rather than
+    ending the record.
+
+    Args:
+        chunks (AsyncIterator[bytes]): Body of the request.
+        quoted (bool): Whether double quotes can enclose newlines.
+
+    Returns:
+        AsyncIterator[bytes]: Records without their line ending.
+    """
+    pending = b""
+    quotes = 0
+
+    async for chunk in chunks:
+        start = 0
+
+        while True:
+            end = chunk.find(b"\n", start)
+
+            if end == -1:
+                pending += chunk[start:]
+                quotes += chunk.count(b'"', start) if quoted else 0
+
+                break
+
+            quotes += chunk.count(b'"', start, end) if quoted else 0
+
+            if quotes % 2:
+                pending += chunk[start:end + 1]
+            else:
+                record = pending + chunk[start:end]
+                pending, quotes = b"", 0
+
+                if record.strip():
+                    yield record.rstrip(b"\r")
+
+            start = end + 1
+
+    if pending.strip():
+        yield pending.rstrip(b"\r")
+
+
+async def ndjson_records(chunks: AsyncIterator[bytes]) -> AsyncIterator[Dict[str, Any]]:
+    """
+    ndjson_records parses a stream of newline delimited JSON objects.
+
+    Args:
+        chunks (AsyncIterator[bytes]): Body of the request.
+
+    Raises:
+        ValueError: If a line is not valid JSON.
+
+    Returns:
+        AsyncIterator[Dict[str, Any]]: One object per line.
+    """
+    async for line in _lines(chunks):
+        yield json.loads(line)
+
+
+async def csv_records(chunks: AsyncIterator[bytes]) -> AsyncIterator[Dict[str, str]]:
+    """
+    csv_records parses a stream of CSV records, the first of which names
+    the columns.
+
+    Args:
+        chunks (AsyncIterator[bytes]): Body of the request.
+
+    Raises:
+        ValueError: If a record has more values than there are columns.
+
+    Returns:
+        AsyncIterator[Dict[str, str]]: One object per record, keyed by
+            column name.
+    """
+    columns = None
+
+    async for record in _lines(chunks, quoted=True):
+        values = next(csv.reader([record.decode("utf-8")]))
+
+        if columns is None:
+            columns = values
+
+            continue
+
+        if len(values) > len(columns):
+            raise ValueError(f"Expected at most {len(columns)} values, got {len(values)}")
+
+        yield dict(zip(columns, values))
+
+
+def _csv_chunk(rows: List[Iterable[Any]]) -> bytes:
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator="\n").writerows(rows)
+
+    return buffer.getvalue().encode("utf-8")
+
+
+def _chunked(
+    values: Union[Iterator[Any], AsyncIterator[Any]],
+    write: Callable[[List[Any]], bytes],
+    header: bytes,
+    chunk_size: int,
+) -> Union[Iterator[bytes], AsyncIterator[bytes]]:
+    """
+    _chunked writes values chunk_size at a time, so a large export is sent
+    in few writes without holding more than a chunk. Sync values are
+    written by a sync generator, which the response iterates in the
+    threadpool.
+
+    Args:
+        values (Union[Iterator[Any], AsyncIterator[Any]]): Values to write.
+        write (Callable[[List[Any]], bytes]): Encodes a chunk of values.
+        header (bytes): Written before the first chunk.
+        chunk_size (int): Values written per chunk.
+
+    Returns:
+        Union[Iterator[bytes], AsyncIterator[bytes]]: Encoded chunks.
+    """
+    if not inspect.isasyncgen(values):
+        def chunks() -> Iterator[bytes]:
+            yield header
+            chunk = []
+
+            for value in values:
+                chunk.append(value)
+
+                if len(chunk) == chunk_size:
+                    yield write(chunk)
+                    chunk = []
+
+            if chunk:
+                yield write(chunk)
+
+        return chunks()
+
+    async def async_chunks() -> AsyncIterator[bytes]:
+        yield header
+        chunk = []
+
+        async for value in values:
+            chunk.append(value)
+
+            if len(chunk) == chunk_size:
+                yield write(chunk)
+                chunk = []
+
+        if chunk:
+            yield write(chunk)
+
+    return async_chunks()
+
+
+def ndjson_lines(
+    values: Union[Iterator[Any], AsyncIterator[Any]],
+    encode: Callable[[Any], bytes],
+    chunk_size: int = 1000,
+) -> Union[Iterator[bytes], AsyncIterator[bytes]]:
+    """
+    ndjson_lines writes objects as newline delimited JSON.
+
+    Args:
+        values (Union[Iterator[Any], AsyncIterator[Any]]): Objects to write.
+        encode (Callable[[Any], bytes]): Encodes an object as a line.
+        chunk_size (int): Lines written per chunk.
+
+    Returns:
+        Union[Iterator[bytes], AsyncIterator[bytes]]: Encoded lines.
+    """
+    return _chunked(values, lambda chunk: b"".join(map(encode, chunk)), b"", chunk_size)
+
+
+def csv_lines(
+    values: Union[Iterator[Any], AsyncIterator[Any]],
+    columns: Sequence[str],
+    encode: Callable[[Any], dict],
+    chunk_size: int = 1000,
+) -> Union[Iterator[bytes], AsyncIterator[bytes]]:
+    """
+    csv_lines writes objects as CSV, with a header naming the columns.
+
+    Args:
+        values (Union[Iterator[Any], AsyncIterator[Any]]): Objects to write.
+        columns (Sequence[str]): Fields written, in order.
+        encode (Callable[[Any], dict]): Builds the JSON object of an
+            object, with exactly the columns.
+        chunk_size (int): Records written per chunk.
+
+    Returns:
+        Union[Iterator[bytes], AsyncIterator[bytes]]: Encoded CSV.
+    """
+    def write(chunk: List[Any]) -> bytes:
+        return _csv_chunk([encode(value).values() for value in chunk])
+
+    return _chunked(values, write, _csv_chunk([columns]), chunk_size)
@@ -18,7 +18,7 @@
 # LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
 # OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
 # WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from enum import Enum
 
 class Status(Enum):
@@ -30,4 +30,4 @@ class Status(Enum):
 class Task:
     name: str
     description: str
-    status: Status
+    status: Status = field(metadata={"index": True})
@@ -0,0 +1,76 @@
+# Copyright (c) 2021-2023 Johnathan P. Irvin
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+from dataclasses import dataclass, field
+from enum import Enum
+from types import ModuleType
+
+import pytest
+
+
+class Status(Enum):
+    TODO = 'todo'
+    IN_PROGRESS = 'in_progress'
+    DONE = 'done'
+
+
+def make_models() -> ModuleType:
+    """
+    make_models creates a fresh models module, since a dataclass can only
+    be mapped by SQLAlchemy once.
+    """
+    @dataclass
+    class Task:
+        name: str
+        description: str
+        status: Status = field(metadata={"index": True})
+
+    module = ModuleType("models")
+    module.Task = Task
+
+    return module
+
+
+def make_list_models() -> ModuleType:
+    """
+    make_list_models creates a fresh models module where a task list holds
+    tasks and has an owner, each task being a model of its own.
+    """
+    module = make_models()
+
+    @dataclass
+    class Owner:
+        name: str
+
+    @dataclass
+    class TaskList:
+        name: str
+        owner: Owner = None
+        tasks: list[module.Task] = field(default_factory=list)
+
+    module.Owner = Owner
+    module.TaskList = TaskList
+
+    return module
+
+
+@pytest.fixture
+def models() -> ModuleType:
+    return make_models()
@@ -0,0 +1,97 @@
+# Copyright (c) 2021-2023 Johnathan P. Irvin
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+import asyncio
+
+import httpx
+import pytest
+
+from effortless import (AdmissionPolicy, Effortless, EffortlessFastAPI,
+                        EffortlessSQLAlchemy, Metrics)
+from effortless.admission import Gate, Overloaded
+
+
+def test_gate_queues_then_rejects():
+    gate = Gate(AdmissionPolicy(concurrency=1, queue=1, timeout=1.0, retry_after=7))
+    order = []
+
+    async def request(name, hold):
+        async with gate.admit():
+            order.append(name)
+            await asyncio.sleep(hold)
+
+    async def scenario():
+        first = asyncio.create_task(request("first", 0.05))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(request("second", 0))
+        await asyncio.sleep(0)
+
+        assert (gate.active, gate.waiting) == (1, 1)
+
+        with pytest.raises(Overloaded) as error:
+            await request("third", 0)
+
+        await asyncio.gather(first, second)
+
+        assert error.value.retry_after == 7
+        assert (gate.active, gate.waiting, gate.rejected) == (0, 0, 1)
+
+    asyncio.run(scenario())
+
+    assert order == ["first", "second"]
+
+
+def test_gate_rejects_after_timeout():
+    gate = Gate(AdmissionPolicy(concurrency=1, queue=10, timeout=0.01))
+
+    async def scenario():
+        async with gate.admit():
+            with pytest.raises(Overloaded):
+                async with gate.admit():
+                    pass
+
+        async with gate.admit():
+            assert (gate.active, gate.waiting) == (1, 0)
+
+    asyncio.run(scenario())
+
+
+def test_routes_shed_load_with_503(models, tmp_path):
+    web, metrics = EffortlessFastAPI(), Metrics()
+    app = Effortless(orm=EffortlessSQLAlchemy(f"sqlite:///{tmp_path}/tasks.db"), web=web).build(
+        models=models,
+        metrics=metrics,
+        admission={(models.Task, "get"): AdmissionPolicy(concurrency=1, queue=0)},
+    )
+
+    async def scenario():
+        async with httpx.AsyncClient(app=app, base_url="http://test") as client:
+            async with web._gates[("task", "get")].admit():
+                shed = await client.get("/task/missing")
+                listed = await client.get("/task")
+
+            return shed, listed, await client.get("/task/missing")
+
+    shed, listed, served = asyncio.run(scenario())
+
+    assert (shed.status_code, shed.headers["retry-after"]) == (503, "1")
+    assert listed.status_code == 200
+    assert served.status_code == 200
+    assert 'effortless_admission_rejected_total{model="task",operation="get"} 1' in metrics.render()
@@ -0,0 +1,102 @@
+# Copyright (c) 2021-2023 Johnathan P. Irvin
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+import asyncio
+
+from fastapi.testclient import TestClient
+
+from conftest import Status
+from effortless import (BatchedStore, BatchPolicy, Effortless,
+                        EffortlessFastAPI, EffortlessSQLAlchemy)
+
+
+class _RecordingStore:
+    def __init__(self) -> None:
+        self.values = {}
+        self.calls = []
+
+    def create_many(self, values):
+        self.calls.append(("create_many", len(values)))
+
+        if "bad" in values:
+            raise ValueError("bad")
+
+        uuids = [str(len(self.values) + index) for index in range(len(values))]
+        self.values.update(zip(uuids, values))
+
+        return uuids
+
+    def create(self, value):
+        self.calls.append(("create", 1))
+
+        if value == "bad":
+            raise ValueError("bad")
+
+        return self.create_many([value])[0]
+
+    def update_many(self, values):
+        self.calls.append(("update_many", len(values)))
+        self.values.update(values)
+
+        return self
+
+
+def test_batched_store_coalesces_concurrent_writes():
+    store = _RecordingStore()
+    batched = BatchedStore(store, BatchPolicy(max_items=10, max_delay=0.01))
+
+    async def scenario():
+        uuids = await asyncio.gather(*(batched.create(value) for value in "abc"))
+        await asyncio.gather(*(batched.update(uuid, uuid * 2) for uuid in uuids))
+
+        return uuids
+
+    assert asyncio.run(scenario()) == ["0", "1", "2"]
+    assert store.calls == [("create_many", 3), ("update_many", 3)]
+    assert store.values == {"0": "00", "1": "11", "2": "22"}
+
+
+def test_batched_store_flushes_full_batches_and_isolates_failures():
+    store = _RecordingStore()
+    batched = BatchedStore(store, BatchPolicy(max_items=2, max_delay=0.05))
+
+    async def scenario():
+        return await asyncio.gather(*(batched.create(value) for value in ["a", "bad", "c"]), return_exceptions=True)
+
+    a, bad, c = asyncio.run(asyncio.wait_for(scenario(), 1))
+
+    assert isinstance(bad, ValueError)
+    assert sorted(store.values.values()) == ["a", "c"]
+    assert store.calls[0] == ("create_many", 2)
+
+
+def test_batched_routes_commit_each_batch_once(models, tmp_path):
+    orm = EffortlessSQLAlchemy(f"sqlite:///{tmp_path}/tasks.db")
+    app = Effortless(orm=orm, web=EffortlessFastAPI()).build(
+        models=models,
+        batch={models.Task: BatchPolicy()},
+    )
+
+    with TestClient(app, raise_server_exceptions=False) as client:
+        uuid = client.post("/task", json={"name": "a", "description": "", "status": "todo"}).json()["uuid"]
+        client.put(f"/task/{uuid}", json={"name": "b", "description": "", "status": "done"})
+
+        assert client.get(f"/task/{uuid}").json() == {"name": "b", "description": "", "status": Status.DONE.value}
+        assert client.put("/task/missing", json={"name": "b", "description": "", "status": "done"}).status_code == 404
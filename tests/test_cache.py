@@ -0,0 +1,152 @@
+# Copyright (c) 2021-2023 Johnathan P. Irvin
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+import asyncio
+import contextvars
+import time
+
+from conftest import Status
+from effortless import (AsyncCachedStore, CachedStore, CachePolicy,
+                        EffortlessSQLAlchemy, Filter)
+from effortless.cache import cache_store
+
+
+class _CountingStore:
+    def __init__(self) -> None:
+        self.values = {"a": "A", "b": "B", "c": "C"}
+        self.reads = 0
+
+    def get(self, uuid, fields=None):
+        self.reads += 1
+
+        return self.values.get(uuid)
+
+    def update(self, uuid, value):
+        self.values[uuid] = value
+
+        return self
+
+    def all(self):
+        return list(self.values.values())
+
+
+def test_cached_store_reads_through_once():
+    store = _CountingStore()
+    cached = CachedStore(store)
+
+    assert [cached.get("a") for _ in range(3)] == ["A"] * 3
+    assert (store.reads, cached.hits, cached.misses) == (1, 2, 1)
+    assert cached.all() == ["A", "B", "C"]
+
+
+def test_cached_store_invalidates_on_write():
+    cached = CachedStore(_CountingStore())
+
+    cached.get("a")
+    cached.update("a", "Z")
+
+    assert cached.get("a") == "Z"
+
+
+def test_cached_store_evicts_least_recent_and_expired():
+    store = _CountingStore()
+    cached = CachedStore(store, CachePolicy(maxsize=2, ttl=0.05))
+
+    cached.get("a")
+    cached.get("b")
+    cached.get("a")
+    cached.get("c")
+    cached.get("a")
+
+    assert store.reads == 3
+
+    cached.get("b")
+
+    assert store.reads == 4
+
+    time.sleep(0.05)
+    cached.get("a")
+
+    assert store.reads == 5
+
+
+def test_async_cached_store_reads_through_once():
+    class _AsyncCountingStore(_CountingStore):
+        async def get(self, uuid, fields=None):
+            return super().get(uuid)
+
+    store = _AsyncCountingStore()
+    cached = AsyncCachedStore(store)
+
+    async def scenario():
+        return [await cached.get("a") for _ in range(3)]
+
+    assert asyncio.run(scenario()) == ["A"] * 3
+    assert store.reads == 1
+
+
+def test_cached_store_caches_aggregates_until_a_write():
+    class _AggregatingStore(_CountingStore):
+        def aggregate(self, op, field=None, group_by=None, filters=()):
+            self.reads += 1
+
+            return {None: len(self.values)}
+
+        def create(self, value):
+            self.values[value] = value
+
+            return value
+
+    store = _AggregatingStore()
+    cached = CachedStore(store, CachePolicy(aggregates=True))
+
+    assert [cached.count() for _ in range(3)] == [3] * 3
+    assert cached.count([Filter("name", "in", ["a"])]) == 3
+    assert store.reads == 2
+
+    cached.create("d")
+
+    assert cached.count() == 4
+    assert store.reads == 3
+
+
+def test_cached_store_invalidates_once_the_unit_of_work_commits(models, tmp_path):
+    orm = EffortlessSQLAlchemy(f"sqlite:///{tmp_path}/tasks.db")
+    store = orm.create_stores(models=models)[models.Task]
+    cached = cache_store(store, CachePolicy(aggregates=True), orm.after_commit, orm.written)
+    uuid = cached.create(models.Task(name="old", description="", status=Status.TODO))
+
+    async def scenario():
+        async with orm.unit_of_work():
+            cached.update(uuid, models.Task(name="new", description="", status=Status.TODO))
+            cached.create(models.Task(name="other", description="", status=Status.TODO))
+
+            # Reads of the unit of work see its writes, but do not cache them.
+            assert cached.get(uuid).name == "new"
+            assert cached.count() == 2
+
+            # A reader outside it still sees, and caches, the old row.
+            assert contextvars.Context().run(cached.get, uuid).name == "old"
+            assert contextvars.Context().run(cached.count) == 1
+
+    asyncio.run(scenario())
+
+    assert cached.get(uuid).name == "new"
+    assert cached.count() == 2
@@ -0,0 +1,108 @@
+# Copyright (c) 2021-2023 Johnathan P. Irvin
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+import asyncio
+
+import httpx
+
+from effortless import (Change, ChangeFeed, Effortless, EffortlessFastAPI,
+                        EffortlessSQLAlchemy)
+
+
+async def _take(changes, count):
+    return [await asyncio.wait_for(changes.__anext__(), 1) for _ in range(count)]
+
+
+def test_change_feed_replays_and_resets():
+    feed = ChangeFeed(history=2)
+
+    async def scenario():
+        live = feed.subscribe("task")
+        pending = asyncio.ensure_future(_take(live, 2))
+        await asyncio.sleep(0.05)
+
+        feed.publish("task", "created", ["a"])
+        feed.publish("list", "created", ["b"])
+        feed.publish("task", "deleted", ["a"])
+
+        return await pending, await _take(feed.subscribe("task", after=2), 1), await _take(feed.subscribe("task", after=0), 1)
+
+    live, resumed, reset = asyncio.run(scenario())
+
+    assert live == [Change(1, "task", "created", "a"), Change(3, "task", "deleted", "a")]
+    assert resumed == [Change(3, "task", "deleted", "a")]
+    assert reset == [Change(3, "task", "reset")]
+
+
+async def _events(app, path, count):
+    body = b""
+    done = asyncio.Event()
+
+    async def receive():
+        await done.wait()
+
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal body
+
+        if message["type"] == "http.response.body":
+            body += message.get("body", b"")
+
+            if body.count(b"\n\n") >= count:
+                done.set()
+
+    path, _, query = path.partition("?")
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": query.encode(),
+        "root_path": "", "headers": [], "client": ("test", 1), "server": ("test", 80),
+    }
+
+    await asyncio.wait_for(app(scope, receive, send), 2)
+
+    return body.decode().split("\n\n")[:count]
+
+
+def test_fastapi_streams_committed_changes(models, tmp_path):
+    app = Effortless(orm=EffortlessSQLAlchemy(f"sqlite:///{tmp_path}/tasks.db"), web=EffortlessFastAPI()).build(
+        models=models,
+        changes=ChangeFeed(),
+    )
+    task = {"name": "a", "description": "", "status": "todo"}
+
+    async def scenario():
+        async with httpx.AsyncClient(app=app, base_url="http://test") as client:
+            live = asyncio.ensure_future(_events(app, "/task/_changes", 1))
+            await asyncio.sleep(0.1)
+
+            uuid = (await client.post("/task", json=task)).json()["uuid"]
+            await client.patch(f"/task/{uuid}", json={"name": "b"})
+            await client.delete(f"/task/{uuid}")
+
+            return uuid, await live, await _events(app, "/task/_changes?after=1", 2)
+
+    uuid, live, resumed = asyncio.run(scenario())
+
+    assert live == [f'id: 1\nevent: created\ndata: {{"uuid": "{uuid}"}}']
+    assert resumed == [
+        f'id: 2\nevent: updated\ndata: {{"uuid": "{uuid}"}}',
+        f'id: 3\nevent: deleted\ndata: {{"uuid": "{uuid}"}}',
+    ]
@@ -0,0 +1,84 @@
+# Copyright (c) 2021-2023 Johnathan P. Irvin
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+import json
+import math
+import sys
+
+import pytest
+
+from benchmarks.compare import compare, main
+
+
+def _report(throughput, p99_ms, orm="sync"):
+    return {
+        "config": {"orm": orm},
+        "results": [{"operation": "get", "rows": 100, "concurrency": 4, "throughput": throughput, "p99_ms": p99_ms}],
+    }
+
+
+def _exit_code(monkeypatch, tmp_path, base, head, *arguments):
+    paths = []
+
+    for name, report in (("base", base), ("head", head)):
+        path = tmp_path / f"{name}.json"
+        path.write_text(json.dumps(report))
+        paths.append(str(path))
+
+    monkeypatch.setattr(sys, "argv", ["compare", *paths, *arguments])
+
+    with pytest.raises(SystemExit) as raised:
+        main()
+
+    return raised.value.code
+
+
+def test_compare_flags_changes_beyond_the_threshold():
+    [within] = compare(_report(100, 10), _report(95, 10.5), 0.10)
+    [slower] = compare(_report(100, 10), _report(80, 10), 0.10)
+    [later] = compare(_report(100, 10), _report(100, 12), 0.10)
+
+    assert (within["regressed"], slower["regressed"], later["regressed"]) == (False, True, True)
+    assert slower["throughput_change"] == pytest.approx(-0.2)
+
+
+def test_compare_guards_zero_measurements():
+    [same] = compare(_report(0, 0), _report(0, 0), 0.10)
+    [risen] = compare(_report(0, 0), _report(100, 5), 0.10)
+
+    assert (same["throughput_change"], same["p99_change"], same["regressed"]) == (0.0, 0.0, False)
+    assert risen["throughput_change"] == math.inf
+    assert risen["p99_change"] == math.inf
+    assert risen["regressed"]
+
+
+def test_compare_refuses_mismatched_configs():
+    with pytest.raises(ValueError, match="orm"):
+        compare(_report(100, 10), _report(100, 10, orm="async"), 0.10)
+
+    assert not compare(_report(100, 10), _report(100, 10, orm="async"), 0.10, allow_mismatch=True)[0]["regressed"]
+
+
+def test_compare_exit_codes(monkeypatch, tmp_path):
+    assert _exit_code(monkeypatch, tmp_path, _report(100, 10), _report(100, 10)) == 0
+    assert _exit_code(monkeypatch, tmp_path, _report(100, 10), _report(50, 10)) == 1
+    assert _exit_code(monkeypatch, tmp_path, _report(0, 10), _report(100, 10)) == 0
+    assert _exit_code(monkeypatch, tmp_path, _report(100, 10), _report(100, 10, orm="async")) == 2
+    assert _exit_code(monkeypatch, tmp_path, _report(100, 10), _report(100, 10, orm="async"), "--allow-mismatch") == 0
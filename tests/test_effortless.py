@@ -19,8 +19,10 @@
 # OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
 # WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 import pytest
+from fastapi.testclient import TestClient
 
-from effortless import Effortless
+from effortless import (CachedStore, CachePolicy, Effortless,
+                        EffortlessAsyncSQLAlchemy, EffortlessFastAPI)
 
 
 def test_effortless_constructor():
@@ -30,3 +32,40 @@ def test_effortless_constructor():
 
     assert effortless._orm == orm
     assert effortless._web == web
+
+
+def test_effortless_build_caches_selected_models():
+    class Store:
+        def get(self, uuid):
+            return None
+
+    class Orm:
+        def create_stores(self, models):
+            return {int: Store(), str: Store()}
+
+    class Web:
+        _app = object()
+
+        def create_routes(self, models, stores):
+            self.stores = stores
+
+    web = Web()
+
+    effortless = Effortless(orm=Orm(), web=web)
+    effortless.build(models=None, cache={int: CachePolicy()})
+
+    assert set(effortless.timings) == {"stores", "routes"}
+    assert isinstance(web.stores[int], CachedStore)
+    assert not isinstance(web.stores[str], CachedStore)
+
+
+def test_effortless_timings_include_the_lazy_async_schema(models, tmp_path):
+    effortless = Effortless(orm=EffortlessAsyncSQLAlchemy(f"sqlite+aiosqlite:///{tmp_path}/tasks.db"), web=EffortlessFastAPI())
+    app = effortless.build(models=models)
+
+    assert set(effortless.timings) == {"orm.map", "stores", "routes"}
+
+    with TestClient(app) as client:
+        client.get("/task")
+
+    assert set(effortless.timings) == {"orm.map", "orm.schema", "stores", "routes"}
@@ -0,0 +1,53 @@
+# Copyright (c) 2021-2023 Johnathan P. Irvin
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+import json
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from conftest import Status
+from effortless.encoders import ModelEncoder
+
+
+def test_model_encoder_matches_default_response(models):
+    tasks = [models.Task(name="ä", description="b", status=Status.DONE)] * 2
+    encoder = ModelEncoder(models.Task)
+
+    assert encoder.encode_many(tasks) == JSONResponse(jsonable_encoder(tasks)).body
+    assert encoder.encode(None) == b"null"
+
+
+def test_model_encoder_projects_fields(models):
+    task = models.Task(name="a", description="b", status=Status.TODO)
+    task.id = "1"
+
+    assert json.loads(ModelEncoder(models.Task).encode(task, ["id", "status"])) == {"id": "1", "status": "todo"}
+
+
+def test_model_encoder_keeps_a_bounded_number_of_fieldsets(models):
+    encoder = ModelEncoder(models.Task, maxsize=2)
+    default = encoder.encoder()
+
+    encoder.encoder(["name"])
+    assert encoder.encoder() is default
+
+    encoder.encoder(["status"])
+    assert list(encoder._compiled) == [("name", "description", "status"), ("status",)]
@@ -0,0 +1,322 @@
+# Copyright (c) 2021-2023 Johnathan P. Irvin
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+import asyncio
+import contextlib
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+from conftest import Status, make_list_models
+from effortless import (Effortless, EffortlessAsyncSQLAlchemy,
+                        EffortlessFastAPI, EffortlessSQLAlchemy)
+
+
+@pytest.fixture(params=["sync", "async"])
+def client(request, models, tmp_path):
+    if request.param == "sync":
+        orm = EffortlessSQLAlchemy(f"sqlite:///{tmp_path}/tasks.db")
+    else:
+        orm = EffortlessAsyncSQLAlchemy(f"sqlite+aiosqlite:///{tmp_path}/tasks.db")
+
+    app = Effortless(orm=orm, web=EffortlessFastAPI()).build(models=models)
+
+    with TestClient(app) as client:
+        yield client
+
+
+def test_fastapi_crud_routes(client):
+    task = {"name": "a", "description": "b", "status": "todo"}
+
+    uuid = client.post("/task", json=task).json()["uuid"]
+
+    assert client.get(f"/task/{uuid}").json() == task
+    assert client.get("/task").json() == [task]
+
+    client.put(f"/task/{uuid}", json={**task, "status": "done"})
+
+    assert client.get(f"/task/{uuid}").json()["status"] == "done"
+
+    client.patch(f"/task/{uuid}", json={"name": "c"})
+
+    assert client.get(f"/task/{uuid}").json() == {**task, "name": "c", "status": "done"}
+
+    client.delete(f"/task/{uuid}")
+
+    assert client.get("/task").json() == []
+
+
+def test_fastapi_pages_and_streams(client):
+    task = {"name": "a", "description": "b", "status": "todo"}
+
+    for _ in range(3):
+        client.post("/task", json=task)
+
+    first = client.get("/task", params={"limit": 2})
+    last = client.get(first.links["next"]["url"])
+
+    assert len(first.json()) == 2
+    assert len(last.json()) == 1
+    assert "next" not in last.links
+
+    streamed = client.get("/task", params={"stream": True})
+
+    assert streamed.headers["content-type"] == "application/x-ndjson"
+    assert streamed.text.splitlines() == ['{"name":"a","description":"b","status":"todo"}'] * 3
+
+
+def test_fastapi_bulk_routes(client):
+    task = {"name": "a", "description": "b", "status": "todo"}
+
+    uuids = client.post("/task/_bulk", json=[task, task]).json()["uuids"]
+
+    client.put("/task/_bulk", json={uuid: {**task, "status": "done"} for uuid in uuids})
+
+    assert [t["status"] for t in client.get("/task").json()] == ["done", "done"]
+
+    # A missing uuid fails the whole batch.
+    assert client.put("/task/_bulk", json={uuids[0]: task, "missing": task}).status_code == 404
+    assert client.request("DELETE", "/task/_bulk", json=[uuids[0], "missing"]).status_code == 404
+    assert [t["status"] for t in client.get("/task").json()] == ["done", "done"]
+
+    client.request("DELETE", "/task/_bulk", json=uuids)
+
+    assert client.get("/task").json() == []
+
+
+def test_fastapi_filters_collection(client):
+    for name, status in [("a", "todo"), ("b", "done"), ("c", "done")]:
+        client.post("/task", json={"name": name, "description": "", "status": status})
+
+    def names(**params):
+        return sorted(task["name"] for task in client.get("/task", params=params).json())
+
+    assert names(status="done") == ["b", "c"]
+    assert names(name__lt="c", status="done") == ["b"]
+    assert names(status__in="todo,done") == ["a", "b", "c"]
+    assert client.get("/task", params={"status": "nope"}).status_code == 400
+    assert client.get("/task", params={"colour": "red"}).status_code == 400
+
+
+def test_fastapi_patch_rejects_null_for_required_fields(client):
+    uuid = client.post("/task", json={"name": "a", "description": "", "status": "todo"}).json()["uuid"]
+
+    assert client.patch(f"/task/{uuid}", json={"status": None}).status_code == 422
+    assert client.patch(f"/task/{uuid}", json={"name": None, "description": "b"}).status_code == 422
+    assert client.patch(f"/task/{uuid}", json={"description": "b"}).status_code == 200
+    assert client.get(f"/task/{uuid}").json() == {"name": "a", "description": "b", "status": "todo"}
+
+
+def test_fastapi_writes_to_a_missing_object_are_not_found(client):
+    task = {"name": "a", "description": "", "status": "todo"}
+
+    assert client.put("/task/missing", json=task).status_code == 404
+    assert client.patch("/task/missing", json={"name": "b"}).status_code == 404
+    assert client.delete("/task/missing").status_code == 404
+
+
+def test_fastapi_sparse_fieldsets(client):
+    uuid = client.post("/task", json={"name": "a", "description": "long", "status": "todo"}).json()["uuid"]
+
+    assert client.get(f"/task/{uuid}", params={"fields": "id,status"}).json() == {"id": uuid, "status": "todo"}
+    assert client.get("/task", params={"fields": "name"}).json() == [{"name": "a"}]
+    assert client.get("/task", params={"fields": "name", "limit": 1}).json() == [{"name": "a"}]
+    assert client.get("/task", params={"fields": "name", "stream": True}).text == '{"name":"a"}\n'
+    assert client.get("/task", params={"fields": "colour"}).status_code == 400
+    assert client.get(f"/task/{uuid}", params={"fields": "status,id,status"}).text == f'{{"id":"{uuid}","status":"todo"}}'
+
+
+def test_fastapi_request_runs_in_one_unit_of_work(models, tmp_path):
+    orm, web = EffortlessSQLAlchemy(f"sqlite:///{tmp_path}/tasks.db"), EffortlessFastAPI()
+    store = orm.create_stores(models=models)[models.Task]
+    web.create_routes(models=models, stores={models.Task: store}, unit_of_work=orm.unit_of_work)
+
+    checkouts = []
+    event.listen(orm._engine, "checkout", lambda *args: checkouts.append(args))
+
+    @web._app.post("/two")
+    def two(fail: bool = False):
+        store.create(models.Task(name="a", description="", status=Status.TODO))
+        store.create(models.Task(name="b", description="", status=Status.TODO))
+
+        if fail:
+            raise RuntimeError("fail")
+
+    with TestClient(web._app, raise_server_exceptions=False) as client:
+        assert client.post("/two", params={"fail": True}).status_code == 500
+        assert store.all() == []
+
+        checkouts.clear()
+        client.post("/two")
+
+        assert len(checkouts) == 1
+        assert len(store.all()) == 2
+
+
+def test_fastapi_commits_before_the_response_starts(models):
+    events = []
+
+    @contextlib.asynccontextmanager
+    async def unit_of_work(client=None):
+        yield
+        events.append("commit")
+
+        if fail:
+            raise RuntimeError("commit failed")
+
+    web = EffortlessFastAPI()
+    web.create_routes(models=models, stores={models.Task: object()}, unit_of_work=unit_of_work)
+
+    @web._app.get("/ok")
+    def ok():
+        return "ok"
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        events.append(message["type"])
+
+    scope = {"type": "http", "method": "GET", "path": "/ok", "raw_path": b"/ok", "root_path": "",
+             "query_string": b"", "headers": [], "client": ("127.0.0.1", 1), "server": ("test", 80)}
+
+    fail = False
+    asyncio.run(web._app(scope, receive, send))
+
+    assert events == ["commit", "http.response.start", "http.response.body"]
+
+    fail = True
+    events.clear()
+
+    with TestClient(web._app, raise_server_exceptions=False) as client:
+        assert client.get("/ok").status_code == 500
+        assert events == ["commit"]
+
+
+def test_fastapi_nested_models(tmp_path):
+    models = make_list_models()
+    app = Effortless(orm=EffortlessSQLAlchemy(f"sqlite:///{tmp_path}/tasks.db"), web=EffortlessFastAPI()).build(models=models)
+    task = {"name": "a", "description": "b", "status": "todo"}
+
+    with TestClient(app) as client:
+        uuid = client.post("/tasklist", json={"name": "l", "owner": {"name": "o"}, "tasks": [task, task]}).json()["uuid"]
+
+        assert client.get(f"/tasklist/{uuid}").json() == {"name": "l", "owner": {"name": "o"}, "tasks": [task, task]}
+
+        client.patch(f"/tasklist/{uuid}", json={"tasks": [{**task, "name": "c"}]})
+
+        assert client.get("/tasklist", params={"fields": "tasks"}).json() == [{"tasks": [{**task, "name": "c"}]}]
+        assert client.get("/task").json() == [{**task, "name": "c"}]
+        assert client.get("/tasklist", params={"tasks": "x"}).status_code == 400
+
+
+def test_fastapi_counts_and_aggregates(client):
+    for name, status in [("a", "todo"), ("b", "done"), ("c", "done")]:
+        client.post("/task", json={"name": name, "description": "", "status": status})
+
+    def aggregate(**params):
+        return client.get("/task/_aggregate", params=params)
+
+    assert client.get("/task/_count").json() == {"count": 3}
+    assert client.get("/task/_count", params={"status": "done"}).json() == {"count": 2}
+    assert sorted(aggregate(group_by="status").json(), key=str) == [
+        {"status": "done", "count": 2},
+        {"status": "todo", "count": 1},
+    ]
+    assert aggregate(op="max", field="name", status="todo").json() == {"max": "a"}
+    assert aggregate(op="sum").status_code == 400
+    assert aggregate(op="sum", field="name").status_code == 400
+    assert aggregate(op="avg", field="status").status_code == 400
+    assert aggregate(op="median", field="name").status_code == 400
+    assert aggregate(group_by="colour").status_code == 400
+
+
+@pytest.mark.parametrize("format", ["ndjson", "csv"])
+def test_fastapi_export_and_import(client, format):
+    tasks = [
+        {"name": "a", "description": 'says "hi",\nthen leaves', "status": "todo"},
+        {"name": "b", "description": "", "status": "done"},
+    ]
+
+    for task in tasks:
+        client.post("/task", json=task)
+
+    exported = client.get("/task/_export", params={"format": format})
+    uuids = sorted(task["id"] for task in client.get("/task", params={"fields": "id"}).json())
+
+    for uuid in uuids:
+        client.delete(f"/task/{uuid}")
+
+    imported = client.post("/task/_import", params={"format": format, "batch_size": 1}, content=exported.content)
+
+    assert imported.json() == {"imported": 2}
+    assert sorted(client.get("/task").json(), key=lambda task: task["name"]) == tasks
+    assert sorted(task["id"] for task in client.get("/task", params={"fields": "id"}).json()) == uuids
+
+
+def test_fastapi_import_rejects_existing_objects(client):
+    client.post("/task", json={"name": "a", "description": "", "status": "todo"})
+    exported = client.get("/task/_export").content
+    records = b'{"name": "b", "description": "", "status": "done"}\n' + exported
+
+    response = client.post("/task/_import", params={"batch_size": 1}, content=records)
+
+    assert response.status_code == 409
+    assert "record 2" in response.json()["detail"]
+    assert [task["name"] for task in client.get("/task").json()] == ["a"]
+
+
+def test_fastapi_import_rejects_invalid_records(client):
+    records = '{"name": "a", "description": "", "status": "todo"}\n{"name": "b", "status": "nope"}\n'
+
+    response = client.post("/task/_import", content=records)
+
+    assert response.status_code == 400
+    assert "record 2" in response.json()["detail"]
+    assert client.get("/task").json() == []
+    assert client.get("/task/_export", params={"format": "xml"}).status_code == 400
+
+
+def test_fastapi_conditional_requests(client):
+    task = {"name": "a", "description": "b", "status": "todo"}
+    uuid = client.post("/task", json=task).json()["uuid"]
+
+    first = client.get(f"/task/{uuid}")
+
+    assert first.headers["etag"] == '"1"'
+    assert "last-modified" in first.headers
+    assert client.get(f"/task/{uuid}", headers={"If-None-Match": '"1"'}).status_code == 304
+    assert client.get(f"/task/{uuid}", params={"fields": "name"}, headers={"If-None-Match": '"1"'}).status_code == 200
+
+    updated = client.put(f"/task/{uuid}", json={**task, "name": "c"}, headers={"If-Match": '"1"'})
+
+    assert (updated.status_code, updated.headers["etag"]) == (200, '"2"')
+    assert client.put(f"/task/{uuid}", json=task, headers={"If-Match": '"1"'}).status_code == 412
+    assert client.put("/task/missing", json=task, headers={"If-Match": '"1"'}).status_code == 404
+    assert client.get(f"/task/{uuid}", headers={"If-None-Match": '"1"'}).json()["name"] == "c"
+
+    listed = client.get("/task")
+
+    assert client.get("/task", headers={"If-None-Match": listed.headers["etag"]}).status_code == 304
+
+    client.patch(f"/task/{uuid}", json={"status": "done"})
+
+    assert client.get("/task", headers={"If-None-Match": listed.headers["etag"]}).status_code == 200
@@ -0,0 +1,60 @@
+# Copyright (c) 2021-2023 Johnathan P. Irvin
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+from fastapi.testclient import TestClient
+
+from effortless import (CachePolicy, Effortless, EffortlessFastAPI,
+                        EffortlessSQLAlchemy, Metrics)
+
+
+def test_metrics_render_prometheus_text():
+    metrics = Metrics()
+    metrics.histogram("latency_seconds", "Latency.", buckets=(0.1, 1.0))
+    metrics.observe("latency_seconds", 0.5, (("route", "/task"),))
+    metrics.collect("hits_total", "Hits.", "counter", lambda: {(("model", "task"),): 3})
+
+    text = metrics.render()
+
+    assert '# TYPE latency_seconds histogram' in text
+    assert 'latency_seconds_bucket{route="/task",le="0.1"} 0' in text
+    assert 'latency_seconds_bucket{route="/task",le="1"} 1' in text
+    assert 'latency_seconds_bucket{route="/task",le="+Inf"} 1' in text
+    assert 'latency_seconds_count{route="/task"} 1' in text
+    assert 'hits_total{model="task"} 3' in text
+
+
+def test_metrics_endpoint_reports_routes_stores_and_caches(models, tmp_path):
+    app = Effortless(
+        orm=EffortlessSQLAlchemy(f"sqlite:///{tmp_path}/tasks.db"),
+        web=EffortlessFastAPI(),
+    ).build(models=models, cache={models.Task: CachePolicy()}, metrics=Metrics())
+
+    with TestClient(app) as client:
+        uuid = client.post("/task", json={"name": "a", "description": "b", "status": "todo"}).json()["uuid"]
+        client.get(f"/task/{uuid}")
+        client.get(f"/task/{uuid}")
+
+        text = client.get("/metrics").text
+
+    assert 'effortless_request_seconds_count{method="GET",route="/task/{uuid}"} 2' in text
+    assert 'effortless_request_queries_count{method="POST",route="/task"} 1' in text
+    assert 'effortless_store_seconds_count{model="task",method="get"} 2' in text
+    assert 'effortless_pool_checkout_seconds_count' in text
+    assert 'effortless_cache_hit_ratio{model="task"} 0.5' in text
@@ -0,0 +1,424 @@
+# Copyright (c) 2021-2023 Johnathan P. Irvin
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+import asyncio
+import sqlite3
+from dataclasses import dataclass
+from types import ModuleType
+
+import pytest
+
+from conftest import Status, make_list_models, make_models
+from sqlalchemy import MetaData, create_engine, event, inspect
+
+from effortless import EffortlessAsyncSQLAlchemy, EffortlessSQLAlchemy, Filter
+
+
+def test_sqlalchemy_store_crud(models, tmp_path):
+    stores = EffortlessSQLAlchemy(f"sqlite:///{tmp_path}/tasks.db").create_stores(models=models)
+    store = stores[models.Task]
+
+    uuid = store.create(models.Task(name="a", description="b", status=Status.TODO))
+    store.update(uuid, models.Task(name="c", description="d", status=Status.DONE))
+
+    assert store.get(uuid).name == "c"
+    assert [task.status for task in store.all()] == [Status.DONE]
+
+    store.delete(uuid)
+
+    assert store.get(uuid) is None
+
+
+def test_async_sqlalchemy_store_crud(models, tmp_path):
+    stores = EffortlessAsyncSQLAlchemy(f"sqlite+aiosqlite:///{tmp_path}/tasks.db").create_stores(models=models)
+    store = stores[models.Task]
+
+    async def scenario():
+        uuid = await store.create(models.Task(name="a", description="b", status=Status.TODO))
+        await store.update(uuid, models.Task(name="c", description="d", status=Status.DONE))
+
+        assert (await store.get(uuid)).name == "c"
+        assert [task.status for task in await store.all()] == [Status.DONE]
+
+        await store.delete(uuid)
+
+        assert await store.get(uuid) is None
+
+    asyncio.run(scenario())
+
+
+def test_sqlalchemy_store_pages(models, tmp_path):
+    stores = EffortlessSQLAlchemy(f"sqlite:///{tmp_path}/tasks.db").create_stores(models=models)
+    store = stores[models.Task]
+
+    uuids = sorted(
+        store.create(models.Task(name=str(i), description="", status=Status.TODO))
+        for i in range(5)
+    )
+
+    first = store.page(limit=2)
+    rest = store.page(limit=10, after=first[-1].id)
+
+    assert [task.id for task in first + rest] == uuids
+    assert len(list(store.stream(chunk_size=2))) == 5
+
+
+def test_sqlalchemy_store_bulk(models, tmp_path):
+    stores = EffortlessSQLAlchemy(f"sqlite:///{tmp_path}/tasks.db").create_stores(models=models)
+    store = stores[models.Task]
+
+    uuids = store.create_many([
+        models.Task(name=str(i), description="", status=Status.TODO)
+        for i in range(3)
+    ])
+    store.update_many({
+        uuid: models.Task(name="done", description="", status=Status.DONE)
+        for uuid in uuids[:2]
+    })
+
+    assert sorted(task.name for task in store.all()) == ["2", "done", "done"]
+
+    with pytest.raises(ValueError):
+        store.delete_many([uuids[0], "missing"])
+
+    assert len(store.all()) == 3
+
+    store.delete_many(uuids)
+
+    assert store.all() == []
+
+
+def test_sqlalchemy_store_writes_missing_rows(models, tmp_path):
+    stores = EffortlessSQLAlchemy(f"sqlite:///{tmp_path}/tasks.db").create_stores(models=models)
+    store = stores[models.Task]
+
+    uuid = store.create(models.Task(name="a", description="b", status=Status.TODO))
+    store.patch(uuid, {"status": Status.DONE})
+
+    assert (store.get(uuid).name, store.get(uuid).status) == ("a", Status.DONE)
+
+    with pytest.raises(ValueError):
+        store.patch("missing", {"status": Status.DONE})
+
+    with pytest.raises(ValueError):
+        store.delete("missing")
+
+
+def test_sqlalchemy_store_filters_on_indexed_fields(models, tmp_path):
+    orm = EffortlessSQLAlchemy(f"sqlite:///{tmp_path}/tasks.db")
+    store = orm.create_stores(models=models)[models.Task]
+
+    store.create_many([
+        models.Task(name=name, description="", status=status)
+        for name, status in [("a", Status.TODO), ("b", Status.DONE), ("c", Status.DONE)]
+    ])
+
+    done = [Filter("status", "eq", Status.DONE)]
+
+    assert sorted(task.name for task in store.all(done)) == ["b", "c"]
+    assert [task.name for task in store.page(10, filters=[Filter("name", "gte", "c")])] == ["c"]
+    assert len(list(store.stream(filters=[Filter("name", "in", ["a", "b"])]))) == 2
+    assert "ix_task_status" in {index["name"] for index in inspect(orm._engine).get_indexes("task")}
+
+
+def test_sqlalchemy_adds_version_columns_to_existing_tables(tmp_path):
+    url, old = f"sqlite:///{tmp_path}/tasks.db", make_models()
+    uuid = EffortlessSQLAlchemy(url).create_stores(models=old)[old.Task].create(
+        old.Task(name="a", description="", status=Status.TODO)
+    )
+
+    with create_engine(url).begin() as connection:
+        connection.exec_driver_sql("ALTER TABLE task DROP COLUMN _version")
+        connection.exec_driver_sql("ALTER TABLE task DROP COLUMN _updated_at")
+
+    models = make_models()
+    store = EffortlessSQLAlchemy(url).create_stores(models=models)[models.Task]
+
+    assert store.get(uuid).name == "a"
+    assert store.version(uuid)[0] == 1
+
+    store.update(uuid, models.Task(name="b", description="", status=Status.DONE), expected_version=1)
+
+    assert store.version(uuid)[0] == 2
+
+
+def test_sqlalchemy_store_loads_only_requested_fields(models, tmp_path):
+    store = EffortlessSQLAlchemy(f"sqlite:///{tmp_path}/tasks.db").create_stores(models=models)[models.Task]
+
+    uuid = store.create(models.Task(name="a", description="long", status=Status.TODO))
+
+    for task in [store.get(uuid, fields=["status"]), *store.all(fields=["status"])]:
+        assert "description" not in task.__dict__
+        assert task.status == Status.TODO
+
+
+def test_sqlalchemy_fingerprint_skips_unchanged_schema(tmp_path, monkeypatch):
+    connection = f"sqlite:///{tmp_path}/tasks.db"
+
+    EffortlessSQLAlchemy(connection, fingerprint=True).create_stores(models=make_models())
+
+    created = []
+    monkeypatch.setattr(MetaData, "create_all", lambda self, bind: created.append(bind))
+
+    orm = EffortlessSQLAlchemy(connection, fingerprint=True)
+    orm.create_stores(models=make_models())
+
+    assert created == []
+    assert set(orm.timings) == {"map", "schema"}
+
+
+def test_sqlalchemy_engine_profile_applies_pool_and_pragmas(tmp_path):
+    orm = EffortlessSQLAlchemy(f"sqlite:///{tmp_path}/tasks.db", profile="sqlite_high_concurrency")
+
+    with orm._engine.connect() as connection:
+        assert connection.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal"
+        assert connection.exec_driver_sql("PRAGMA busy_timeout").scalar() == 5000
+
+    assert orm._engine.pool.size() == 16
+
+    with pytest.raises(ValueError):
+        EffortlessSQLAlchemy(f"sqlite:///{tmp_path}/tasks.db", profile="unknown")
+
+
+def test_async_sqlalchemy_engine_profile_applies_pragmas(tmp_path):
+    orm = EffortlessAsyncSQLAlchemy(f"sqlite+aiosqlite:///{tmp_path}/tasks.db", profile="sqlite_high_concurrency")
+
+    async def journal_mode():
+        async with orm._engine.connect() as connection:
+            return (await connection.exec_driver_sql("PRAGMA journal_mode")).scalar()
+
+    assert asyncio.run(journal_mode()) == "wal"
+
+
+def test_async_sqlalchemy_unit_of_work_commits_once(models, tmp_path):
+    orm = EffortlessAsyncSQLAlchemy(f"sqlite+aiosqlite:///{tmp_path}/tasks.db")
+    store = orm.create_stores(models=models)[models.Task]
+
+    async def create_two(fail):
+        async with orm.unit_of_work():
+            await store.create(models.Task(name="a", description="", status=Status.TODO))
+            await store.create(models.Task(name="b", description="", status=Status.TODO))
+
+            if fail:
+                raise RuntimeError("fail")
+
+    async def scenario():
+        with pytest.raises(RuntimeError):
+            await create_two(fail=True)
+
+        assert await store.all() == []
+
+        await create_two(fail=False)
+
+        assert len(await store.all()) == 2
+
+    asyncio.run(scenario())
+
+
+def test_sqlalchemy_replicas_serve_reads_and_clients_read_their_writes(models, tmp_path):
+    readers = [f"sqlite:///{tmp_path}/reader{index}.db" for index in range(2)]
+    orm = EffortlessSQLAlchemy(f"sqlite:///{tmp_path}/writer.db", readers=readers, sticky=60)
+    store = orm.create_stores(models=models)[models.Task]
+    reads = []
+
+    for index, reader in enumerate(orm._replicas.readers):
+        orm._registry.metadata.create_all(reader)
+        event.listen(reader, "before_cursor_execute", lambda *args, index=index: reads.append(index))
+
+    task = models.Task(name="a", description="b", status=Status.TODO)
+
+    # The readers never receive the row, like replicas lagging forever.
+    async def scenario():
+        async with orm.unit_of_work(client="writer"):
+            uuid = store.create(task)
+
+            assert store.get(uuid) is not None
+
+        async with orm.unit_of_work(client="writer"):
+            assert store.get(uuid) is not None
+
+        async with orm.unit_of_work(client="other"):
+            assert store.get(uuid) is None
+            assert store.all() == []
+
+        return uuid
+
+    uuid = asyncio.run(scenario())
+
+    assert store.get(uuid) is None
+    assert store.page(limit=1) == []
+    assert sorted(reads) == [0, 0, 1, 1]
+
+
+@pytest.mark.parametrize("flavour", ["sync", "async"])
+def test_sqlalchemy_store_loads_relationships_in_constant_queries(flavour, tmp_path):
+    models = make_list_models()
+
+    if flavour == "sync":
+        orm = EffortlessSQLAlchemy(f"sqlite:///{tmp_path}/tasks.db")
+        engine = orm._engine
+    else:
+        orm = EffortlessAsyncSQLAlchemy(f"sqlite+aiosqlite:///{tmp_path}/tasks.db")
+        engine = orm._engine.sync_engine
+
+    stores = orm.create_stores(models=models)
+    lists, tasks = stores[models.TaskList], stores[models.Task]
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+    def task(name):
+        return models.Task(name=name, description="", status=Status.TODO)
+
+    async def call(method, *args):
+        result = method(*args)
+
+        return await result if asyncio.iscoroutine(result) else result
+
+    async def scenario():
+        uuids = [
+            await call(lists.create, models.TaskList(name=str(index), owner=models.Owner(name="o"), tasks=[task("a"), task("b")]))
+            for index in range(5)
+        ]
+
+        statements.clear()
+        read = await call(lists.all)
+
+        assert len(statements) == 2
+        assert [[t.name for t in value.tasks] for value in read] == [["a", "b"]] * 5
+        assert {value.owner.name for value in read} == {"o"}
+
+        await call(lists.update, uuids[0], models.TaskList(name="x", tasks=[task("c")]))
+        await call(lists.patch, uuids[1], {"tasks": []})
+        await call(lists.delete, uuids[2])
+
+        first = await call(lists.get, uuids[0])
+
+        assert (first.name, first.owner, [t.name for t in first.tasks]) == ("x", None, ["c"])
+        assert (await call(lists.get, uuids[1])).tasks == []
+        assert await call(lists.get, uuids[2]) is None
+        assert len(await call(tasks.all)) == 5
+        assert [value.name for value in await call(lists.all, (), ["name"])] == ["x", "1", "3", "4"]
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.parametrize("flavour", ["sync", "async"])
+def test_sqlalchemy_shards_spread_objects_and_merge_reads(flavour, tmp_path):
+    models = make_models()
+    urls = [f"{tmp_path}/shard{index}.db" for index in range(3)]
+
+    if flavour == "sync":
+        orm = EffortlessSQLAlchemy(f"sqlite:///{urls[0]}", shards=[f"sqlite:///{url}" for url in urls[1:]])
+    else:
+        orm = EffortlessAsyncSQLAlchemy(f"sqlite+aiosqlite:///{urls[0]}", shards=[f"sqlite+aiosqlite:///{url}" for url in urls[1:]])
+
+    store = orm.create_stores(models=models)[models.Task]
+
+    async def call(method, *args):
+        result = method(*args)
+
+        return await result if asyncio.iscoroutine(result) else result
+
+    def task(name, status):
+        return models.Task(name=name, description="", status=status)
+
+    async def scenario():
+        uuids = await call(store.create_many, [task(str(index), Status.TODO) for index in range(20)])
+        uuids.append(await call(store.create, task("x", Status.DONE)))
+
+        await call(store.patch, uuids[0], {"status": Status.DONE})
+        await call(store.delete, uuids[1])
+
+        assert (await call(store.get, uuids[0])).status == Status.DONE
+        assert await call(store.get, uuids[1]) is None
+        assert await call(store.count) == 20
+        assert await call(store.aggregate, "count", None, "status") == {Status.TODO: 18, Status.DONE: 2}
+        assert await call(store.aggregate, "max", "name") == {None: "x"}
+
+        first = await call(store.page, 15)
+        rest = await call(store.page, 15, first[-1].id)
+
+        assert [value.id for value in first + rest] == sorted(uuids[:1] + uuids[2:])
+
+        return uuids
+
+    uuids = asyncio.run(scenario())
+    rows = [sqlite3.connect(url).execute("SELECT count(*) FROM task").fetchone()[0] for url in urls]
+
+    assert sum(rows) == len(uuids) - 1
+    assert all(rows)
+
+
+@pytest.mark.parametrize("flavour", ["sync", "async"])
+def test_sqlalchemy_shards_average_in_a_unit_of_work(flavour, tmp_path):
+    @dataclass
+    class Estimate:
+        hours: float
+
+    models = ModuleType("models")
+    models.Estimate = Estimate
+    urls = [f"{tmp_path}/shard{index}.db" for index in range(3)]
+
+    if flavour == "sync":
+        orm = EffortlessSQLAlchemy(f"sqlite:///{urls[0]}", shards=[f"sqlite:///{url}" for url in urls[1:]])
+    else:
+        orm = EffortlessAsyncSQLAlchemy(f"sqlite+aiosqlite:///{urls[0]}", shards=[f"sqlite+aiosqlite:///{url}" for url in urls[1:]])
+
+    store = orm.create_stores(models=models)[Estimate]
+
+    async def call(method, *args):
+        result = method(*args)
+
+        return await result if asyncio.iscoroutine(result) else result
+
+    async def scenario():
+        await call(store.create_many, [Estimate(hours=float(hours)) for hours in range(10)])
+
+        async with orm.unit_of_work():
+            return await call(store.aggregate, "avg", "hours")
+
+    assert asyncio.run(scenario()) == {None: 4.5}
+
+
+def test_sqlalchemy_compact_columns_convert_at_the_store(tmp_path):
+    models = make_list_models()
+    orm = EffortlessSQLAlchemy(f"sqlite:///{tmp_path}/tasks.db", compact=True)
+    stores = orm.create_stores(models=models)
+    tasks, lists = stores[models.Task], stores[models.TaskList]
+
+    uuids = tasks.create_many([models.Task(name=str(index), description="", status=Status.DONE) for index in range(3)])
+    uuid = tasks.create(models.Task(name="a", description="", status=Status.TODO))
+    listed = lists.create(models.TaskList(name="l", owner=models.Owner(name="o"), tasks=[tasks.get(uuid)]))
+
+    with orm._engine.connect() as connection:
+        row = connection.exec_driver_sql("SELECT id, status FROM task WHERE name = 'a'").one()
+
+    assert (len(row.id), row.status) == (16, 0)
+    assert tasks.get(uuid).status == Status.TODO
+    assert tasks.get("not-a-uuid") is None
+    assert tasks.get("0" * 30) is None
+    assert tasks.get(uuid.upper()).id == uuid
+    assert repr(models.Task.__table__.c.status.type) == "_IntegerEnum(Status)"
+    assert sorted(task.id for task in tasks.all([Filter("status", "eq", Status.DONE)])) == sorted(uuids)
+    assert tasks.aggregate("count", group_by="status") == {Status.TODO: 1, Status.DONE: 3}
+    ordered = sorted([uuid, *uuids])
+
+    assert [task.id for task in tasks.page(2, after=ordered[0])] == ordered[1:3]
+    assert [task.name for task in lists.get(listed).tasks] == ["a"]
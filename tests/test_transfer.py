@@ -0,0 +1,48 @@
+# Copyright (c) 2021-2023 Johnathan P. Irvin
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+import asyncio
+
+from effortless.transfer import csv_records, ndjson_records
+
+
+async def _chunks(data: bytes, size: int):
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+
+async def _collect(records):
+    return [record async for record in records]
+
+
+def test_csv_records_split_across_chunks():
+    data = b'id,note\r\n1,"a ""quoted"",\nmultiline note"\r\n2,plain\r\n'
+
+    for size in range(1, len(data) + 1):
+        assert asyncio.run(_collect(csv_records(_chunks(data, size)))) == [
+            {"id": "1", "note": 'a "quoted",\nmultiline note'},
+            {"id": "2", "note": "plain"},
+        ]
+
+
+def test_ndjson_records_split_across_chunks():
+    data = b'{"a": 1}\n\n{"a": "\\n"}'
+
+    assert asyncio.run(_collect(ndjson_records(_chunks(data, 3)))) == [{"a": 1}, {"a": "\n"}]